@@ -0,0 +1,66 @@
+# ai-service/app/backfill_passages.py
+
+"""
+Passage backfill for knowledge-base articles stored before passage-level indexing.
+Dense retrieval only searches passages, so such articles are invisible to it
+until they are split, encoded and linked. Safe to interrupt and rerun: each
+batch is committed on its own and only articles without passages are read.
+
+Usage (from the ai-service directory):
+    python -m app.backfill_passages --batch-size 128 --processes 4
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.rag_system import RAGSystem
+from app.services.kb_ingestion import DEFAULT_BATCH_SIZE
+
+
+async def backfill(rag: RAGSystem, batch_size: int) -> int:
+    indexed = 0
+    started = time.monotonic()
+    while True:
+        articles = await rag.articles_without_passages(batch_size)
+        if not articles:
+            return indexed
+        done = await rag.index_existing_articles(articles)
+        if not done:
+            # Nothing in the batch could be indexed; stop rather than retrying the same rows forever
+            raise SystemExit(f"Batch of {len(articles)} articles failed after {indexed} were indexed; rerun to resume.")
+        indexed += done
+        logging.info(f"{indexed} articles indexed ({indexed / (time.monotonic() - started):.1f} rows/sec)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index knowledge base articles that have no passages.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Articles encoded and written per batch")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Encode across this many worker processes (0 = single process)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    rag = RAGSystem()
+    if not rag.embeddings_enabled:
+        raise SystemExit("RAG system is not available; check EMBEDDING_MODEL and Supabase credentials.")
+    if args.processes > 0:
+        rag.start_encode_pool(args.processes)
+
+    try:
+        indexed = asyncio.run(backfill(rag, args.batch_size))
+    finally:
+        rag.stop_encode_pool()
+
+    print(f"Indexed passages for {indexed} articles.")
+
+
+if __name__ == "__main__":
+    main()
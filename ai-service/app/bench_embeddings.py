@@ -0,0 +1,148 @@
+# ai-service/app/bench_embeddings.py
+
+"""
+Embedding backend benchmark: encode latency, memory and recall@k versus the
+stock fp32 model.
+
+Usage (from the ai-service directory):
+    python -m app.bench_embeddings corpus.jsonl --configs torch:768 int8:768 onnx:768 torch:256 \\
+        --index int8 binary --k 10
+
+The corpus is a JSONL file of articles ({"title": ..., "content": ...}).
+Unless --queries is given, article titles are used as queries.
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_backend import EmbeddingBackend, DEFAULT_EMBEDDING_MODEL
+from app.services.vector_quantization import QuantizedVectorIndex
+
+
+def rss_megabytes() -> Optional[float]:
+    """Resident set size of this process, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+def load_corpus(path: str, limit: int) -> Tuple[List[str], List[str]]:
+    documents, titles = [], []
+    with open(path) as f:
+        for line in f:
+            if len(documents) >= limit:
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("title") and record.get("content"):
+                titles.append(record["title"])
+                documents.append(f"{record['title']} {record['content']}")
+    return documents, titles
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> List[int]:
+    scores = matrix @ query
+    return list(np.argsort(-scores)[:k])
+
+
+def recall_at_k(expected: List[List[int]], actual: List[List[int]], k: int) -> float:
+    return float(np.mean([len(set(e[:k]) & set(a[:k])) / k for e, a in zip(expected, actual)]))
+
+
+def benchmark_config(model_name: str, backend: str, dimension: int, documents: List[str],
+                     queries: List[str], batch_size: int) -> Dict[str, object]:
+    rss_before = rss_megabytes()
+    loaded_at = time.perf_counter()
+    encoder = EmbeddingBackend(model_name, backend=backend, dimension=dimension)
+    load_seconds = time.perf_counter() - loaded_at
+    rss_after = rss_megabytes()
+
+    started = time.perf_counter()
+    doc_vectors = encoder.encode(documents, batch_size=batch_size, normalize_embeddings=True)
+    corpus_seconds = time.perf_counter() - started
+
+    # Single-query latency is what a live /analyze request pays
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        started = time.perf_counter()
+        query_vectors.append(encoder.encode(query, normalize_embeddings=True))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "name": f"{encoder.backend}:{encoder.dimension}",
+        "load_seconds": load_seconds,
+        "model_rss_mb": (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+        "docs_per_second": len(documents) / corpus_seconds if corpus_seconds else 0.0,
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "doc_vectors": doc_vectors,
+        "query_vectors": np.stack(query_vectors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends and quantized indexes.")
+    parser.add_argument("corpus", help="JSONL file of articles")
+    parser.add_argument("--queries", help="Optional text file with one query per line")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL))
+    parser.add_argument("--configs", nargs="+", default=["torch:768", "int8:768", "onnx:768", "torch:256"],
+                        help="backend:dimension pairs to compare against the fp32 baseline")
+    parser.add_argument("--index", nargs="*", default=["int8", "binary"],
+                        help="Quantized index modes to evaluate on top of each config")
+    parser.add_argument("--limit", type=int, default=5000, help="Maximum corpus size")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    documents, titles = load_corpus(args.corpus, args.limit)
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = titles[:200]
+    print(f"Corpus: {len(documents)} documents, {len(queries)} queries, k={args.k}\n")
+
+    baseline = benchmark_config(args.model, "torch", None, documents, queries, args.batch_size)
+    expected = [top_k(baseline["doc_vectors"], q, args.k) for q in baseline["query_vectors"]]
+
+    header = f"{'config':<22}{'p50 ms':>9}{'p95 ms':>9}{'docs/s':>10}{'model MB':>10}{'index MB':>10}{'recall@k':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for spec in args.configs:
+        backend, _, dim = spec.partition(":")
+        result = baseline if spec == "torch:768" else benchmark_config(
+            args.model, backend, int(dim) if dim else None, documents, queries, args.batch_size
+        )
+        doc_vectors, query_vectors = result["doc_vectors"], result["query_vectors"]
+        model_mb = f"{result['model_rss_mb']:.0f}" if result["model_rss_mb"] is not None else "n/a"
+
+        rows = [("float32", doc_vectors.nbytes, [top_k(doc_vectors, q, args.k) for q in query_vectors])]
+        ids = [str(i) for i in range(len(documents))]
+        for mode in args.index:
+            index = QuantizedVectorIndex(mode)
+            index.build(ids, doc_vectors)
+            hits = [[int(i) for i, _ in index.search(q, args.k)] for q in query_vectors]
+            rows.append((mode, index.memory_bytes(), hits))
+
+        for index_name, index_bytes, hits in rows:
+            print(
+                f"{result['name'] + '/' + index_name:<22}"
+                f"{result['query_p50_ms']:>9.1f}{result['query_p95_ms']:>9.1f}"
+                f"{result['docs_per_second']:>10.1f}{model_mb:>10}"
+                f"{index_bytes / 1024 / 1024:>10.2f}{recall_at_k(expected, hits, args.k):>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
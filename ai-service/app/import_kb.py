@@ -0,0 +1,57 @@
+# ai-service/app/import_kb.py
+
+"""
+Offline knowledge-base import.
+
+Usage (from the ai-service directory):
+    python -m app.import_kb articles.jsonl --checkpoint import.ckpt --processes 4
+"""
+
+import argparse
+import asyncio
+import logging
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.rag_system import RAGSystem
+from app.services.kb_ingestion import KnowledgeBaseIngestor, DEFAULT_BATCH_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import JSONL articles into the knowledge base.")
+    parser.add_argument("path", help="JSONL file with one article per line")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Articles encoded and inserted per batch")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file used to resume an interrupted import")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Encode across this many worker processes (0 = single process)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    rag = RAGSystem()
+    if not rag.embeddings_enabled:
+        raise SystemExit("RAG system is not available; check EMBEDDING_MODEL and Supabase credentials.")
+    if args.processes > 0:
+        rag.start_encode_pool(args.processes)
+
+    try:
+        stats = asyncio.run(
+            KnowledgeBaseIngestor(rag, batch_size=args.batch_size).ingest_file(args.path, args.checkpoint)
+        )
+    finally:
+        rag.stop_encode_pool()
+
+    print(
+        f"Imported {stats.new_rows} articles ({stats.rows} total in checkpoint), "
+        f"processed {stats.processed}, skipped {stats.skipped}, duplicates {stats.duplicates}, "
+        f"failed {stats.failed}, {stats.rows_per_second:.1f} new rows/sec, "
+        f"{stats.processed_per_second:.1f} processed rows/sec"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,14 @@ TruthGuard AI Service
 AI microservice for content analysis, OCR, transcription, and fact-checking
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, File, UploadFile, Header, Request, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+import asyncio
+import json
+import os
 
 # Load environment variables first
 load_dotenv()
@@ -16,13 +20,29 @@ load_dotenv()
 # 1. Models are now imported from a central schemas file
 from app.models.schemas import (
     AnalysisRequest, AnalysisResponse, OCRRequest,
-    TranscriptionRequest, RAGRequest
+    TranscriptionRequest, RAGRequest, URLExtractionRequest
 )
 
 # Import services
 from app.services.content_extraction import OCRService, TranscriptionService
+from app.services.video_text import VideoTextExtractor
+from app.services.url_extraction import URLExtractor
+from app.services.llm_backends import LocalLlamaBackend
+from app.services.nli_verifier import NLIVerifier
 from app.services.rag_system import RAGSystem
 from app.services.claim_classifier import ClaimClassifier
+from app.services.context_builder import ContextBuilder
+from app.services.kb_ingestion import KnowledgeBaseIngestor
+from app.services.upstream_guard import UpstreamUnavailableError
+from app.services.pipeline import AnalysisPipeline
+from app.services.resource_manager import resource_manager
+from app.services.deadline import DeadlineExceeded, deadline_scope, parse_deadline_header
+from app.services import singleflight
+from app.services.singleflight import flight, flight_key
+from app.services.profiling import (
+    RequestProfilingMiddleware, require_admin, profile_cpu, request_profiles, memory_tracker
+)
+from app.services.traffic_capture import TrafficCaptureMiddleware
 
 
 # Initialize FastAPI app
@@ -32,6 +52,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Per-request sampling when an admin sends X-Profile
+app.add_middleware(RequestProfilingMiddleware)
+
+# Records sanitized requests for load replay when TRAFFIC_CAPTURE_PATH is set
+app.add_middleware(TrafficCaptureMiddleware, exclude="/health,/metrics,/admin")
+
 # 2. A dictionary to hold the services once they are loaded on startup
 services = {}
 
@@ -39,12 +65,36 @@ services = {}
 async def startup_event():
     """Load heavy AI models when the application starts."""
     print("AI Service: Loading AI models...")
+    resource_manager.configure_torch()
+    # Size the per-model pools up front so their budgets are logged and visible in metrics
+    for pool in ("ocr", "embedding", "transcription", "video"):
+        resource_manager.pool(pool)
     services["ocr"] = OCRService()
-    services["transcription"] = TranscriptionService()
+    services["transcription"] = TranscriptionService(video_text=VideoTextExtractor(services["ocr"]))
     services["rag"] = RAGSystem()
-    services["classifier"] = ClaimClassifier()
+    # Build the BM25 index in the background and keep it in sync with other writers
+    asyncio.create_task(services["rag"].keep_lexical_index_fresh(
+        float(os.getenv("RAG_LEXICAL_REFRESH_SECONDS", 60))
+    ))
+    services["classifier"] = ClaimClassifier(
+        context_builder=ContextBuilder(embedding_model=getattr(services["rag"], "embedding_model", None)),
+        verifier=NLIVerifier(),
+    )
+    # An in-process GGUF model loads in the background; until then verdicts use the other backends
+    for backend in services["classifier"].llm_backends:
+        if isinstance(backend, LocalLlamaBackend):
+            asyncio.create_task(backend.start())
+    services["url_extractor"] = URLExtractor()
+    services["pipeline"] = AnalysisPipeline(
+        services["ocr"], services["transcription"], services["rag"], services["classifier"],
+        url_extractor=services["url_extractor"],
+    )
     print("AI Service: Models loaded successfully.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    resource_manager.shutdown()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -67,35 +117,198 @@ async def health_check():
         }
     }
 
+@app.get("/metrics/upstreams")
+async def upstream_metrics():
+    """Client-side rate limiting, queueing and circuit breaker state per upstream"""
+    if "classifier" not in services:
+        raise HTTPException(status_code=503, detail="Classifier not loaded")
+    return services["classifier"].upstream_metrics()
+
+@app.get("/metrics/resources")
+async def resource_metrics():
+    """Per-model thread pools: size, torch threads, queue depth and wait, utilization"""
+    return resource_manager.snapshot()
+
+@app.get("/metrics/url-cache")
+async def url_cache_metrics():
+    """Hit/miss counts and size of the linked-article cache"""
+    if "url_extractor" not in services:
+        raise HTTPException(status_code=503, detail="URL extractor not loaded")
+    return services["url_extractor"].stats()
+
+@app.get("/metrics/coalescing")
+async def coalescing_metrics():
+    """Per group: calls, executions actually run, callers that joined one in flight, cancellations"""
+    return singleflight.snapshot()
+
+@app.get("/admin/profile/cpu", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def cpu_profile(seconds: float = Query(10.0, gt=0), interval_ms: float = Query(5.0, ge=1)):
+    """Samples every thread (event loop, executors, model calls) and returns folded stacks"""
+    return await profile_cpu(seconds, interval_ms / 1000)
+
+@app.get("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def list_request_profiles():
+    """Recent profiles of requests sent with the X-Profile header"""
+    return {"profiles": request_profiles.list()}
+
+@app.get("/admin/profile/requests/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def get_request_profile(profile_id: str):
+    folded = request_profiles.get(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return folded
+
+@app.post("/admin/memory/start", dependencies=[Depends(require_admin)])
+async def start_memory_tracing(frames: int = Query(10, ge=1, le=50)):
+    """Turns on tracemalloc and records a baseline, e.g. before a batch of OCR or embedding calls"""
+    return memory_tracker.start(frames)
+
+@app.post("/admin/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot():
+    try:
+        return memory_tracker.snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/admin/memory/diff", dependencies=[Depends(require_admin)])
+async def memory_diff(limit: int = Query(25, ge=1, le=200), group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")):
+    """Allocation growth since the baseline, largest first, plus the RSS change"""
+    try:
+        return memory_tracker.diff(limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/memory/stop", dependencies=[Depends(require_admin)])
+async def stop_memory_tracing():
+    return memory_tracker.stop()
+
+async def run_analysis(request: AnalysisRequest, on_partial=None,
+                       deadline_header: Optional[str] = None, on_checkpoint=None) -> AnalysisResponse:
+    """
+    Runs a claim through extraction, retrieval and classification.
+    Identical analyses already in flight (same content and inputs, any
+    claim_id) are joined rather than repeated; partial verdicts and
+    checkpoints are delivered to every caller.
+    """
+    async def run(emit):
+        # Extraction, retrieval and a speculative web search run concurrently;
+        # deduplicated media arrives with its cached extraction, so nothing is downloaded
+        return await services["pipeline"].run(
+            content=request.content,
+            content_type=request.content_type,
+            file_url=request.file_url,
+            source_url=request.source_url,
+            extracted_text=request.extracted_text,
+            on_partial=lambda fields: emit("partial", fields),
+            checkpoints=request.checkpoints,
+            on_checkpoint=lambda stage, output: emit("checkpoint", (stage, output)),
+        )
+
+    async def deliver(kind, payload):
+        if kind == "partial" and on_partial:
+            await on_partial(payload)
+        elif kind == "checkpoint" and on_checkpoint:
+            await on_checkpoint(*payload)
+
+    key = flight_key(
+        request.content, request.content_type, request.file_url, request.source_url,
+        request.extracted_text, request.checkpoints,
+    )
+    # Every stage, executor job and upstream call checks the remaining budget; a joined
+    # analysis runs to the latest deadline of the callers still waiting on it
+    with deadline_scope(parse_deadline_header(deadline_header)):
+        result = await flight("analysis").do_with_events(key, run, listener=deliver)
+    return AnalysisResponse(**result)
+
+async def cancel_on_disconnect(http_request: Request, task: asyncio.Task, poll_interval: float = 1.0) -> bool:
+    """Cancels `task` once the client has gone away, so abandoned analyses stop consuming CPU."""
+    while not task.done():
+        if await http_request.is_disconnected():
+            task.cancel()
+            return True
+        await asyncio.sleep(poll_interval)
+    return False
+
 @app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_claim(request: AnalysisRequest):
+async def analyze_claim(request: AnalysisRequest, http_request: Request,
+                        x_deadline_ms: Optional[str] = Header(None)):
     """Main analysis endpoint - processes claims through the full AI pipeline"""
+    task = asyncio.create_task(run_analysis(request, deadline_header=x_deadline_ms))
+    watcher = asyncio.create_task(cancel_on_disconnect(http_request, task))
     try:
-        content = request.content
-        
-        # 3. CRITICAL CHANGE: Use file_url instead of file_path
-        if request.content_type == "image" and request.file_url:
-            extracted_text = await services["ocr"].extract_text(request.file_url)
-            content = f"{content}\n\nExtracted text from image: {extracted_text}"
-            
-        elif request.content_type == "video" and request.file_url:
-            transcription = await services["transcription"].transcribe(request.file_url)
-            content = f"{content}\n\nTranscription from video: {transcription}"
-        
-        # Step 2: Retrieve relevant information using RAG
-        relevant_articles = await services["rag"].search_similar(content)
-        
-        # Step 3: Classify and analyze the claim
-        analysis_result = await services["classifier"].analyze_claim(
-            claim_text=content,
-            retrieved_context=relevant_articles
+        return await task
+    except asyncio.CancelledError:
+        if not (watcher.done() and not watcher.cancelled() and watcher.result()):
+            # The endpoint itself is being cancelled (e.g. shutdown), not just the analysis
+            raise
+        print("INFO in /analyze: client disconnected; analysis cancelled")
+        return JSONResponse(status_code=499, content={"detail": "Client closed request"})
+    except DeadlineExceeded as e:
+        print(f"ERROR in /analyze: {e}")
+        raise HTTPException(status_code=504, detail=f"Analysis deadline exceeded: {str(e)}")
+    except UpstreamUnavailableError as e:
+        # 503 + Retry-After lets the backend defer the claim instead of failing it
+        print(f"ERROR in /analyze: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Analysis temporarily unavailable: {str(e)}"},
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
         )
-        
-        return AnalysisResponse(**analysis_result)
-        
     except Exception as e:
         print(f"ERROR in /analyze: {e}") 
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    finally:
+        watcher.cancel()
+
+@app.post("/analyze/stream")
+async def analyze_claim_stream(request: AnalysisRequest, x_deadline_ms: Optional[str] = Header(None)):
+    """
+    Streaming variant of /analyze. Emits newline-delimited JSON events:
+    "partial" events carry the verdict and confidence as soon as the LLM has
+    produced them, followed by a single "result" or "error" event.
+    "checkpoint" events carry stage outputs the caller can store and send
+    back in `checkpoints` to resume a retried analysis.
+    The analysis is cancelled if the client disconnects mid-stream.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def on_partial(fields):
+        await events.put({"event": "partial", "data": fields})
+
+    async def on_checkpoint(stage, output):
+        await events.put({"event": "checkpoint", "stage": stage, "data": output})
+
+    async def produce():
+        try:
+            result = await run_analysis(
+                request, on_partial=on_partial, deadline_header=x_deadline_ms, on_checkpoint=on_checkpoint
+            )
+            await events.put({"event": "result", "data": result.model_dump(mode="json")})
+        except DeadlineExceeded as e:
+            print(f"ERROR in /analyze/stream: {e}")
+            await events.put({"event": "error", "status": 504, "detail": f"Analysis deadline exceeded: {str(e)}"})
+        except UpstreamUnavailableError as e:
+            print(f"ERROR in /analyze/stream: {e}")
+            await events.put({
+                "event": "error", "status": 503,
+                "detail": f"Analysis temporarily unavailable: {str(e)}",
+                "retry_after": int(e.retry_after) + 1
+            })
+        except Exception as e:
+            print(f"ERROR in /analyze/stream: {e}")
+            await events.put({"event": "error", "status": 500, "detail": f"Analysis failed: {str(e)}"})
+        finally:
+            await events.put(None)
+
+    async def stream():
+        task = asyncio.create_task(produce())
+        try:
+            while (event := await events.get()) is not None:
+                yield json.dumps(event) + "\n"
+        finally:
+            task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 class AddArticleRequest(BaseModel):
     title: str
@@ -119,6 +332,57 @@ async def add_knowledge_base_article(request: AddArticleRequest):
     except Exception as e:
         # Include the actual error message for easier debugging
         raise HTTPException(status_code=500, detail=f"Add article failed: {e}")
+class AddArticlesRequest(BaseModel):
+    articles: List[AddArticleRequest]
+
+@app.post("/add-articles")
+async def add_knowledge_base_articles(request: AddArticlesRequest):
+    """
+    Adds a batch of articles in one encode and insert pass. Articles whose
+    source_url is already in the knowledge base (or repeated in the batch) are skipped.
+    """
+    try:
+        unique = {}
+        for article in request.articles:
+            key = article.source_url or f"untitled:{len(unique)}"
+            unique.setdefault(key, article.model_dump())
+        articles = list(unique.values())
+
+        existing = await services["rag"].existing_source_urls(
+            [article["source_url"] for article in articles if article["source_url"]]
+        )
+        new_articles = [article for article in articles if article["source_url"] not in existing]
+        added = await services["rag"].add_articles(new_articles) if new_articles else 0
+        if added is None:
+            raise HTTPException(status_code=500, detail="Failed to add articles to knowledge base.")
+        # Articles stored by a concurrent request after the lookup are skipped by the insert itself
+        return {"status": "success", "added": added, "duplicates": len(request.articles) - added}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Add articles failed: {e}")
+
+
+@app.post("/add-articles/bulk")
+async def bulk_add_knowledge_base_articles(file: UploadFile = File(...)):
+    """Streams an NDJSON/JSONL upload of articles into the knowledge base in batches."""
+    async def lines():
+        remainder = b""
+        while chunk := await file.read(1024 * 1024):
+            remainder += chunk
+            *complete, remainder = remainder.split(b"\n")
+            for line in complete:
+                yield line
+        if remainder:
+            yield remainder
+
+    try:
+        stats = await KnowledgeBaseIngestor(services["rag"]).ingest_lines(lines())
+        return {"status": "success", **stats.as_dict()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk import failed: {e}")
+
+
 @app.post("/ocr")
 async def extract_text_from_image(request: OCRRequest):
     """Extract text from image using a public URL"""
@@ -137,6 +401,20 @@ async def transcribe_video(request: TranscriptionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
+@app.post("/extract-url", dependencies=[Depends(require_admin)])
+async def extract_url(request: URLExtractionRequest):
+    """
+    Fetch a linked page and extract its article text (cached by canonical URL).
+    Admin-only: it returns the fetched text, so it must not be an open fetch proxy.
+    """
+    try:
+        article = await services["url_extractor"].extract(request.url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"URL extraction failed: {str(e)}")
+    if article is None:
+        raise HTTPException(status_code=422, detail="No article text could be extracted from the URL")
+    return article
+
 @app.post("/search")
 async def search_knowledge_base(request: RAGRequest):
     """Search knowledge base for similar content"""
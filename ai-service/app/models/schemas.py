@@ -8,12 +8,17 @@ class AnalysisRequest(BaseModel):
     content: str
     content_type: str  # 'text', 'url', 'image', 'video'
     file_url: Optional[str] = None # Changed from file_path
+    source_url: Optional[str] = None # Linked page of a 'url' claim; fetched and extracted
+    extracted_text: Optional[str] = None # Cached extraction output; skips OCR/transcription
+    checkpoints: Optional[Dict[str, Any]] = None # Stage outputs of an earlier attempt, e.g. "context"
 
 class EvidenceItem(BaseModel):
     source: str
     excerpt: str
     credibility_score: Optional[float]
     url: Optional[str]
+    excerpt_start: Optional[int] = None # Offsets of the excerpt (without "...") in its document's content
+    excerpt_end: Optional[int] = None
 
 class AnalysisResponse(BaseModel):
     verdict: str
@@ -21,7 +26,12 @@ class AnalysisResponse(BaseModel):
     summary: str
     evidence: List[EvidenceItem]
     sources: List[Dict[str, Any]]
+    documents: List[Dict[str, Any]] = [] # Per source: dedup key, content and its hash (see ClaimClassifier)
     reasoning: str
+    extracted_text: Optional[str] = None
+    stage_timings: Optional[Dict[str, Dict[str, Any]]] = None # Per-stage status, start and duration (ms)
+    degraded: bool = False # Some stages were skipped or cut short by their deadline
+    degraded_stages: List[str] = []
 
 class OCRRequest(BaseModel):
     image_url: str # Changed from image_path
@@ -29,6 +39,9 @@ class OCRRequest(BaseModel):
 class TranscriptionRequest(BaseModel):
     video_url: str # Changed from video_path
 
+class URLExtractionRequest(BaseModel):
+    url: str
+
 class RAGRequest(BaseModel):
     query: str
     top_k: int = 5
\ No newline at end of file
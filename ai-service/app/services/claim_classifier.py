@@ -4,70 +4,129 @@ from bs4 import BeautifulSoup
 import httpx
 import asyncio
 import os
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Callable, Awaitable, AsyncIterator, Tuple
 import logging
 import json
 import re
+import hashlib
+
+from app.services.upstream_guard import UpstreamGuard, UpstreamUnavailableError
+from app.services.streaming_json import PartialJSONFieldParser
+from app.services.context_builder import ContextBuilder, best_passages
+from app.services.llm_backends import LLMBackend, build_backends
+from app.services.nli_verifier import NLIVerifier
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.singleflight import flight, flight_key
+from app.services.url_extraction import canonicalize_url
 
 logger = logging.getLogger(__name__)
 
+# Receives early analysis fields (verdict, confidence_score, summary) while the LLM is still writing
+PartialCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Source text returned for storage; evidence offsets only point inside this prefix
+SOURCE_CONTENT_MAX_CHARS = int(os.getenv("SOURCE_CONTENT_MAX_CHARS", 20000))
+
 class ClaimClassifier:
     """Service for analyzing and classifying fact-checking claims."""
     
     # The __init__ method should be first for clarity.
-    def __init__(self):
+    def __init__(self, context_builder: Optional[ContextBuilder] = None,
+                 verifier: Optional[NLIVerifier] = None):
         """Initialize claim classifier, loading credentials from environment."""
-        self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
-        self.model_name = os.getenv("MODEL_NAME", "openai/gpt-4o")
         # Key for Serper.dev live web search integration
         self.serper_api_key = os.getenv("SERPER_API_KEY")
+        # Client-side limits so bursts queue here instead of hitting upstream 429s
+        self.openrouter_guard = UpstreamGuard.from_env("openrouter", rate=2.0, burst=5, concurrency=4)
+        self.serper_guard = UpstreamGuard.from_env("serper", rate=5.0, burst=10, concurrency=5)
+        # Verdict models in fallback order (OpenRouter, then a local model if configured)
+        self.llm_backends = build_backends(self.openrouter_guard)
+        # Ranks passages and packs the prompt to a token budget; None keeps the plain snippet context
+        self.context_builder = context_builder
+        # Local entailment check that answers clear-cut claims without the LLM; None always asks the LLM
+        self.verifier = verifier if verifier is not None and verifier.enabled else None
+        self._shadow_tasks = set()
+        self.stream_metrics = {"streams": 0, "first_verdict_seconds": 0.0, "total_seconds": 0.0}
 
 
     # This is the main public method of the class.
-    async def analyze_claim(self, claim_text: str, retrieved_context: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def analyze_claim(self, claim_text: str, retrieved_context: List[Dict[str, Any]],
+                            on_partial: Optional[PartialCallback] = None,
+                            web_context: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Orchestrates the full analysis of a claim, performing a live web search if needed.
+        If `on_partial` is given, it is awaited with early fields as they stream in.
+        `web_context` carries web results the caller already fetched (the analysis
+        pipeline searches speculatively); when given, no search is run here.
         """
         try:
             final_context = retrieved_context
 
+            if web_context is not None:
+                final_context = retrieved_context + web_context
             # Check if the context from the internal DB is sufficient.
-            if self._is_context_weak(retrieved_context):
+            elif self.is_context_weak(retrieved_context):
                 logger.info(f"Internal context is weak for claim '{claim_text}'. Performing live web search...")
-                web_context = await self._perform_live_web_search(claim_text)
+                web_context = await self.perform_live_web_search(claim_text)
                 # Combine internal and web results.
                 final_context = retrieved_context + web_context
 
-            context_text = self._prepare_context(final_context)
-            analysis_result = await self._call_llm_for_analysis(claim_text, context_text)
+            context_text, passages = await self._prepare_context(claim_text, final_context)
+            assessment = await self._assess_with_verifier(claim_text, final_context, passages)
+            if assessment is not None and assessment["decided"]:
+                # Decided locally in milliseconds; the result follows at once, so nothing is streamed early
+                analysis_result = self.verifier.build_result(assessment, final_context)
+                if self.verifier.should_shadow():
+                    self._start_shadow_check(claim_text, context_text, assessment)
+                passages = self.verifier.evidence_passages(assessment)
+            else:
+                analysis_result = await self._call_llm_for_analysis(claim_text, context_text, on_partial)
+                if assessment is not None and self._has_llm():
+                    self.verifier.record_llm_verdict(assessment, analysis_result.get("verdict"))
             
-            evidence = self._extract_evidence(final_context)
+            evidence = self._extract_evidence(final_context, passages)
             sources = self._prepare_sources(final_context)
             
             # Combine all parts into the final response
             final_result = analysis_result.copy()
             final_result["evidence"] = evidence
             final_result["sources"] = sources
+            final_result["documents"] = self._source_documents(final_context)
             return final_result
             
+        except (UpstreamUnavailableError, DeadlineExceeded):
+            # Surface upstream outages and expired deadlines to the caller instead of inventing a verdict
+            raise
         except Exception as e:
             logger.error(f"Claim analysis pipeline failed: {str(e)}", exc_info=True)
             return self._get_fallback_analysis()
 
     # --- All helper methods below are correctly indented to be part of the class ---
 
-    def _is_context_weak(self, context: List[Dict[str, Any]]) -> bool:
+    def is_context_weak(self, context: List[Dict[str, Any]]) -> bool:
         """Checks if the retrieved context is sufficient."""
         if not context or len(context) < 2:
             return True
         
-        scores = [article.get('similarity', 0) for article in context]
+        # An exact lexical match (names, numbers, places) counts as strong evidence too
+        scores = [
+            max(article.get('similarity', 0), article.get('lexical_score', 0))
+            for article in context
+        ]
         average_similarity = sum(scores) / len(scores) if scores else 0
         
         return average_similarity < 0.75
 
-    async def _perform_live_web_search(self, claim_text: str) -> List[Dict[str, Any]]:
+    async def perform_live_web_search(self, claim_text: str) -> List[Dict[str, Any]]:
         """Performs a real web search using Serper API and scrapes the content."""
+        # Web search is case-insensitive, so near-identical phrasings share one search too
+        return await flight("web_search", copy_result=True).do(
+            flight_key(claim_text.lower()), lambda: self._perform_live_web_search(claim_text)
+        )
+
+    async def _perform_live_web_search(self, claim_text: str) -> List[Dict[str, Any]]:
         if not self.serper_api_key:
             logger.warning("SERPER_API_KEY not found. Skipping live web search.")
             return []
@@ -77,7 +136,9 @@ class ClaimClassifier:
         
         try:
             async with httpx.AsyncClient() as client:
-                search_response = await client.post("https://google.serper.dev/search", headers=search_headers, content=search_payload, timeout=10.0)
+                search_response = await self.serper_guard.request(
+                    lambda: client.post("https://google.serper.dev/search", headers=search_headers, content=search_payload, timeout=deadline.clamp(10.0))
+                )
                 search_response.raise_for_status()
                 search_results = search_response.json().get("organic", [])
 
@@ -95,7 +156,7 @@ class ClaimClassifier:
         title = search_result.get("title", "Unknown Source")
         try:
             scrape_headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            response = await client.get(url, headers=scrape_headers, follow_redirects=True, timeout=15.0)
+            response = await client.get(url, headers=scrape_headers, follow_redirects=True, timeout=deadline.clamp(15.0))
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'lxml')
@@ -111,8 +172,48 @@ class ClaimClassifier:
             logger.warning(f"Failed to scrape URL {url}: {e}")
             return None
 
-    def _prepare_context(self, retrieved_articles: List[Dict[str, Any]]) -> str:
-        # ... (This method and others below are the same as before, just correctly indented)
+    async def _prepare_context(self, claim: str, retrieved_articles: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Returns the prompt context and the passages selected for it."""
+        if self.context_builder is not None:
+            try:
+                return await self.context_builder.build(claim, retrieved_articles)
+            except Exception as e:
+                logger.error(f"Context builder failed, using plain snippets: {e}")
+        return self._prepare_snippet_context(retrieved_articles), []
+
+    async def _assess_with_verifier(self, claim: str, articles: List[Dict[str, Any]],
+                                    passages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if self.verifier is None or not articles:
+            return None
+        try:
+            return await self.verifier.assess(claim, articles, passages)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"NLI verification failed, deferring to the LLM: {e}")
+            return None
+
+    def _has_llm(self) -> bool:
+        return any(backend.available for backend in self.llm_backends)
+
+    def _start_shadow_check(self, claim: str, context: str, assessment: Dict[str, Any]):
+        """Asks the LLM about a claim the verifier decided, off the response path, to measure agreement."""
+        if not self._has_llm():
+            return
+
+        async def shadow():
+            try:
+                result = await self._call_llm_for_analysis(claim, context)
+                self.verifier.record_llm_verdict(assessment, result.get("verdict"), shadow=True)
+            except Exception as e:
+                # Best effort: an outage or the request's deadline just drops the sample
+                logger.debug(f"NLI shadow check dropped: {e}")
+
+        task = asyncio.create_task(shadow())
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    def _prepare_snippet_context(self, retrieved_articles: List[Dict[str, Any]]) -> str:
         if not retrieved_articles:
             return "No relevant context was found."
         context_parts = []
@@ -125,37 +226,69 @@ class ClaimClassifier:
             )
         return "\n---\n".join(context_parts)
     
-    async def _call_llm_for_analysis(self, claim: str, context: str) -> Dict[str, Any]:
-        if self.openrouter_api_key:
-            return await self._real_llm_analysis(claim, context)
-        else:
-            logger.warning("OPENROUTER_API_KEY not set. Using simulated LLM analysis.")
-            return await self._simulate_llm_analysis(claim)
-    
-    async def _real_llm_analysis(self, claim: str, context: str) -> Dict[str, Any]:
-        try:
-            prompt = self._build_analysis_prompt(claim, context)
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers={"Authorization": f"Bearer {self.openrouter_api_key}"},
-                    json={
-                        "model": self.model_name,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "response_format": {"type": "json_object"},
-                        "temperature": 0.2,
-                        "max_tokens": 1500
-                    },
-                    timeout=90.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                return self._parse_llm_response(content)
-        except Exception as e:
-            logger.error(f"Real LLM analysis failed, falling back to simulation: {str(e)}")
+    async def _call_llm_for_analysis(self, claim: str, context: str,
+                                     on_partial: Optional[PartialCallback] = None) -> Dict[str, Any]:
+        """
+        Tries each configured LLM backend in order, moving on when one is
+        unavailable (not loaded, circuit open, retries exhausted, queue full).
+        A backend that already streamed part of a verdict is not replaced,
+        since the caller has seen its output.
+        """
+        backends = [backend for backend in self.llm_backends if backend.available]
+        if not backends:
+            logger.warning("No LLM backend configured. Using simulated LLM analysis.")
             return await self._simulate_llm_analysis(claim)
+
+        prompt = self._build_analysis_prompt(claim, context)
+        for index, backend in enumerate(backends):
+            streamed = []
+
+            async def tracked_partial(fields: Dict[str, Any]):
+                streamed.append(fields)
+                if on_partial:
+                    await on_partial(fields)
+
+            try:
+                return await self._real_llm_analysis(backend, prompt, tracked_partial)
+            except UpstreamUnavailableError as e:
+                if streamed or index == len(backends) - 1:
+                    raise
+                logger.warning(f"LLM backend '{backend.name}' unavailable ({e}); falling back to '{backends[index + 1].name}'")
     
+    async def _real_llm_analysis(self, backend: LLMBackend, prompt: str,
+                                 on_partial: Optional[PartialCallback] = None) -> Dict[str, Any]:
+        """
+        Streams a completion from `backend`. Upstream outages raise
+        UpstreamUnavailableError rather than degrading to a simulated verdict.
+        """
+        started = time.monotonic()
+        content = await self._read_llm_stream(backend.stream(prompt), on_partial, started)
+        self.stream_metrics["streams"] += 1
+        self.stream_metrics["total_seconds"] += time.monotonic() - started
+        return self._parse_llm_response(content)
+
+    async def _read_llm_stream(self, deltas: AsyncIterator[str], on_partial: Optional[PartialCallback],
+                               started: float) -> str:
+        """Accumulates streamed deltas, reporting early fields as soon as they are complete."""
+        parser = PartialJSONFieldParser({"verdict": "string", "confidence_score": "number", "summary": "string"})
+        verdict_sent = False
+        summary_sent = False
+        async for delta in deltas:
+            if not parser.feed(delta):
+                continue
+
+            found = parser.values
+            if not verdict_sent and "verdict" in found and "confidence_score" in found:
+                verdict_sent = True
+                self.stream_metrics["first_verdict_seconds"] += time.monotonic() - started
+                if on_partial:
+                    await on_partial({"verdict": found["verdict"], "confidence_score": found["confidence_score"]})
+            if verdict_sent and not summary_sent and "summary" in found:
+                summary_sent = True
+                if on_partial:
+                    await on_partial(dict(found))
+        return parser.buffer
+
     async def _simulate_llm_analysis(self, claim: str) -> Dict[str, Any]:
         await asyncio.sleep(1)
         return {
@@ -200,17 +333,40 @@ Respond with a JSON object that strictly follows this structure:
                 "reasoning": "Could not parse the structured response from the AI model."
             }
 
-    def _extract_evidence(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _extract_evidence(self, articles: List[Dict[str, Any]],
+                          passages: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        # Prefer the passage that ranked best against the claim over the article's opening
+        best = best_passages(passages or [])
         evidence = []
-        for article in articles[:3]:
-            evidence.append({
+        for index, article in enumerate(articles[:3], 1):
+            content = article.get('content', '')
+            excerpt = best.get(index) or content
+            item = {
                 "source": article.get('title', 'Unknown Source'),
-                "excerpt": article.get('content', '')[:250] + "...",
+                "excerpt": excerpt[:400] + "..." if len(excerpt) > 400 else excerpt,
                 "url": article.get('source_url'),
                 "credibility_score": article.get('similarity', 0.0)
-            })
+            }
+            # Where the excerpt sits in the stored source text, so it can be kept as a reference
+            start = content.find(excerpt[:400], 0, SOURCE_CONTENT_MAX_CHARS) if excerpt else -1
+            if start >= 0:
+                item["excerpt_start"], item["excerpt_end"] = start, start + len(excerpt[:400])
+            evidence.append(item)
         return evidence
     
+    def partial_analysis(self, fields: Dict[str, Any], articles: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Builds a degraded result from streamed fields when the LLM ran out of time."""
+        return {
+            "verdict": fields["verdict"],
+            "confidence_score": fields.get("confidence_score", 0.0),
+            "summary": fields.get("summary", "Analysis was cut short before the model finished."),
+            "reasoning": "The request deadline passed before the model finished its reasoning; "
+                         "the verdict is taken from its partial output.",
+            "evidence": self._extract_evidence(articles),
+            "sources": self._prepare_sources(articles),
+            "documents": self._source_documents(articles),
+        }
+
     def _prepare_sources(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         return [
             {
@@ -220,7 +376,41 @@ Respond with a JSON object that strictly follows this structure:
                 "verified": article.get('verified', False)
             } for article in articles
         ]
+
+    def _source_documents(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Per source (aligned with `sources`): a deduplication key, the canonical
+        URL or, for sources without a link, a hash of title and text, plus the
+        text evidence offsets point into and its hash.
+        """
+        documents = []
+        for article in articles:
+            content = (article.get('content') or '')[:SOURCE_CONTENT_MAX_CHARS]
+            content_hash = hashlib.sha256(content.encode()).hexdigest()
+            try:
+                key = canonicalize_url(article['source_url']) if article.get('source_url') else None
+            except ValueError:
+                key = None
+            if key is None:
+                key = "sha256:" + hashlib.sha256(f"{article.get('title', '')}\n{content}".encode()).hexdigest()
+            documents.append({"key": key, "content": content, "content_hash": content_hash})
+        return documents
     
+    def upstream_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Rate limiter, queueing and circuit breaker metrics for each upstream."""
+        streams = self.stream_metrics["streams"]
+        return {
+            "openrouter": self.openrouter_guard.snapshot(),
+            "serper": self.serper_guard.snapshot(),
+            "llm_backends": {backend.name: backend.snapshot() for backend in self.llm_backends},
+            "nli_verifier": self.verifier.snapshot() if self.verifier else {"enabled": False},
+            "llm_streaming": {
+                "streams": streams,
+                "avg_first_verdict_seconds": round(self.stream_metrics["first_verdict_seconds"] / streams, 3) if streams else None,
+                "avg_total_seconds": round(self.stream_metrics["total_seconds"] / streams, 3) if streams else None,
+            },
+        }
+
     def _get_fallback_analysis(self) -> Dict[str, Any]:
         return {
             "verdict": "uncertain", "confidence_score": 0.1,
@@ -15,6 +15,10 @@ import asyncio
 import logging
 import httpx # Required for downloading files
 
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.singleflight import flight, flight_key
+
 logger = logging.getLogger(__name__)
 
 class OCRService:
@@ -34,23 +38,25 @@ class OCRService:
         Returns:
             Extracted text as a string.
         """
+        # Concurrent requests for the same image share one download and OCR pass
+        return await flight("ocr").do(flight_key(image_url), lambda: self._extract_text(image_url))
+
+    async def _extract_text(self, image_url: str) -> str:
         try:
             # 1. Download the image from the URL
+            deadline.check("image download")
             async with httpx.AsyncClient() as client:
-                response = await client.get(image_url, follow_redirects=True, timeout=30.0)
+                response = await client.get(image_url, follow_redirects=True, timeout=deadline.clamp(30.0))
                 response.raise_for_status() # Raises an exception for 4xx/5xx errors
             
             # 2. Save to a temporary file to be processed
             with tempfile.NamedTemporaryFile(delete=True, suffix=".jpg") as temp_file:
                 temp_file.write(response.content)
                 
-                # 3. Run the blocking OCR process in a separate thread
-                loop = asyncio.get_event_loop()
-                return await loop.run_in_executor(
-                    None, 
-                    self._extract_text_sync, 
-                    temp_file.name
-                )
+                # 3. Run the blocking OCR process on the OCR model pool, within the request deadline
+                return await deadline.run_blocking("ocr", self._extract_text_sync, temp_file.name, pool="ocr")
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"OCR failed for URL {image_url}: {str(e)}")
             return ""
@@ -60,7 +66,10 @@ class OCRService:
         image = cv2.imread(image_path)
         if image is None:
             raise ValueError(f"Could not read image from {image_path}")
-        
+        return self.recognize(image)
+
+    def recognize(self, image) -> str:
+        """Runs OCR on an already decoded BGR image (blocking; call from the OCR pool)"""
         results = self.reader.readtext(image)
         
         extracted_text = [text for (bbox, text, confidence) in results if confidence > 0.4]
@@ -69,14 +78,21 @@ class OCRService:
 class TranscriptionService:
     """Service for transcribing audio from video files"""
     
-    def __init__(self):
-        """Initialize transcription service (e.g., Whisper)"""
+    def __init__(self, video_text=None):
+        """
+        Initialize transcription service (e.g., Whisper)
+
+        Args:
+            video_text: Optional VideoTextExtractor; when given, on-screen text
+                from keyframes is appended to the transcript.
+        """
         # For a real implementation, you would load a model like Whisper here
-        pass
+        self.video_text = video_text
     
     async def transcribe(self, video_url: str) -> str:
         """
         Downloads a video from a URL, extracts audio, and transcribes it.
+        On-screen text is extracted from keyframes concurrently when enabled.
         
         Args:
             video_url: Publicly accessible URL of the video file.
@@ -84,12 +100,16 @@ class TranscriptionService:
         Returns:
             Transcribed text as a string.
         """
+        return await flight("transcription").do(flight_key(video_url), lambda: self._transcribe(video_url))
+
+    async def _transcribe(self, video_url: str) -> str:
         temp_video_path = None
         temp_audio_path = None
         try:
             # 1. Download the video from the URL
+            deadline.check("video download")
             async with httpx.AsyncClient() as client:
-                response = await client.get(video_url, follow_redirects=True, timeout=120.0)
+                response = await client.get(video_url, follow_redirects=True, timeout=deadline.clamp(120.0))
                 response.raise_for_status()
 
             # 2. Save to a temporary video file
@@ -97,34 +117,63 @@ class TranscriptionService:
                 temp_video.write(response.content)
                 temp_video_path = temp_video.name
 
-            # 3. Extract audio from the temporary video file
-            temp_audio_path = await self._extract_audio(temp_video_path)
-            
-            # 4. Transcribe the audio
-            return await self._transcribe_audio(temp_audio_path)
+            # 3. Start on-screen text extraction alongside the audio path
+            screen_task = None
+            if self.video_text is not None:
+                screen_task = asyncio.create_task(self._screen_text(temp_video_path))
+
+            try:
+                # 4. Extract audio from the temporary video file
+                temp_audio_path = await self._extract_audio(temp_video_path)
+
+                # 5. Transcribe the audio
+                deadline.check("transcription")
+                transcript = await self._transcribe_audio(temp_audio_path)
+                screen_text = await screen_task if screen_task is not None else ""
+            finally:
+                # The temporary video is removed below; don't leave keyframe decoding reading it
+                if screen_task is not None and not screen_task.done():
+                    screen_task.cancel()
+
+            if screen_text:
+                return f"{transcript}\n\nOn-screen text:\n{screen_text}"
+            return transcript
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Transcription failed for URL {video_url}: {str(e)}")
             return ""
         finally:
-            # 5. Clean up temporary files
+            # 6. Clean up temporary files
             if temp_video_path and os.path.exists(temp_video_path):
                 os.remove(temp_video_path)
             if temp_audio_path and os.path.exists(temp_audio_path):
                 os.remove(temp_audio_path)
     
+    async def _screen_text(self, video_path: str) -> str:
+        """On-screen text as timestamped lines; failures only lose this part of the result"""
+        try:
+            timeline = await self.video_text.extract(video_path)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"On-screen text extraction failed for {video_path}: {str(e)}")
+            return ""
+        return self.video_text.format_timeline(timeline)
+
     async def _extract_audio(self, video_path: str) -> str:
         """Extracts audio from a local video file to a temporary audio file"""
         with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
             temp_audio_path = temp_audio.name
 
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            None,
-            self._extract_audio_sync,
-            video_path,
-            temp_audio_path
-        )
+        try:
+            await deadline.run_blocking(
+                "audio extraction", self._extract_audio_sync, video_path, temp_audio_path, pool="transcription"
+            )
+        except DeadlineExceeded:
+            os.remove(temp_audio_path)
+            raise
         return temp_audio_path
     
     def _extract_audio_sync(self, video_path: str, audio_path: str):
@@ -0,0 +1,169 @@
+# ai-service/app/services/context_builder.py
+
+"""
+Token-budgeted context assembly for the claim classifier.
+Splits retrieved articles and scraped pages into passages, ranks them
+against the claim and packs the best ones into the prompt.
+"""
+
+import os
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from app.services.text_chunking import split_into_passages, estimate_tokens
+from app.services.resource_manager import resource_manager
+
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class ContextBuilder:
+    """Ranks passages against a claim and packs them up to a token budget."""
+
+    def __init__(self, embedding_model=None):
+        """
+        Args:
+            embedding_model: A loaded SentenceTransformer (shared with the RAG
+                system) used for passage ranking when no reranker is configured.
+        """
+        self.embedding_model = embedding_model
+        self.token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+        self.passage_words = int(os.getenv("CONTEXT_PASSAGE_WORDS", 120))
+        self.max_passages_per_source = int(os.getenv("CONTEXT_MAX_PASSAGES_PER_SOURCE", 3))
+        self._embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_size = int(os.getenv("CONTEXT_EMBEDDING_CACHE_SIZE", 20000))
+
+        self.reranker = None
+        reranker_name = os.getenv("CONTEXT_RERANKER_MODEL")
+        if reranker_name:
+            if CROSS_ENCODER_AVAILABLE:
+                try:
+                    self.reranker = CrossEncoder(reranker_name)
+                except Exception as e:
+                    logger.error(f"Failed to load reranker {reranker_name}: {e}")
+            else:
+                logger.warning("CONTEXT_RERANKER_MODEL set but sentence-transformers is not installed.")
+
+    async def build(self, claim: str, articles: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Returns the packed context text and the selected passages. Passages are
+        labelled with their article's 1-based position so "Source N" citations
+        line up with the sources list.
+        """
+        if not articles:
+            return "No relevant context was found.", []
+
+        passages = []
+        for index, article in enumerate(articles, 1):
+            for text in split_into_passages(article.get("content", ""), max_words=self.passage_words):
+                passages.append({"source_index": index, "text": text})
+        if not passages:
+            return "No relevant context was found.", []
+
+        # Reranker / embedding inference shares the embedding model pool's thread budget
+        scores = await resource_manager.run("embedding", self._score, claim, [p["text"] for p in passages])
+        for passage, score in zip(passages, scores):
+            passage["score"] = float(score)
+
+        selected = self._pack(sorted(passages, key=lambda p: p["score"], reverse=True), articles)
+        return self._render(selected, articles), selected
+
+    # --- Ranking ---
+
+    def _score(self, claim: str, texts: List[str]) -> List[float]:
+        if self.reranker is not None:
+            return list(self.reranker.predict([(claim, text) for text in texts]))
+        if self.embedding_model is not None:
+            return self._embedding_scores(claim, texts)
+        return [self._lexical_score(claim, text) for text in texts]
+
+    def _embedding_scores(self, claim: str, texts: List[str]) -> List[float]:
+        keys = [hashlib.sha1(text.encode()).hexdigest() for text in texts]
+        # Embedding pool workers share the cache; the lock is not held while encoding
+        with self._cache_lock:
+            vectors = {key: self._embedding_cache[key] for key in keys if key in self._embedding_cache}
+            for key in vectors:
+                self._embedding_cache.move_to_end(key)
+        missing = list({key: i for i, key in enumerate(keys) if key not in vectors}.items())
+        to_encode = [claim] + [texts[i] for _, i in missing]
+        encoded = self.embedding_model.encode(to_encode, batch_size=32, normalize_embeddings=True)
+
+        new_vectors = {key: vector for (key, _), vector in zip(missing, encoded[1:])}
+        vectors.update(new_vectors)
+        with self._cache_lock:
+            self._embedding_cache.update(new_vectors)
+            while len(self._embedding_cache) > self._cache_size:
+                self._embedding_cache.popitem(last=False)
+
+        claim_vector = encoded[0]
+        return [float(np.dot(claim_vector, vectors[key])) for key in keys]
+
+    @staticmethod
+    def _lexical_score(claim: str, text: str) -> float:
+        claim_terms = set(re.findall(r"\w+", claim.lower()))
+        if not claim_terms:
+            return 0.0
+        text_terms = set(re.findall(r"\w+", text.lower()))
+        return len(claim_terms & text_terms) / len(claim_terms)
+
+    # --- Packing ---
+
+    def _pack(self, ranked: List[Dict[str, Any]], articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        used_tokens = 0
+        per_source: Dict[int, int] = {}
+        selected = []
+        for passage in ranked:
+            index = passage["source_index"]
+            if per_source.get(index, 0) >= self.max_passages_per_source:
+                continue
+            cost = estimate_tokens(passage["text"])
+            if index not in per_source:
+                # Each newly cited source also costs its header line
+                cost += estimate_tokens(articles[index - 1].get("title", "")) + 10
+            if used_tokens + cost > self.token_budget:
+                continue
+            used_tokens += cost
+            per_source[index] = per_source.get(index, 0) + 1
+            selected.append(passage)
+        return selected
+
+    @staticmethod
+    def _render(selected: List[Dict[str, Any]], articles: List[Dict[str, Any]]) -> str:
+        if not selected:
+            return "No relevant context was found."
+        by_source: Dict[int, List[Dict[str, Any]]] = {}
+        for passage in selected:
+            by_source.setdefault(passage["source_index"], []).append(passage)
+
+        context_parts = []
+        for index in sorted(by_source):
+            article = articles[index - 1]
+            excerpts = "\n...\n".join(p["text"] for p in by_source[index])
+            context_parts.append(
+                f"Source {index} (Similarity: {article.get('similarity', 0):.3f}):\n"
+                f"Title: {article.get('title', 'N/A')}\n"
+                f"Relevant Passages:\n{excerpts}\n"
+            )
+        return "\n---\n".join(context_parts)
+
+
+def best_passages(selected: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Highest-scoring selected passage for each source index."""
+    best: Dict[int, Dict[str, Any]] = {}
+    for passage in selected:
+        current = best.get(passage["source_index"])
+        if current is None or passage["score"] > current["score"]:
+            best[passage["source_index"]] = passage
+    return {index: passage["text"] for index, passage in best.items()}
@@ -0,0 +1,162 @@
+# ai-service/app/services/deadline.py
+
+"""
+Request deadlines propagated from the caller.
+The backend sends its remaining budget in the X-Deadline-Ms header; the
+budget is stored in a context variable so every stage, executor job and
+outbound HTTP call of that request can check it and give up once the caller
+has stopped waiting.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional
+
+from app.services.resource_manager import resource_manager
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+# Leaves time to serialize and send the (possibly degraded) response before the caller gives up
+SAFETY_MARGIN_SECONDS = float(os.getenv("DEADLINE_SAFETY_MARGIN_MS", 500)) / 1000
+
+
+class Deadline:
+    """
+    Expiry of a deadline scope. It is read each time it is checked, so a
+    scope nested in a shared deadline follows it when it is extended.
+    """
+
+    def __init__(self, expires_at: Optional[float] = None, parent: Optional["Deadline"] = None):
+        self._expires_at = expires_at
+        self.parent = parent
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        inherited = self.parent.expires_at if self.parent is not None else None
+        if inherited is None:
+            return self._expires_at
+        if self._expires_at is None:
+            return inherited
+        return min(inherited, self._expires_at)
+
+
+class SharedDeadline(Deadline):
+    """
+    Deadline of work done on behalf of several callers: the latest of the
+    deadlines of the callers currently waiting, or none if one of them has none.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.waiters: List[Optional[Deadline]] = []
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        latest = None
+        for waiter in self.waiters:
+            expires_at = waiter.expires_at if waiter is not None else None
+            if expires_at is None:
+                return None
+            latest = expires_at if latest is None else max(latest, expires_at)
+        return latest
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before `stage` could finish."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+def parse_deadline_header(value: Optional[str]) -> Optional[float]:
+    """Converts an X-Deadline-Ms value (remaining milliseconds) into a budget in seconds."""
+    if not value:
+        return None
+    try:
+        budget = float(value) / 1000 - SAFETY_MARGIN_SECONDS
+    except ValueError:
+        return None
+    return max(budget, 0.0)
+
+
+@contextmanager
+def deadline_scope(budget_seconds: Optional[float]):
+    """Applies a deadline to the current task and every task it spawns; None means unbounded."""
+    if budget_seconds is None:
+        yield
+        return
+    token = _current.set(Deadline(time.monotonic() + budget_seconds, parent=_current.get()))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def shared_scope(shared: SharedDeadline):
+    """Replaces the current deadline with `shared`, for starting work that several callers wait on."""
+    token = _current.set(shared)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Deadline]:
+    """The current task's deadline, or None when the request has none."""
+    return _current.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None when the request has none."""
+    current_deadline = _current.get()
+    expires_at = current_deadline.expires_at if current_deadline is not None else None
+    if expires_at is None:
+        return None
+    return max(expires_at - time.monotonic(), 0.0)
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str):
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+def clamp(timeout: Optional[float], reserve: float = 0.0) -> Optional[float]:
+    """
+    Caps a stage or HTTP timeout to the remaining budget, keeping `reserve`
+    seconds of it back for work that has to happen afterwards.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    left = max(left - reserve, 0.0)
+    return left if timeout is None else min(timeout, left)
+
+
+async def run_blocking(stage: str, func: Callable[..., Any], *args, pool: Optional[str] = None) -> Any:
+    """
+    Runs `func` within the remaining budget, on the named model pool of the
+    resource manager or else the default executor. A job still queued when
+    the deadline passes is cancelled before it starts; one already running
+    is abandoned and its result discarded.
+    """
+    check(stage)
+    if pool is not None:
+        job = resource_manager.run(pool, func, *args)
+    else:
+        job = asyncio.get_event_loop().run_in_executor(None, func, *args)
+    try:
+        return await asyncio.wait_for(job, remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage)
@@ -0,0 +1,104 @@
+# ai-service/app/services/embedding_backend.py
+
+"""
+Embedding model wrapper with faster CPU inference options.
+Supports ONNX Runtime or int8 dynamic quantization of the encoder, and
+Matryoshka-style truncation of the output dimension.
+"""
+
+import os
+import logging
+from typing import List, Optional, Union
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+    EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    EMBEDDINGS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'sentence-transformers/all-mpnet-base-v2'
+
+
+class EmbeddingBackend:
+    """
+    Drop-in replacement for the parts of SentenceTransformer the service uses
+    (`encode` and the multi-process pool helpers).
+
+    Backends:
+        torch: the stock fp32 model.
+        int8:  torch dynamic quantization of every Linear layer (no extra dependencies).
+        onnx:  ONNX Runtime via sentence-transformers' ONNX backend (needs `optimum[onnxruntime]`).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, backend: str = "torch",
+                 dimension: Optional[int] = None):
+        self.model_name = model_name
+        self.backend = backend
+        self.model = self._load(model_name, backend)
+        native_dimension = self.model.get_sentence_embedding_dimension()
+        self.dimension = min(dimension or native_dimension, native_dimension)
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingBackend":
+        dimension = os.getenv("EMBEDDING_DIM")
+        return cls(
+            model_name=os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+            backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+            dimension=int(dimension) if dimension else None,
+        )
+
+    def _load(self, model_name: str, backend: str):
+        if backend == "onnx":
+            try:
+                return SentenceTransformer(model_name, backend="onnx")
+            except (TypeError, ImportError, ValueError) as e:
+                # Older sentence-transformers or missing optimum/onnxruntime
+                logger.warning(f"ONNX backend unavailable ({e}); falling back to int8 quantization.")
+                backend = "int8"
+
+        model = SentenceTransformer(model_name)
+        if backend == "int8":
+            import torch
+            transformer = model[0]
+            transformer.auto_model = torch.quantization.quantize_dynamic(
+                transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            self.backend = "int8"
+        elif backend != "torch":
+            logger.warning(f"Unknown EMBEDDING_BACKEND '{backend}'; using torch.")
+            self.backend = "torch"
+        return model
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _postprocess(self, vectors: np.ndarray, normalize_embeddings: bool) -> np.ndarray:
+        truncated = vectors.shape[-1] > self.dimension
+        if truncated:
+            vectors = vectors[..., :self.dimension]
+        # Truncated Matryoshka vectors must be renormalized to stay comparable
+        if normalize_embeddings or truncated:
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors.astype(np.float32, copy=False)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        vectors = self.model.encode(sentences, batch_size=batch_size, convert_to_numpy=True, **kwargs)
+        return self._postprocess(vectors, normalize_embeddings)
+
+    def start_multi_process_pool(self, target_devices: List[str]):
+        return self.model.start_multi_process_pool(target_devices)
+
+    def encode_multi_process(self, sentences: List[str], pool, batch_size: int = 32,
+                             normalize_embeddings: bool = False) -> np.ndarray:
+        vectors = self.model.encode_multi_process(sentences, pool, batch_size=batch_size)
+        return self._postprocess(vectors, normalize_embeddings)
+
+    @staticmethod
+    def stop_multi_process_pool(pool):
+        SentenceTransformer.stop_multi_process_pool(pool)
@@ -0,0 +1,185 @@
+# ai-service/app/services/kb_ingestion.py
+
+"""
+Bulk knowledge-base ingestion from JSONL/NDJSON.
+Each line is one article: {"title": ..., "content": ..., "source_url": ...,
+"source_type": ..., "verified": ...}. Articles are indexed in large batches
+and progress can be checkpointed so interrupted imports resume where they
+stopped. Each batch is one transaction that skips articles already stored
+(by source_url, or by title and content when they have none), so resuming
+from an older checkpoint, or after a crash between a batch's commit and its
+checkpoint, adds no duplicates.
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services.rag_system import RAGSystem
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = int(os.getenv("KB_IMPORT_BATCH_SIZE", 256))
+
+
+def parse_article_line(line: bytes) -> Optional[Dict[str, Any]]:
+    """Parses one JSONL line into an article dict, or None if it is blank or invalid."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(record, dict) or not record.get("title") or not record.get("content"):
+        return None
+    return {
+        "title": str(record["title"]),
+        "content": str(record["content"]),
+        "source_url": record.get("source_url"),
+        "source_type": record.get("source_type", "fact-check"),
+        "verified": bool(record.get("verified", True)),
+    }
+
+
+class IngestionStats:
+    """
+    Running totals for an import, including throughput. `processed` counts
+    every article committed this run, new or duplicate, so a resumed import
+    that mostly re-reads stored articles still shows its real speed.
+    """
+
+    def __init__(self, rows: int = 0):
+        self.started_at = time.monotonic()
+        self.rows = rows
+        self.new_rows = 0
+        self.processed = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    def _per_second(self, count: int) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return count / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self._per_second(self.new_rows)
+
+    @property
+    def processed_per_second(self) -> float:
+        return self._per_second(self.processed)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "added": self.new_rows,
+            "processed": self.processed,
+            "total_rows": self.rows,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "rows_per_second": round(self.rows_per_second, 1),
+            "processed_per_second": round(self.processed_per_second, 1),
+        }
+
+
+class KnowledgeBaseIngestor:
+    """Streams articles into the RAG system in batches."""
+
+    def __init__(self, rag: RAGSystem, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.rag = rag
+        self.batch_size = batch_size
+
+    async def _flush(self, batch: List[Dict[str, Any]], stats: IngestionStats) -> Optional[int]:
+        """Adds a batch; returns how many articles were new, or None if the batch failed."""
+        added = await self.rag.add_articles(batch)
+        if added is None:
+            stats.failed += len(batch)
+            return None
+        stats.new_rows += added
+        stats.processed += len(batch)
+        stats.rows += added
+        stats.duplicates += len(batch) - added
+        return added
+
+    async def ingest_lines(self, lines: AsyncIterator[bytes]) -> IngestionStats:
+        """Ingests articles from an async stream of JSONL lines (used by the upload endpoint)."""
+        stats = IngestionStats()
+        batch: List[Dict[str, Any]] = []
+        async for line in lines:
+            article = parse_article_line(line)
+            if article is None:
+                stats.skipped += 1 if line.strip() else 0
+                continue
+            batch.append(article)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, stats)
+                batch = []
+        if batch:
+            await self._flush(batch, stats)
+        return stats
+
+    async def ingest_file(self, path: str, checkpoint_path: Optional[str] = None,
+                          report_every: float = 10.0) -> IngestionStats:
+        """
+        Ingests a JSONL file, resuming from and updating `checkpoint_path`.
+        The checkpoint records the byte offset after the last committed batch.
+        """
+        offset, rows = self._load_checkpoint(checkpoint_path, path)
+        stats = IngestionStats(rows)
+        if offset:
+            logger.info(f"Resuming {path} at byte {offset} ({rows} rows already imported).")
+
+        last_report = time.monotonic()
+        batch: List[Dict[str, Any]] = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                article = parse_article_line(line)
+                if article is None:
+                    stats.skipped += 1 if line.strip() else 0
+                    continue
+                batch.append(article)
+                if len(batch) < self.batch_size:
+                    continue
+
+                if await self._flush(batch, stats) is None:
+                    # Stop without advancing the checkpoint so a rerun retries this batch
+                    raise RuntimeError(f"Batch ending at byte {offset} failed; rerun to resume.")
+                batch = []
+                self._save_checkpoint(checkpoint_path, path, offset, stats.rows)
+                if time.monotonic() - last_report >= report_every:
+                    last_report = time.monotonic()
+                    logger.info(
+                        f"{stats.rows} rows imported ({stats.rows_per_second:.1f} new rows/sec, "
+                        f"{stats.processed_per_second:.1f} processed rows/sec)"
+                    )
+
+        if batch and await self._flush(batch, stats) is None:
+            raise RuntimeError("Final batch failed; rerun to resume.")
+        self._save_checkpoint(checkpoint_path, path, offset, stats.rows)
+        return stats
+
+    @staticmethod
+    def _load_checkpoint(checkpoint_path: Optional[str], path: str) -> Tuple[int, int]:
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return 0, 0
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("path") != os.path.abspath(path):
+            logger.warning("Checkpoint belongs to a different file; starting from the beginning.")
+            return 0, 0
+        return int(checkpoint.get("offset", 0)), int(checkpoint.get("rows", 0))
+
+    @staticmethod
+    def _save_checkpoint(checkpoint_path: Optional[str], path: str, offset: int, rows: int):
+        if not checkpoint_path:
+            return
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"path": os.path.abspath(path), "offset": offset, "rows": rows}, f)
+        # Atomic replace so a crash never leaves a half-written checkpoint
+        os.replace(temp_path, checkpoint_path)
@@ -0,0 +1,103 @@
+# ai-service/app/services/lexical_index.py
+
+"""
+In-memory BM25 inverted index over the knowledge base.
+Complements dense retrieval with exact matches on names, numbers and places,
+which embeddings tend to blur.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+# Keeps decimals and thousands separators together ("4.5", "1,000") so numbers match exactly
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Incrementally maintained Okapi BM25 index keyed by document id."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        # Updates come from a refresh thread while searches run elsewhere
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Indexes a document, replacing any previous version with the same id."""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, tf in counts.items():
+                self.postings[term][doc_id] = tf
+            length = sum(counts.values())
+            self.doc_lengths[doc_id] = length
+            self.total_length += length
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str):
+        if doc_id not in self.doc_lengths:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in [t for t, docs in self.postings.items() if doc_id in docs]:
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float, float]]:
+        """
+        Returns (doc_id, bm25_score, coverage) for the top `k` documents.
+        `coverage` is the IDF-weighted fraction of query terms the document
+        contains, a 0-1 measure of how completely it matches the query.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self.doc_lengths:
+                return []
+            avg_length = self.total_length / len(self.doc_lengths)
+            idfs = {term: self._idf(term) for term in terms}
+            total_idf = sum(idfs.values()) or 1.0
+
+            scores: Dict[str, float] = defaultdict(float)
+            matched_idf: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                idf = idfs[term]
+                for doc_id, tf in self.postings.get(term, {}).items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched_idf[doc_id] += idf
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(doc_id, score, matched_idf[doc_id] / total_idf) for doc_id, score in top]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """Fuses ranked id lists: each list contributes 1 / (k + rank) per document."""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return fused
@@ -0,0 +1,289 @@
+# ai-service/app/services/llm_backends.py
+
+"""
+Pluggable LLM backends for claim verdicts.
+Every backend streams text deltas for a prompt. The classifier tries them
+in LLM_BACKENDS order, so a local model can keep producing verdicts when
+OpenRouter is not configured or is down. "local" is either a llama.cpp
+server (LOCAL_LLM_URL; it batches concurrent requests itself) or a GGUF
+model loaded in-process with llama-cpp-python (LOCAL_LLM_MODEL_PATH).
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.services import deadline
+from app.services.resource_manager import resource_manager
+from app.services.upstream_guard import UpstreamGuard, UpstreamUnavailableError
+
+try:
+    from llama_cpp import Llama, LlamaGrammar
+    LLAMA_CPP_AVAILABLE = True
+except ImportError:
+    LLAMA_CPP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Constrains local generation to the verdict object, in the field order the
+# partial parser streams early (verdict and confidence first, then summary)
+VERDICT_GRAMMAR = r'''
+root       ::= "{" ws "\"verdict\"" ws ":" ws verdict "," ws "\"confidence_score\"" ws ":" ws score "," ws "\"summary\"" ws ":" ws string "," ws "\"reasoning\"" ws ":" ws string ws "}"
+verdict    ::= "\"true\"" | "\"false\"" | "\"misleading\"" | "\"uncertain\""
+score      ::= "0" ("." [0-9] [0-9]?)? | "1" (".0")?
+string     ::= "\"" ( [^"\\\x00-\x1f] | "\\" ["\\/bfnrtu] )* "\""
+ws         ::= [ \t\n]*
+'''
+
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "verdict": {"type": "string", "enum": ["true", "false", "misleading", "uncertain"]},
+        "confidence_score": {"type": "number", "minimum": 0, "maximum": 1},
+        "summary": {"type": "string"},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["verdict", "confidence_score", "summary", "reasoning"],
+}
+
+
+class LLMBackend:
+    """Streams a completion for a prompt as text deltas."""
+
+    name = "llm"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {}
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Streamed chat completions from an OpenAI-style endpoint (OpenRouter, llama.cpp server)."""
+
+    # Answers that say this backend cannot serve us (bad key, no credit, unknown model, rate
+    # limited) rather than that the request was bad; the next backend should be tried
+    UNAVAILABLE_STATUS = {401, 402, 403, 404, 429}
+
+    def __init__(self, name: str, url: str, model: str, guard: UpstreamGuard,
+                 api_key: Optional[str] = None, response_format: Optional[Dict[str, Any]] = None,
+                 requires_key: bool = True, max_tokens: int = 1500):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.guard = guard
+        self.api_key = api_key
+        self.response_format = response_format or {"type": "json_object"}
+        self.requires_key = requires_key
+        self.max_tokens = max_tokens
+
+    @property
+    def available(self) -> bool:
+        return bool(self.url) and (bool(self.api_key) or not self.requires_key)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        async with httpx.AsyncClient() as client:
+            request = client.build_request(
+                "POST", self.url, headers=headers,
+                json={
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "response_format": self.response_format,
+                    "temperature": 0.2,
+                    "max_tokens": self.max_tokens,
+                    "stream": True
+                },
+                timeout=deadline.clamp(90.0)
+            )
+            response = await self.guard.request(lambda: client.send(request, stream=True))
+            try:
+                if response.status_code in self.UNAVAILABLE_STATUS:
+                    raise UpstreamUnavailableError(self.name, f"HTTP {response.status_code}")
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    # Server-sent events: payload lines start with "data:", others are keep-alives
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(payload).get("choices") or [{}]
+                        delta = choices[0].get("delta", {}).get("content") or ""
+                    except (json.JSONDecodeError, AttributeError):
+                        continue
+                    if delta:
+                        yield delta
+            finally:
+                await response.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "http", "model": self.model, **self.guard.snapshot()}
+
+
+class LocalLlamaBackend(LLMBackend):
+    """
+    A GGUF model loaded once in-process. llama-cpp-python decodes one
+    sequence at a time, so generations run one after another on the "llm"
+    model pool; beyond LOCAL_LLM_QUEUE_SIZE pending generations, requests are
+    rejected as unavailable rather than queued past any useful deadline.
+    Output is constrained by a JSON grammar, so it always parses.
+    """
+
+    name = "local"
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.context_size = int(os.getenv("LOCAL_LLM_CONTEXT", 4096))
+        self.threads = int(os.getenv("LOCAL_LLM_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+        self.max_tokens = int(os.getenv("LOCAL_LLM_MAX_TOKENS", 768))
+        self.max_queue = int(os.getenv("LOCAL_LLM_QUEUE_SIZE", 8))
+        self.model = None
+        self.grammar = None
+        self.load_error: Optional[str] = None
+        self.pending = 0
+        self.metrics = {
+            "requests": 0, "completed": 0, "failed": 0, "rejected": 0, "cancelled": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+            "decode_seconds": 0.0, "first_token_seconds": 0.0,
+        }
+
+    @property
+    def available(self) -> bool:
+        return self.load_error is None
+
+    def load(self):
+        """Loads the model (blocking, seconds to minutes); called once at startup on the llm pool."""
+        try:
+            self.model = Llama(model_path=self.model_path, n_ctx=self.context_size,
+                               n_threads=self.threads, verbose=False)
+            self.grammar = LlamaGrammar.from_string(VERDICT_GRAMMAR, verbose=False)
+            logger.info(f"Local LLM loaded from {self.model_path} ({self.threads} threads)")
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"Failed to load local LLM {self.model_path}: {e}")
+
+    async def start(self):
+        await resource_manager.run("llm", self.load)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        if self.model is None:
+            raise UpstreamUnavailableError(self.name, self.load_error or "model is still loading")
+        if self.pending >= self.max_queue:
+            self.metrics["rejected"] += 1
+            raise UpstreamUnavailableError(self.name, f"{self.pending} generations already queued", retry_after=5.0)
+
+        loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def generate():
+            started = time.perf_counter()
+            first_token = None
+            tokens = 0
+            try:
+                for chunk in self.model.create_chat_completion(
+                    messages=[{"role": "user", "content": prompt}], grammar=self.grammar,
+                    temperature=0.2, max_tokens=self.max_tokens, stream=True,
+                ):
+                    # Set when the caller went away (deadline, disconnect); frees the model early
+                    if stop.is_set():
+                        break
+                    text = chunk["choices"][0].get("delta", {}).get("content")
+                    if not text:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    tokens += 1
+                    loop.call_soon_threadsafe(deltas.put_nowait, text)
+            finally:
+                loop.call_soon_threadsafe(deltas.put_nowait, done)
+            if first_token is not None:
+                self.metrics["first_token_seconds"] += first_token - started
+                self.metrics["decode_seconds"] += time.perf_counter() - first_token
+            self.metrics["completion_tokens"] += tokens
+            self.metrics["prompt_tokens"] += len(self.model.tokenize(prompt.encode()))
+
+        self.pending += 1
+        self.metrics["requests"] += 1
+        job = asyncio.ensure_future(resource_manager.run("llm", generate))
+        try:
+            while True:
+                delta = await deltas.get()
+                if delta is done:
+                    break
+                yield delta
+            # Surfaces an exception raised inside the generation thread
+            await job
+            self.metrics["completed"] += 1
+        except asyncio.CancelledError:
+            self.metrics["cancelled"] += 1
+            raise
+        except Exception:
+            self.metrics["failed"] += 1
+            raise
+        finally:
+            self.pending -= 1
+            stop.set()
+            # Drops the job if it is still queued behind other generations
+            job.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        decode = self.metrics["decode_seconds"]
+        completed = self.metrics["completed"]
+        return {
+            "type": "in-process",
+            "model_path": self.model_path,
+            "loaded": self.model is not None,
+            "load_error": self.load_error,
+            "pending": self.pending,
+            "max_queue": self.max_queue,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.metrics.items()},
+            "tokens_per_second": round(self.metrics["completion_tokens"] / decode, 2) if decode else None,
+            "avg_first_token_seconds": round(self.metrics["first_token_seconds"] / completed, 3) if completed else None,
+        }
+
+
+def build_backends(openrouter_guard: UpstreamGuard) -> List[LLMBackend]:
+    """Backends in the order set by LLM_BACKENDS (default "openrouter,local"), skipping unconfigured ones."""
+    backends: List[LLMBackend] = []
+    for name in [n.strip() for n in os.getenv("LLM_BACKENDS", "openrouter,local").split(",") if n.strip()]:
+        if name == "openrouter":
+            backend = OpenAICompatibleBackend(
+                "openrouter", "https://openrouter.ai/api/v1/chat/completions",
+                model=os.getenv("MODEL_NAME", "openai/gpt-4o"), guard=openrouter_guard,
+                api_key=os.getenv("OPENROUTER_API_KEY"),
+            )
+        elif name == "local" and os.getenv("LOCAL_LLM_URL"):
+            # llama.cpp's server runs concurrent requests in parallel slots with continuous batching
+            backend = OpenAICompatibleBackend(
+                "local", os.getenv("LOCAL_LLM_URL").rstrip("/") + "/v1/chat/completions",
+                model=os.getenv("LOCAL_LLM_MODEL", "local"),
+                guard=UpstreamGuard.from_env("local_llm", rate=50.0, burst=50, concurrency=4),
+                api_key=os.getenv("LOCAL_LLM_API_KEY"), requires_key=False,
+                response_format={"type": "json_object", "schema": VERDICT_SCHEMA},
+                max_tokens=int(os.getenv("LOCAL_LLM_MAX_TOKENS", 768)),
+            )
+        elif name == "local" and os.getenv("LOCAL_LLM_MODEL_PATH"):
+            if not LLAMA_CPP_AVAILABLE:
+                logger.warning("LOCAL_LLM_MODEL_PATH set but llama-cpp-python is not installed.")
+                continue
+            backend = LocalLlamaBackend(os.getenv("LOCAL_LLM_MODEL_PATH"))
+        else:
+            continue
+        if backend.available:
+            backends.append(backend)
+    return backends
@@ -0,0 +1,209 @@
+# ai-service/app/services/nli_verifier.py
+
+"""
+First-pass claim verification with a local NLI cross-encoder.
+Each retrieved passage is scored for entailment / contradiction against the
+claim in one batched pass. When the sources agree strongly enough, the
+verdict is produced here and the LLM call is skipped; otherwise the claim
+goes to the LLM as before. A sample of skipped claims is still sent to the
+LLM in the background, and every LLM verdict is compared with what the
+verifier leaned towards, so NLI_CONFIDENCE_THRESHOLD can be tuned from the
+agreement metrics.
+"""
+
+import os
+import random
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services import deadline
+from app.services.text_chunking import split_into_passages
+
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Label order of the cross-encoder/nli-* models, used when the config has no id2label
+DEFAULT_LABELS = ("contradiction", "entailment", "neutral")
+NLI_VERDICTS = {"entailment": "true", "contradiction": "false"}
+AGREEMENT_BUCKETS = (0.5, 0.7, 0.8, 0.9, 0.95, 0.99)
+
+
+class NLIVerifier:
+    """
+    Scores claim/passage pairs with an NLI cross-encoder and decides
+    clear-cut claims. Disabled unless NLI_MODEL names a model. Tunables (env):
+        NLI_CONFIDENCE_THRESHOLD  combined confidence needed to skip the LLM
+        NLI_PASSAGE_THRESHOLD     probability at which one passage counts as a vote
+        NLI_MAX_PASSAGES          passages scored per claim
+        NLI_SHADOW_RATE           fraction of skipped claims still checked by the LLM
+    """
+
+    def __init__(self):
+        self.model = None
+        self.labels = DEFAULT_LABELS
+        self.confidence_threshold = float(os.getenv("NLI_CONFIDENCE_THRESHOLD", 0.97))
+        self.passage_threshold = float(os.getenv("NLI_PASSAGE_THRESHOLD", 0.9))
+        self.max_passages = int(os.getenv("NLI_MAX_PASSAGES", 24))
+        self.batch_size = int(os.getenv("NLI_BATCH_SIZE", 16))
+        self.shadow_rate = float(os.getenv("NLI_SHADOW_RATE", 0.05))
+        self.metrics = {"evaluated": 0, "decided": 0, "shadow_checks": 0, "shadow_agreed": 0}
+        # Per confidence bucket: how often the verifier's leaning matched the LLM verdict
+        self.agreement: Dict[str, Dict[str, int]] = {}
+
+        model_name = os.getenv("NLI_MODEL")
+        if model_name:
+            if CROSS_ENCODER_AVAILABLE:
+                try:
+                    self.model = CrossEncoder(model_name)
+                    id2label = getattr(self.model.model.config, "id2label", None) or {}
+                    if id2label:
+                        self.labels = tuple(id2label[i].lower() for i in sorted(id2label))
+                except Exception as e:
+                    logger.error(f"Failed to load NLI model {model_name}: {e}")
+            else:
+                logger.warning("NLI_MODEL set but sentence-transformers is not installed.")
+
+    @property
+    def enabled(self) -> bool:
+        return self.model is not None
+
+    # --- Scoring ---
+
+    def _predict(self, claim: str, texts: List[str]) -> np.ndarray:
+        logits = np.asarray(self.model.predict([(text, claim) for text in texts], batch_size=self.batch_size))
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def _candidate_passages(self, articles: List[Dict[str, Any]],
+                            passages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The context builder's selected passages, or the opening passages of each article."""
+        if passages:
+            candidates = [{"source_index": p["source_index"], "text": p["text"]} for p in passages]
+        else:
+            candidates = [
+                {"source_index": index, "text": text}
+                for index, article in enumerate(articles, 1)
+                for text in split_into_passages(article.get("content", ""))[:3]
+            ]
+        return candidates[:self.max_passages]
+
+    async def assess(self, claim: str, articles: List[Dict[str, Any]],
+                     passages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the verifier's leaning: {"label", "verdict", "confidence",
+        "decided", "votes"}; None if there is nothing to score.
+        The premise is the passage and the hypothesis the claim, as NLI models expect.
+        """
+        candidates = self._candidate_passages(articles, passages)
+        if not candidates:
+            return None
+        # Shares the embedding pool's thread budget with the reranker
+        probabilities = await deadline.run_blocking(
+            "nli", self._predict, claim, [c["text"] for c in candidates], pool="embedding"
+        )
+        self.metrics["evaluated"] += 1
+
+        # Each source votes with its strongest passage for a label
+        best: Dict[str, Dict[int, Dict[str, Any]]] = {"entailment": {}, "contradiction": {}}
+        for candidate, probs in zip(candidates, probabilities):
+            for label in best:
+                p = float(probs[self.labels.index(label)])
+                current = best[label].get(candidate["source_index"])
+                if current is None or p > current["probability"]:
+                    best[label][candidate["source_index"]] = {**candidate, "probability": p}
+
+        def combined(label: str) -> float:
+            # Noisy-OR over independent sources: agreement across sources raises confidence
+            miss = 1.0
+            for vote in best[label].values():
+                miss *= 1 - vote["probability"]
+            return 1 - miss
+
+        strength = {label: combined(label) for label in best}
+        label = max(strength, key=strength.get)
+        other = "contradiction" if label == "entailment" else "entailment"
+        votes = sorted(
+            (v for v in best[label].values() if v["probability"] >= self.passage_threshold),
+            key=lambda v: v["probability"], reverse=True,
+        )
+        # Any source leaning the other way sends the claim to the LLM
+        conflicted = any(v["probability"] >= 0.5 for v in best[other].values())
+        confidence = strength[label] * (1 - max((v["probability"] for v in best[other].values()), default=0.0))
+        decided = bool(votes) and not conflicted and confidence >= self.confidence_threshold
+        if decided:
+            self.metrics["decided"] += 1
+        return {
+            "label": label, "verdict": NLI_VERDICTS[label], "confidence": round(confidence, 4),
+            "decided": decided, "votes": votes,
+        }
+
+    # --- Output ---
+
+    def build_result(self, assessment: Dict[str, Any], articles: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Verdict, templated summary and reasoning for a decided claim (evidence is added by the classifier)."""
+        votes = assessment["votes"]
+        verb = "support" if assessment["label"] == "entailment" else "contradict"
+        lead = articles[votes[0]["source_index"] - 1].get("title", "a retrieved source")
+        count = len(votes)
+        summary = (f"{count} retrieved source{'s' if count != 1 else ''} directly {verb} this claim, "
+                   f"including \"{lead}\".")
+        quotes = [
+            f"Source {vote['source_index']} ({vote['probability']:.0%} {assessment['label']}): \"{vote['text'][:300]}\""
+            for vote in votes[:3]
+        ]
+        reasoning = (
+            f"The retrieved evidence was clear-cut, so this verdict comes from an automated entailment check "
+            f"rather than a full model review. Passages that {verb} the claim:\n" + "\n".join(quotes)
+        )
+        return {
+            "verdict": assessment["verdict"],
+            "confidence_score": round(min(assessment["confidence"], 0.99), 2),
+            "summary": summary,
+            "reasoning": reasoning,
+        }
+
+    def evidence_passages(self, assessment: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Deciding passages in the shape the classifier's evidence extraction expects."""
+        return [{"source_index": v["source_index"], "text": v["text"], "score": v["probability"]}
+                for v in assessment["votes"]]
+
+    def should_shadow(self) -> bool:
+        return random.random() < self.shadow_rate
+
+    # --- Agreement tracking ---
+
+    def record_llm_verdict(self, assessment: Dict[str, Any], llm_verdict: str, shadow: bool = False):
+        """Compares the verifier's leaning with the LLM verdict for the claim."""
+        agreed = assessment["verdict"] == llm_verdict
+        bucket_floor = max((b for b in AGREEMENT_BUCKETS if assessment["confidence"] >= b), default=0.0)
+        bucket = self.agreement.setdefault(f">={bucket_floor}", {"count": 0, "agreed": 0})
+        bucket["count"] += 1
+        bucket["agreed"] += int(agreed)
+        if shadow:
+            self.metrics["shadow_checks"] += 1
+            self.metrics["shadow_agreed"] += int(agreed)
+        if shadow and not agreed:
+            logger.info(f"NLI verdict '{assessment['verdict']}' ({assessment['confidence']:.3f}) "
+                        f"disagreed with the LLM verdict '{llm_verdict}'")
+
+    def snapshot(self) -> Dict[str, Any]:
+        evaluated = self.metrics["evaluated"]
+        shadow = self.metrics["shadow_checks"]
+        return {
+            "enabled": self.enabled,
+            "confidence_threshold": self.confidence_threshold,
+            **self.metrics,
+            "cascade_rate": round(self.metrics["decided"] / evaluated, 4) if evaluated else None,
+            "shadow_agreement": round(self.metrics["shadow_agreed"] / shadow, 4) if shadow else None,
+            "agreement_by_confidence": {
+                bucket: {**stats, "rate": round(stats["agreed"] / stats["count"], 4)}
+                for bucket, stats in sorted(self.agreement.items())
+            },
+        }
@@ -0,0 +1,339 @@
+# ai-service/app/services/pipeline.py
+
+"""
+Small DAG executor for the analyze flow.
+Stages start as soon as their dependencies finish, so independent work
+(media extraction, retrieval on the raw claim, speculative web search)
+overlaps and end-to-end latency tracks the slowest path instead of the sum
+of every stage.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+_REQUIRED = object()
+
+# Retrieval fields kept in a context checkpoint; article text is reloaded from the knowledge base
+_CHECKPOINT_RETRIEVAL_FIELDS = ("similarity", "lexical_score", "retrieval_score", "passage")
+# Scraped pages can be huge; checkpoints keep enough of each for the context builder
+_CHECKPOINT_WEB_CHARS = 20000
+
+# How each kind of extracted text is introduced to retrieval and the classifier
+_EXTRACTION_LABELS = {
+    "image": "Extracted text from image",
+    "video": "Transcription from video",
+    "url": "Article text from linked page",
+}
+
+
+class StageTimeoutError(Exception):
+    """A required stage did not finish within its deadline."""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' exceeded its {timeout:.1f}s deadline")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class Stage:
+    """
+    One node of the pipeline. `run` receives the PipelineRun and may read the
+    results of its dependencies from `run.results`. Stages with a `default`
+    are optional: a timeout, error or cancellation yields the default instead
+    of failing the whole run. Stage timeouts are capped by the request
+    deadline, less `reserve` seconds kept back for the stages that follow.
+    """
+
+    def __init__(self, name: str, run: Callable[["PipelineRun"], Awaitable[Any]],
+                 deps: Iterable[str] = (), timeout: Optional[float] = None, default: Any = _REQUIRED,
+                 reserve: float = 0.0):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.default = default
+        self.reserve = reserve
+
+    @property
+    def required(self) -> bool:
+        return self.default is _REQUIRED
+
+
+class PipelineRun:
+    """Executes a set of stages once, tracking per-stage status and timings."""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages {missing}")
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._inner: Dict[str, asyncio.Future] = {}
+        self._cancelled: set = set()
+        self.degraded_stages: List[str] = []
+        self._started_at = 0.0
+
+    def cancel(self, name: str):
+        """Abandons an optional stage; anything waiting on it gets the stage default."""
+        if self.stages[name].required:
+            raise ValueError(f"Stage '{name}' is required and cannot be cancelled")
+        self._cancelled.add(name)
+        inner = self._inner.get(name)
+        if inner is not None and not inner.done():
+            inner.cancel()
+
+    async def result(self, name: str) -> Any:
+        """Waits for another stage that is not a declared dependency (e.g. a speculative one)."""
+        # Shielded so a waiter that gets cancelled does not cancel the stage itself
+        await asyncio.shield(self._tasks[name])
+        return self.results[name]
+
+    async def execute(self) -> Dict[str, Any]:
+        self._started_at = time.perf_counter()
+        self._tasks = {name: asyncio.ensure_future(self._execute(stage)) for name, stage in self.stages.items()}
+        try:
+            await asyncio.gather(*self._tasks.values())
+        except BaseException:
+            for task in self._tasks.values():
+                task.cancel()
+            raise
+        return self.results
+
+    async def _execute(self, stage: Stage):
+        for dep in stage.deps:
+            await self._tasks[dep]
+
+        started = time.perf_counter()
+        status = "ok"
+        if stage.name in self._cancelled:
+            result, status = stage.default, "cancelled"
+        elif deadline.expired():
+            # No budget left: skip optional work entirely
+            if stage.required:
+                raise DeadlineExceeded(stage.name)
+            result, status = stage.default, "deadline"
+        else:
+            inner = asyncio.ensure_future(stage.run(self))
+            self._inner[stage.name] = inner
+            try:
+                result = await asyncio.wait_for(inner, deadline.clamp(stage.timeout, stage.reserve))
+            except (asyncio.TimeoutError, DeadlineExceeded):
+                out_of_budget = deadline.expired()
+                if stage.required:
+                    if out_of_budget:
+                        raise DeadlineExceeded(stage.name)
+                    raise StageTimeoutError(stage.name, stage.timeout)
+                logger.warning(f"Pipeline stage '{stage.name}' ran out of time; using default.")
+                result, status = stage.default, "deadline" if out_of_budget else "timeout"
+            except asyncio.CancelledError:
+                # Only swallow cancellations requested through cancel(), not those of the whole run
+                if stage.name not in self._cancelled:
+                    raise
+                result, status = stage.default, "cancelled"
+            except Exception as e:
+                if stage.required:
+                    raise
+                logger.warning(f"Pipeline stage '{stage.name}' failed: {e}; using default.")
+                result, status = stage.default, "error"
+
+        finished = time.perf_counter()
+        self.results[stage.name] = result
+        if status in ("timeout", "deadline", "error"):
+            self.degraded_stages.append(stage.name)
+        self.timings[stage.name] = {
+            "status": status,
+            "start_ms": round((started - self._started_at) * 1000, 1),
+            "duration_ms": round((finished - started) * 1000, 1),
+        }
+
+
+def merge_retrieval(*result_sets: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
+    """Merges search_similar results from several queries, keeping each article's best score."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for results in result_sets:
+        for article in results or []:
+            key = str(article.get("id") or article.get("title"))
+            current = merged.get(key)
+            if current is None or article.get("retrieval_score", 0) > current.get("retrieval_score", 0):
+                merged[key] = article
+    ranked = sorted(merged.values(), key=lambda a: a.get("retrieval_score", a.get("similarity", 0)), reverse=True)
+    return ranked[:top_k]
+
+
+class AnalysisPipeline:
+    """
+    The /analyze flow as a DAG:
+
+        extract ──────────► retrieve_extracted ─┐
+        retrieve_raw ───────────────────────────┼─► context ─► classify
+        web_search (speculative) ···············┘
+
+    Web search starts immediately on the raw claim text and is cancelled as
+    soon as the internal context turns out strong. "extract" is OCR for
+    images, transcription for videos and article extraction for URL claims. Stage deadlines come from
+    PIPELINE_*_TIMEOUT (seconds) and are capped by the request deadline.
+    When the deadline cuts off optional stages or the LLM after it has
+    streamed a verdict, a degraded result is returned instead of an error.
+    """
+
+    def __init__(self, ocr, transcription, rag, classifier, url_extractor=None):
+        # Stage outputs can be checkpointed through `on_checkpoint` and handed back in
+        # `checkpoints` on a retry, which then skips extraction, retrieval and web search
+        self.ocr = ocr
+        self.transcription = transcription
+        self.rag = rag
+        self.classifier = classifier
+        self.url_extractor = url_extractor
+        self.extract_timeout = float(os.getenv("PIPELINE_EXTRACT_TIMEOUT", 180))
+        self.retrieval_timeout = float(os.getenv("PIPELINE_RETRIEVAL_TIMEOUT", 10))
+        self.web_search_timeout = float(os.getenv("PIPELINE_WEB_SEARCH_TIMEOUT", 20))
+        self.classify_timeout = float(os.getenv("PIPELINE_CLASSIFY_TIMEOUT", 120))
+        # Budget optional stages must leave for the LLM when the request has a deadline
+        self.classify_reserve = float(os.getenv("PIPELINE_CLASSIFY_RESERVE", 15))
+
+    async def run(self, content: str, content_type: str, file_url: Optional[str] = None,
+                  extracted_text: Optional[str] = None, on_partial=None,
+                  checkpoints: Optional[Dict[str, Any]] = None, on_checkpoint=None,
+                  source_url: Optional[str] = None) -> Dict[str, Any]:
+        """Returns the classifier result plus `extracted_text`, `stage_timings` and degradation flags."""
+        streamed: Dict[str, Any] = {}
+        saved_context = (checkpoints or {}).get("context")
+
+        async def checkpoint(stage: str, output: Dict[str, Any]):
+            if on_checkpoint:
+                await on_checkpoint(stage, output)
+
+        async def record_partial(fields: Dict[str, Any]):
+            streamed.update(fields)
+            if on_partial:
+                await on_partial(fields)
+
+        needs_extraction = extracted_text is None and (
+            (file_url and content_type in ("image", "video"))
+            or (source_url and content_type == "url" and self.url_extractor is not None)
+        )
+        # A URL claim submitted as the bare link has no text of its own to search with
+        claim_text = "" if content_type == "url" and content.strip() == (source_url or "").strip() else content
+        # A media claim with no caption has nothing to search for until extraction finishes
+        speculative_search = bool(claim_text.strip()) and saved_context is None
+
+        async def extract(run: PipelineRun) -> Optional[str]:
+            if not needs_extraction:
+                return extracted_text
+            if content_type == "image":
+                text = await self.ocr.extract_text(file_url)
+            elif content_type == "url":
+                article = await self.url_extractor.extract(source_url)
+                text = self.url_extractor.format_article(article) if article else None
+            else:
+                text = await self.transcription.transcribe(file_url)
+            # Empty output usually means a failed download; let a retry try again
+            if text:
+                await checkpoint("extract", {"extracted_text": text})
+            return text
+
+        def full_content(run: PipelineRun) -> str:
+            text = run.results["extract"]
+            if text is None:
+                return content
+            return f"{content}\n\n{_EXTRACTION_LABELS.get(content_type, 'Extracted text')}: {text}"
+
+        async def retrieve_raw(run: PipelineRun) -> List[Dict[str, Any]]:
+            if saved_context is not None or not claim_text.strip():
+                return []
+            return await self.rag.search_similar(claim_text)
+
+        async def retrieve_extracted(run: PipelineRun) -> List[Dict[str, Any]]:
+            if saved_context is not None or run.results["extract"] is None:
+                return []
+            return await self.rag.search_similar(full_content(run))
+
+        async def web_search(run: PipelineRun) -> List[Dict[str, Any]]:
+            if saved_context is not None:
+                return []
+            query = claim_text if speculative_search else full_content(run)
+            return await self.classifier.perform_live_web_search(query)
+
+        async def context(run: PipelineRun) -> Dict[str, Any]:
+            if saved_context is not None:
+                return await self._restore_context(saved_context)
+            retrieved = merge_retrieval(run.results["retrieve_raw"], run.results["retrieve_extracted"])
+            if not self.classifier.is_context_weak(retrieved):
+                run.cancel("web_search")
+                web = []
+            else:
+                logger.info("Internal context is weak; waiting for the live web search.")
+                web = await run.result("web_search")
+            # A context cut short by a timeout should be rebuilt on retry, not frozen
+            if not run.degraded_stages:
+                await checkpoint("context", self._context_checkpoint(retrieved, web))
+            return {"retrieved": retrieved, "web": web}
+
+        async def classify(run: PipelineRun) -> Dict[str, Any]:
+            ctx = run.results["context"]
+            return await self.classifier.analyze_claim(
+                claim_text=full_content(run),
+                retrieved_context=ctx["retrieved"],
+                on_partial=record_partial,
+                web_context=ctx["web"],
+            )
+
+        run = PipelineRun([
+            Stage("extract", extract, timeout=self.extract_timeout),
+            Stage("retrieve_raw", retrieve_raw, timeout=self.retrieval_timeout, default=[],
+                  reserve=self.classify_reserve),
+            Stage("retrieve_extracted", retrieve_extracted, deps=("extract",),
+                  timeout=self.retrieval_timeout, default=[], reserve=self.classify_reserve),
+            Stage("web_search", web_search, deps=() if speculative_search else ("extract",),
+                  timeout=self.web_search_timeout, default=[], reserve=self.classify_reserve),
+            Stage("context", context, deps=("retrieve_raw", "retrieve_extracted")),
+            Stage("classify", classify, deps=("context",), timeout=self.classify_timeout),
+        ])
+        try:
+            results = await run.execute()
+        except DeadlineExceeded as e:
+            # The verdict already streamed is still worth more to the caller than an error
+            if e.stage != "classify" or "verdict" not in streamed:
+                raise
+            logger.warning("Deadline hit during classification; returning the streamed verdict.")
+            results = dict(run.results)
+            results["classify"] = self.classifier.partial_analysis(streamed, run.results["context"]["retrieved"])
+            run.degraded_stages.append("classify")
+        finally:
+            logger.info(f"Analysis pipeline timings: {run.timings}")
+
+        return {
+            **results["classify"],
+            "extracted_text": results["extract"],
+            "stage_timings": run.timings,
+            "degraded": bool(run.degraded_stages),
+            "degraded_stages": run.degraded_stages,
+        }
+
+    @staticmethod
+    def _context_checkpoint(retrieved: List[Dict[str, Any]], web: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "retrieved": [
+                {"id": str(article["id"]), **{f: article[f] for f in _CHECKPOINT_RETRIEVAL_FIELDS if f in article}}
+                for article in retrieved if article.get("id") is not None
+            ],
+            "web": [{**page, "content": page.get("content", "")[:_CHECKPOINT_WEB_CHARS]} for page in web],
+        }
+
+    async def _restore_context(self, saved: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuilds a checkpointed context, reloading article text from the knowledge base."""
+        scores = {entry["id"]: entry for entry in saved.get("retrieved", [])}
+        articles = await self.rag.get_articles(list(scores))
+        retrieved = [{**article, **scores[str(article["id"])]} for article in articles]
+        return {"retrieved": retrieved, "web": saved.get("web", [])}
@@ -6,17 +6,22 @@ Handles similarity search against a persistent vector database (pgvector)
 """
 
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
+import hashlib
 import logging
 import os
+from datetime import datetime, timedelta
 from supabase import create_client, Client
 
-try:
-    from sentence_transformers import SentenceTransformer
-    EMBEDDINGS_AVAILABLE = True
-except ImportError:
-    EMBEDDINGS_AVAILABLE = False
+from app.services.text_chunking import split_into_passages
+from app.services.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.services.embedding_backend import EmbeddingBackend, EMBEDDINGS_AVAILABLE
+from app.services.resource_manager import resource_manager
+from app.services import deadline
+from app.services.singleflight import flight, flight_key
+
+if not EMBEDDINGS_AVAILABLE:
     logging.warning("Sentence transformers not available. RAG system will not function.")
 
 logger = logging.getLogger(__name__)
@@ -33,10 +38,32 @@ class RAGSystem:
             return
 
         try:
-            # Load the model name from an environment variable
-            model_name = os.getenv("EMBEDDING_MODEL", 'sentence-transformers/all-mpnet-base-v2')
-            self.embedding_model = SentenceTransformer(model_name)
+            # EMBEDDING_MODEL / EMBEDDING_BACKEND / EMBEDDING_DIM select the encoder;
+            # EMBEDDING_DIM must match the vector column width in the database
+            self.embedding_model = EmbeddingBackend.from_env()
             self.embeddings_enabled = True
+
+            # Passages stay under the encoder's 384-token window so nothing is truncated
+            self.passage_words = int(os.getenv("KB_PASSAGE_WORDS", 200))
+            self.passage_overlap = int(os.getenv("KB_PASSAGE_OVERLAP", 40))
+            self.encode_batch_size = int(os.getenv("KB_ENCODE_BATCH_SIZE", 64))
+            self._encode_pool = None
+
+            # Dense results are over-fetched below the old 0.7 cut-off and fused with BM25
+            self.dense_threshold = float(os.getenv("RAG_DENSE_THRESHOLD", 0.5))
+            self.candidate_multiplier = int(os.getenv("RAG_CANDIDATE_MULTIPLIER", 3))
+            # "binary" shortlists on the Hamming index and rescores with full vectors in the database
+            self.dense_search_function = (
+                'match_passages_binary' if os.getenv("RAG_VECTOR_SEARCH", "float") == "binary"
+                else 'match_passages'
+            )
+            # The BM25 index holds the whole knowledge base in every worker process, at
+            # roughly 10-20 KB per 400-word article (10-20 GB per million articles).
+            # Set RAG_LEXICAL_INDEX=false on large corpora; search is then dense-only.
+            self.lexical_index = BM25Index() if os.getenv("RAG_LEXICAL_INDEX", "true").lower() == "true" else None
+            # created_at rows are read from on the next refresh, minus the overlap window
+            self._lexical_seen_until: Optional[datetime] = None
+            self.lexical_overlap = timedelta(seconds=float(os.getenv("RAG_LEXICAL_OVERLAP_SECONDS", 600)))
             
             # Initialize a Supabase client to interact with the vector database
             supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
@@ -51,33 +78,109 @@ class RAGSystem:
     
     async def search_similar(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
-        Encodes a query and searches for similar articles in the vector database.
+        Hybrid search: dense passage similarity fused with BM25 via reciprocal-rank fusion.
         
         Args:
             query: Query text to search for.
             top_k: Number of top results to return.
             
         Returns:
-            A list of similar articles with their similarity scores.
+            A list of similar articles with their similarity scores. Each result
+            also carries `lexical_score` (0-1 query-term coverage) and the fused
+            `retrieval_score` it was ranked by.
         """
+        # Identical concurrent queries share one search; each caller gets its own copy
+        return await flight("rag_search", copy_result=True).do(
+            flight_key(query, top_k), lambda: self._search_similar(query, top_k)
+        )
+
+    async def _search_similar(self, query: str, top_k: int) -> List[Dict[str, Any]]:
         if not self.embeddings_enabled:
             logger.warning("Search failed: Embeddings are not enabled.")
             return []
 
+        candidates = top_k * self.candidate_multiplier
+        loop = asyncio.get_event_loop()
+        dense_task = asyncio.ensure_future(self._dense_search(query, candidates))
+        lexical_hits = []
+        if self.lexical_index is not None:
+            lexical_hits = await loop.run_in_executor(None, self.lexical_index.search, query, candidates)
+        dense_hits = await dense_task
+
         try:
-            # Generate embedding for the query
-            loop = asyncio.get_event_loop()
-            query_embedding = await loop.run_in_executor(
-                None,
-                self.embedding_model.encode,
-                query
+            by_id: Dict[str, Dict[str, Any]] = {str(row['id']): dict(row) for row in dense_hits}
+            lexical_coverage = {doc_id: coverage for doc_id, _, coverage in lexical_hits}
+            fused = reciprocal_rank_fusion([
+                [str(row['id']) for row in dense_hits],
+                [doc_id for doc_id, _, _ in lexical_hits],
+            ])
+            ranked_ids = sorted(fused, key=fused.get, reverse=True)[:top_k]
+
+            # Lexical-only hits still need their article fields
+            missing = [doc_id for doc_id in ranked_ids if doc_id not in by_id]
+            if missing:
+                for row in self._fetch_articles(missing):
+                    by_id[str(row['id'])] = {**row, 'similarity': 0.0}
+
+            results = []
+            for doc_id in ranked_ids:
+                if doc_id not in by_id:
+                    continue
+                article = by_id[doc_id]
+                article['lexical_score'] = lexical_coverage.get(doc_id, 0.0)
+                article['retrieval_score'] = fused[doc_id]
+                results.append(article)
+            return results
+
+        except Exception as e:
+            logger.error(f"Hybrid search failed: {str(e)}")
+            return dense_hits[:top_k]
+
+    async def get_articles(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """Loads knowledge base articles by id, in the order given (missing ids are skipped)."""
+        if not self.embeddings_enabled or not ids:
+            return []
+        loop = asyncio.get_event_loop()
+        rows = await loop.run_in_executor(None, self._fetch_articles, ids)
+        by_id = {str(row['id']): row for row in rows}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    async def existing_source_urls(self, urls: List[str]) -> set:
+        """Returns which of `urls` already belong to an article in the knowledge base."""
+        if not self.embeddings_enabled or not urls:
+            return set()
+
+        def fetch() -> set:
+            found = set()
+            for start in range(0, len(urls), 500):
+                rows = self.supabase.table('knowledge_base').select(
+                    'source_url'
+                ).in_('source_url', urls[start:start + 500]).execute().data or []
+                found.update(row['source_url'] for row in rows)
+            return found
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, fetch)
+
+    def _fetch_articles(self, ids: List[str]) -> List[Dict[str, Any]]:
+        return self.supabase.table('knowledge_base').select(
+            'id, title, content, source_url, source_type, verified'
+        ).in_('id', ids).execute().data or []
+
+    async def _dense_search(self, query: str, match_count: int) -> List[Dict[str, Any]]:
+        try:
+            # Generate embedding for the query on the embedding model pool
+            query_embedding = await deadline.run_blocking(
+                "query embedding",
+                lambda: self.embedding_model.encode(query, normalize_embeddings=True),
+                pool="embedding"
             )
             
-            # Call the database function to find matching articles
-            result = self.supabase.rpc('match_articles', {
+            # Search passage embeddings; the database aggregates hits back to articles
+            result = self.supabase.rpc(self.dense_search_function, {
                 'query_embedding': query_embedding.tolist(),
-                'match_threshold': 0.7,  # Adjust this threshold as needed
-                'match_count': top_k
+                'match_threshold': self.dense_threshold,
+                'match_count': match_count
             }).execute()
 
             return result.data if result.data else []
@@ -85,6 +188,56 @@ class RAGSystem:
         except Exception as e:
             logger.error(f"Vector search failed: {str(e)}")
             return []
+
+    async def refresh_lexical_index(self) -> int:
+        """Indexes knowledge-base rows created since the last refresh (all rows on first call)."""
+        if not self.embeddings_enabled or self.lexical_index is None:
+            return 0
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._refresh_lexical_index_sync)
+
+    def _refresh_lexical_index_sync(self, page_size: int = 1000) -> int:
+        # created_at is the inserting transaction's start time, so a long transaction can
+        # commit rows older than ones already seen. Each refresh re-reads ids from an
+        # overlap window before the newest row seen and fetches only those not indexed;
+        # rows from transactions longer than RAG_LEXICAL_OVERLAP_SECONDS can be missed.
+        created_at = "1970-01-01T00:00:00+00:00"
+        if self._lexical_seen_until is not None:
+            created_at = (self._lexical_seen_until - self.lexical_overlap).isoformat()
+        last_id = "00000000-0000-0000-0000-000000000000"
+        indexed = 0
+        while True:
+            # Keyset pagination on (created_at, id): the id breaks ties, so a page boundary
+            # inside a run of rows sharing one timestamp neither skips nor repeats rows
+            rows = self.supabase.table('knowledge_base').select('id, created_at').or_(
+                f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{last_id})'
+            ).order('created_at').order('id').limit(page_size).execute().data or []
+            new_ids = [str(row['id']) for row in rows if str(row['id']) not in self.lexical_index.doc_lengths]
+            # Text is fetched in chunks so the id list stays within URL length limits
+            for start in range(0, len(new_ids), 200):
+                for row in self._fetch_articles(new_ids[start:start + 200]):
+                    self.lexical_index.add(str(row['id']), f"{row['title']} {row['content']}")
+                    indexed += 1
+            if rows:
+                created_at, last_id = rows[-1]['created_at'], str(rows[-1]['id'])
+                seen = datetime.fromisoformat(created_at)
+                if self._lexical_seen_until is None or seen > self._lexical_seen_until:
+                    self._lexical_seen_until = seen
+            if len(rows) < page_size:
+                return indexed
+
+    async def keep_lexical_index_fresh(self, interval: float):
+        """Background loop that picks up articles added by other processes."""
+        if self.lexical_index is None:
+            return
+        while True:
+            try:
+                added = await self.refresh_lexical_index()
+                if added:
+                    logger.info(f"Lexical index: added {added} articles ({len(self.lexical_index)} total).")
+            except Exception as e:
+                logger.error(f"Lexical index refresh failed: {e}")
+            await asyncio.sleep(interval)
     
     async def add_article(self, article: Dict[str, Any]) -> bool:
         """
@@ -94,38 +247,175 @@ class RAGSystem:
             article: Dictionary with title, content, etc.
             
         Returns:
-            True if successful, False otherwise.
+            True if successful (or its source_url is already stored), False otherwise.
+        """
+        return await self.add_articles([article]) is not None
+
+    async def add_articles(self, articles: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Adds a batch of articles, indexing them as overlapping passages.
+
+        All passages in the batch are batch-encoded in one pass. Passages that
+        already exist anywhere in the knowledge base are linked, not re-encoded.
+        Passages, articles and links are written in one transaction, which
+        skips articles already stored (by source_url, or by title and content
+        when they have none), so replaying a batch does not duplicate it.
+
+        Returns:
+            The number of articles added, or None if the batch failed.
         """
         if not self.embeddings_enabled:
-            logger.warning("Could not add article: Embeddings are not enabled.")
-            return False
+            logger.warning("Could not add articles: Embeddings are not enabled.")
+            return None
+        if not articles:
+            return 0
 
         try:
-            # Combine title and content for a richer embedding
-            text_to_embed = f"{article['title']} {article['content']}"
-            
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None,
-                self.embedding_model.encode,
-                text_to_embed
+            article_passages, new_passages, vectors = await self._encode_passages(articles)
+
+            # Articles carry a mean-of-passages embedding for article-level search
+            records = [
+                {
+                    'title': article['title'],
+                    'content': article['content'],
+                    'source_url': article.get('source_url'),
+                    'source_type': article.get('source_type'),
+                    'verified': article.get('verified', False),
+                    'embedding': mean_embedding([vectors[h] for h in hashes]),
+                    'passage_hashes': hashes,
+                }
+                for article, hashes in zip(articles, article_passages)
+            ]
+            inserted = self.supabase.rpc('add_knowledge_base_articles', {
+                'p_passages': new_passages, 'p_articles': records
+            }).execute().data or []
+
+            if self.lexical_index is not None:
+                for row in inserted:
+                    self.lexical_index.add(str(row['id']), f"{row['title']} {row['content']}")
+
+            logger.info(
+                f"Indexed {len(inserted)} articles as {sum(len(h) for h in article_passages)} passages "
+                f"({len(new_passages)} newly encoded)."
             )
-            
-            # Prepare data for insertion into the database
-            db_record = {
-                'title': article['title'],
-                'content': article['content'],
-                'source_url': article.get('source_url'),
-                'source_type': article.get('source_type'),
-                'verified': article.get('verified', False),
-                'embedding': embedding.tolist()
-            }
-            
-            self.supabase.table('knowledge_base').insert(db_record).execute()
-            
-            logger.info(f"Successfully added and indexed article: {article['title']}")
-            return True
+            return len(inserted)
             
         except Exception as e:
-            logger.error(f"Failed to add article to knowledge base: {str(e)}")
-            return False
+            logger.error(f"Failed to add articles to knowledge base: {str(e)}")
+            return None
+
+    async def articles_without_passages(self, limit: int) -> List[Dict[str, Any]]:
+        """Articles stored before passage indexing (id, title, content), oldest first."""
+        if not self.embeddings_enabled:
+            return []
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, lambda: self.supabase.rpc(
+            'knowledge_base_articles_without_passages', {'p_limit': limit}
+        ).execute().data or [])
+
+    async def index_existing_articles(self, articles: List[Dict[str, Any]]) -> int:
+        """
+        Builds passages, links and the mean embedding for articles that are
+        already stored (each needs id, title and content), in one transaction.
+
+        Returns:
+            The number of articles indexed.
+        """
+        if not self.embeddings_enabled or not articles:
+            return 0
+        try:
+            article_passages, new_passages, vectors = await self._encode_passages(articles)
+            records = [
+                {
+                    'id': str(article['id']),
+                    'embedding': mean_embedding([vectors[h] for h in hashes]),
+                    'passage_hashes': hashes,
+                }
+                for article, hashes in zip(articles, article_passages)
+            ]
+            return self.supabase.rpc('index_knowledge_base_articles', {
+                'p_passages': new_passages, 'p_articles': records
+            }).execute().data or 0
+        except Exception as e:
+            logger.error(f"Failed to index existing articles: {str(e)}")
+            return 0
+
+    async def _encode_passages(self, articles: List[Dict[str, Any]]) -> Tuple[List[List[str]], List[Dict[str, Any]], Dict[str, np.ndarray]]:
+        """
+        Splits articles into passages and encodes those the knowledge base has never seen.
+
+        Returns:
+            The passage hashes of each article, rows for the newly encoded
+            passages, and the embedding of every passage by hash.
+        """
+        # Passages are keyed by normalized content hash
+        article_passages = []
+        passage_text: Dict[str, str] = {}
+        for article in articles:
+            passages = split_into_passages(
+                f"{article['title']}. {article['content']}",
+                max_words=self.passage_words, overlap_words=self.passage_overlap
+            )
+            hashes = []
+            for text in passages:
+                digest = passage_hash(text)
+                passage_text.setdefault(digest, text)
+                hashes.append(digest)
+            article_passages.append(hashes)
+
+        existing = self._fetch_passages(list(passage_text))
+        missing = [h for h in passage_text if h not in existing]
+        vectors: Dict[str, np.ndarray] = dict(existing)
+        new_passages: List[Dict[str, Any]] = []
+        if missing:
+            encoded = await resource_manager.run("embedding", self._encode_batch, [passage_text[h] for h in missing])
+            vectors.update(zip(missing, encoded))
+            new_passages = [
+                {'content_hash': h, 'content': passage_text[h], 'embedding': v.tolist()}
+                for h, v in zip(missing, encoded)
+            ]
+        return article_passages, new_passages, vectors
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        if self._encode_pool is not None:
+            return self.embedding_model.encode_multi_process(
+                texts, self._encode_pool, batch_size=self.encode_batch_size, normalize_embeddings=True
+            )
+        return self.embedding_model.encode(
+            texts, batch_size=self.encode_batch_size, normalize_embeddings=True
+        )
+
+    def start_encode_pool(self, processes: int):
+        """Spreads batch encoding across worker processes (for offline bulk imports)."""
+        self._encode_pool = self.embedding_model.start_multi_process_pool(["cpu"] * processes)
+
+    def stop_encode_pool(self):
+        if self._encode_pool is not None:
+            self.embedding_model.stop_multi_process_pool(self._encode_pool)
+            self._encode_pool = None
+
+    def _fetch_passages(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Embeddings of passages that are already stored, keyed by content hash."""
+        found: Dict[str, np.ndarray] = {}
+        for start in range(0, len(hashes), 500):
+            rows = self.supabase.table('knowledge_base_passages').select(
+                'content_hash, embedding'
+            ).in_('content_hash', hashes[start:start + 500]).execute().data or []
+            for row in rows:
+                embedding = row['embedding']
+                # pgvector values come back as a "[x,y,...]" string through PostgREST
+                if isinstance(embedding, str):
+                    embedding = embedding.strip('[]').split(',')
+                found[row['content_hash']] = np.asarray(embedding, dtype=np.float32)
+        return found
+
+
+def passage_hash(text: str) -> str:
+    """Hash of a passage with case and whitespace normalized, used for deduplication."""
+    return hashlib.sha256(" ".join(text.lower().split()).encode()).hexdigest()
+
+
+def mean_embedding(vectors: List[np.ndarray]) -> List[float]:
+    mean = np.mean(np.stack(vectors), axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
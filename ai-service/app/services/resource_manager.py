@@ -0,0 +1,153 @@
+# ai-service/app/services/resource_manager.py
+
+"""
+CPU budget for the torch models sharing this process.
+Each model family (OCR, embeddings, transcription) gets its own bounded
+thread pool, so concurrent requests queue per model instead of
+oversubscribing every core. torch's intra-op thread count is process-wide,
+so it is set once at startup and only the worker counts differ per pool.
+Queue wait and utilization are tracked per pool for tuning the split on a
+given node.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelExecutor:
+    """A bounded thread pool for one model family, with queueing metrics."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-model")
+        self.created_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.metrics = {
+            # "abandoned" jobs were cancelled by their caller while running; they still
+            # finish and count as completed or failed
+            "submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "abandoned": 0,
+            "queued": 0, "running": 0,
+            "wait_seconds": 0.0, "max_wait_seconds": 0.0, "busy_seconds": 0.0,
+        }
+
+    def _update(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self.metrics[key] += delta
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Runs `func(*args)` on this pool; cancelling the await drops the job if it has not started."""
+        submitted_at = time.monotonic()
+
+        def job():
+            began = time.monotonic()
+            wait = began - submitted_at
+            with self._lock:
+                self.metrics["queued"] -= 1
+                self.metrics["running"] += 1
+                self.metrics["wait_seconds"] += wait
+                self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], wait)
+            # The outcome is counted here, not by the caller, so jobs whose caller
+            # stopped waiting are still accounted for
+            outcome = "failed"
+            try:
+                result = func(*args)
+                outcome = "completed"
+                return result
+            finally:
+                self._update(running=-1, busy_seconds=time.monotonic() - began, **{outcome: 1})
+
+        self._update(submitted=1, queued=1)
+        future = self.executor.submit(job)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # wrap_future propagates the cancel; it only succeeds if the job never started
+            if future.cancelled():
+                self._update(queued=-1, cancelled=1)
+            else:
+                self._update(abandoned=1)
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self.metrics)
+        started = metrics["completed"] + metrics["failed"] + metrics["running"]
+        capacity = (time.monotonic() - self.created_at) * self.workers
+        return {
+            "workers": self.workers,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in metrics.items()},
+            "avg_wait_seconds": round(metrics["wait_seconds"] / started, 3) if started else None,
+            "utilization": round(metrics["busy_seconds"] / capacity, 3) if capacity else 0.0,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ResourceManager:
+    """
+    Registry of per-model pools. torch runs every in-flight call with the same
+    intra-op thread count, so the default budget divides the cores by the
+    number of torch workers across the OCR, embedding and transcription pools
+    (TORCH_THREADS overrides it); <NAME>_WORKERS overrides a pool's size.
+    """
+
+    # Pools whose jobs run torch models and so share the process-wide thread budget
+    torch_pools = ("ocr", "embedding", "transcription")
+
+    def __init__(self, cores: Optional[int] = None):
+        self.cores = cores or os.cpu_count() or 1
+        self.defaults = {
+            "ocr": 1,
+            "embedding": 2,
+            "transcription": 1,
+            # Frame decoding for video OCR; cv2, not torch, so one worker is enough
+            "video": 1,
+            # In-process llama.cpp decodes one sequence at a time; its threads are LOCAL_LLM_THREADS
+            "llm": 1,
+        }
+        torch_workers = sum(self.workers(name) for name in self.torch_pools)
+        self.torch_threads = int(os.getenv("TORCH_THREADS", max(1, self.cores // torch_workers)))
+        self.pools: Dict[str, ModelExecutor] = {}
+        self._lock = threading.Lock()
+
+    def workers(self, name: str) -> int:
+        return int(os.getenv(f"{name.upper()}_WORKERS", self.defaults.get(name, 1)))
+
+    def configure_torch(self):
+        """Applies the torch thread budget; call once before any model loads."""
+        try:
+            import torch
+        except ImportError:
+            return
+        torch.set_num_threads(self.torch_threads)
+        logger.info(f"torch intra-op threads: {self.torch_threads} ({self.cores} cores)")
+
+    def pool(self, name: str) -> ModelExecutor:
+        with self._lock:
+            if name not in self.pools:
+                self.pools[name] = ModelExecutor(name, self.workers(name))
+                logger.info(f"Model pool '{name}': {self.pools[name].workers} workers")
+            return self.pools[name]
+
+    async def run(self, name: str, func: Callable[..., Any], *args) -> Any:
+        return await self.pool(name).run(func, *args)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"cores": self.cores, "torch_threads": self.torch_threads, "pools": {name: pool.snapshot() for name, pool in self.pools.items()}}
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+resource_manager = ResourceManager()
@@ -0,0 +1,154 @@
+# ai-service/app/services/singleflight.py
+
+"""
+In-flight request coalescing.
+Concurrent calls with the same key share one running computation and all
+receive its result (or exception), so a burst of identical analyses,
+searches, downloads or web queries does the work once. The computation runs
+until the latest deadline among the callers still waiting, and is cancelled
+only when every one of them has gone away. Progress
+events (streamed verdicts, checkpoints) are fanned out to every caller,
+and replayed to callers that join late.
+"""
+
+import copy
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded, SharedDeadline
+
+logger = logging.getLogger(__name__)
+
+Emit = Callable[[str, Any], Awaitable[None]]
+Listener = Callable[[str, Any], Awaitable[None]]
+
+
+def flight_key(*parts: Any) -> str:
+    """Stable key for JSON-serializable inputs; strings are whitespace-normalized."""
+    normalized = [" ".join(p.split()) if isinstance(p, str) else p for p in parts]
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _Call:
+    __slots__ = ("task", "waiters", "listeners", "events", "deadline")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.deadline = SharedDeadline()
+        self.listeners: List[Listener] = []
+        self.events: List[tuple] = []
+
+    async def emit(self, kind: str, payload: Any):
+        self.events.append((kind, payload))
+        for listener in list(self.listeners):
+            try:
+                await listener(kind, payload)
+            except Exception as e:
+                # One caller's broken stream must not fail the shared computation
+                logger.warning(f"Coalesced listener failed on '{kind}' event: {e}")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls per key. The shared computation is not tied
+    to the caller that started it: it keeps running when that caller is
+    cancelled, and its deadline is the latest of the waiting callers'. Each
+    caller stops waiting at its own deadline.
+    """
+
+    def __init__(self, name: str, copy_result: bool = False):
+        self.name = name
+        # Results that callers may mutate (lists of article dicts) are deep-copied per caller
+        self.copy_result = copy_result
+        self._calls: Dict[str, _Call] = {}
+        self.metrics = {"calls": 0, "executions": 0, "coalesced": 0, "cancelled": 0, "errors": 0, "max_waiters": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs `fn()` unless an identical call is already in flight, then shares its result."""
+        return await self.do_with_events(key, lambda emit: fn())
+
+    async def do_with_events(self, key: str, fn: Callable[[Emit], Awaitable[Any]],
+                             listener: Optional[Listener] = None) -> Any:
+        """
+        Like `do`, but `fn(emit)` may publish progress events; `listener` is
+        awaited with each one, including those emitted before this caller joined.
+        """
+        self.metrics["calls"] += 1
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call()
+            self._calls[key] = call
+            with deadline.shared_scope(call.deadline):
+                call.task = asyncio.ensure_future(fn(call.emit))
+            call.task.add_done_callback(lambda task: self._finished(key, call, task))
+            self.metrics["executions"] += 1
+        else:
+            self.metrics["coalesced"] += 1
+
+        call.waiters += 1
+        caller_deadline = deadline.current()
+        call.deadline.waiters.append(caller_deadline)
+        self.metrics["max_waiters"] = max(self.metrics["max_waiters"], call.waiters)
+        subscribed = False
+        try:
+            if listener:
+                # Catch up on earlier events; the loop re-checks, since more may arrive while replaying
+                replayed = 0
+                while replayed < len(call.events):
+                    kind, payload = call.events[replayed]
+                    replayed += 1
+                    await listener(kind, payload)
+                call.listeners.append(listener)
+                subscribed = True
+            # asyncio.wait never cancels what it waits on: a caller leaving (disconnect,
+            # its own deadline) must not cancel the computation others are waiting on
+            done, _ = await asyncio.wait({call.task}, timeout=deadline.remaining())
+            if not done:
+                raise DeadlineExceeded(self.name)
+            result = call.task.result()
+        finally:
+            call.waiters -= 1
+            call.deadline.waiters.remove(caller_deadline)
+            if subscribed:
+                call.listeners.remove(listener)
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to use the result; stop the work and let the next caller start afresh
+                self.metrics["cancelled"] += 1
+                call.task.cancel()
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+        return copy.deepcopy(result) if self.copy_result else result
+
+    def _finished(self, key: str, call: _Call, task: asyncio.Task):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.metrics["errors"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        executions = self.metrics["executions"]
+        return {
+            **self.metrics,
+            "in_flight": len(self._calls),
+            "waiting": sum(call.waiters for call in self._calls.values()),
+            "coalescing_ratio": round(self.metrics["calls"] / executions, 3) if executions else None,
+        }
+
+
+_flights: Dict[str, SingleFlight] = {}
+
+
+def flight(name: str, copy_result: bool = False) -> SingleFlight:
+    """Returns the named coalescing group, creating it on first use."""
+    if name not in _flights:
+        _flights[name] = SingleFlight(name, copy_result)
+    return _flights[name]
+
+
+def snapshot() -> Dict[str, Any]:
+    return {name: group.snapshot() for name, group in _flights.items()}
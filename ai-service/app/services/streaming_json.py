@@ -0,0 +1,59 @@
+# ai-service/app/services/streaming_json.py
+
+"""
+Incremental extraction of fields from a JSON object that is still streaming.
+Used to surface the verdict as soon as the LLM has written it, long before
+the reasoning has finished.
+"""
+
+import json
+import re
+from typing import Any, Dict, List
+
+_STRING_VALUE = r'"((?:[^"\\]|\\.)*)"'
+# A number only counts once something after it proves it is complete
+_NUMBER_VALUE = r'(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)(?=\s*[,}\n])'
+
+
+class PartialJSONFieldParser:
+    """
+    Watches a growing JSON text and reports top-level scalar fields as soon as
+    their values are complete.
+
+    Example:
+        parser = PartialJSONFieldParser({"verdict": "string", "confidence_score": "number"})
+        parser.feed('{"verdict": "false", "confi')   # -> {"verdict": "false"}
+        parser.feed('dence_score": 0.92,')           # -> {"confidence_score": 0.92}
+    """
+
+    def __init__(self, fields: Dict[str, str]):
+        self.buffer = ""
+        self.values: Dict[str, Any] = {}
+        self._patterns = {
+            name: re.compile(
+                r'"' + re.escape(name) + r'"\s*:\s*' + (_STRING_VALUE if kind == "string" else _NUMBER_VALUE)
+            )
+            for name, kind in fields.items()
+        }
+        self._kinds = fields
+
+    @property
+    def pending(self) -> List[str]:
+        return [name for name in self._patterns if name not in self.values]
+
+    def feed(self, delta: str) -> Dict[str, Any]:
+        """Appends streamed text and returns the fields completed by it."""
+        self.buffer += delta
+        completed = {}
+        for name in self.pending:
+            match = self._patterns[name].search(self.buffer)
+            if not match:
+                continue
+            raw = match.group(1)
+            try:
+                value = json.loads(f'"{raw}"') if self._kinds[name] == "string" else float(raw)
+            except ValueError:
+                continue
+            self.values[name] = value
+            completed[name] = value
+        return completed
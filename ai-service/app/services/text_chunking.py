@@ -0,0 +1,61 @@
+# ai-service/app/services/text_chunking.py
+
+"""
+Passage splitting shared by retrieval-time context assembly and
+knowledge-base ingestion.
+"""
+
+import re
+from typing import List
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = " ".join(paragraph.split())
+        if paragraph:
+            sentences.extend(s for s in _SENTENCE_BOUNDARY.split(paragraph) if s)
+    return sentences
+
+
+def split_into_passages(text: str, max_words: int = 120, overlap_words: int = 30) -> List[str]:
+    """
+    Splits text into passages of roughly `max_words` words on sentence
+    boundaries. Consecutive passages share about `overlap_words` words so
+    facts spanning a boundary are not lost.
+    """
+    words_per_sentence = []
+    for sentence in split_sentences(text):
+        words = sentence.split()
+        # Break up run-on "sentences" (tables, scraped navigation) that exceed a passage
+        for start in range(0, len(words), max_words):
+            words_per_sentence.append(words[start:start + max_words])
+
+    passages: List[str] = []
+    current: List[List[str]] = []
+    current_len = 0
+    for words in words_per_sentence:
+        if current and current_len + len(words) > max_words:
+            passages.append(" ".join(w for sentence in current for w in sentence))
+            # Carry trailing sentences forward as overlap
+            carried: List[List[str]] = []
+            carried_len = 0
+            for sentence in reversed(current):
+                if carried_len + len(sentence) > overlap_words:
+                    break
+                carried.insert(0, sentence)
+                carried_len += len(sentence)
+            current, current_len = carried, carried_len
+        current.append(words)
+        current_len += len(words)
+
+    if current:
+        passages.append(" ".join(w for sentence in current for w in sentence))
+    return passages
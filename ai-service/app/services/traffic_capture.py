@@ -0,0 +1,228 @@
+# ai-service/app/services/traffic_capture.py
+
+"""
+Opt-in traffic recorder for offline load testing.
+When TRAFFIC_CAPTURE_PATH is set, sampled requests are appended to that
+file as JSONL: arrival time, method, path, sanitized query and headers,
+plus status, response size and latency. Request bodies carry user content
+(claims, comments, profiles), so they are recorded, sanitized, only for
+the paths opted in with TRAFFIC_CAPTURE_BODY_PATHS; elsewhere only their
+size is kept and replay skips the request. Credentials and personal
+fields are never written; uploaded files are recorded by name and size
+only. Records go
+through a bounded queue to a writer thread, so a slow disk drops records
+instead of slowing requests. Captures of either service are replayed with
+the backend's `python -m app.traffic_replay`.
+
+backend/ and ai-service/ carry identical copies of this module (only the
+path comment differs); ai-service/tests/test_shared_modules.py fails when
+they drift. Service-specific settings are passed by each app's main.py.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import base64
+import logging
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger(__name__)
+
+# Keys whose values are replaced wherever they appear: query, form fields, JSON bodies
+SENSITIVE_KEYS = {
+    "password", "token", "access_token", "refresh_token", "secret", "api_key", "apikey",
+    "authorization", "cookie", "session", "otp", "code",
+    # Personal data
+    "email", "full_name", "first_name", "last_name", "display_name", "username", "user_name",
+    "phone", "phone_number", "address", "avatar_url", "date_of_birth", "dob", "ip", "ip_address",
+}
+# Request headers worth replaying; everything else (cookies, auth, tracing) is dropped
+CAPTURED_HEADERS = {"content-type", "accept", "x-deadline-ms", "if-none-match", "user-agent"}
+AUTH_HEADERS = (b"authorization", b"x-admin-token")
+REDACTED = "[REDACTED]"
+
+
+def _sanitize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: REDACTED if k.lower() in SENSITIVE_KEYS else _sanitize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_sanitize(v) for v in value]
+    return value
+
+
+def _sanitize_pairs(pairs: List[Tuple[str, str]]) -> List[List[str]]:
+    return [[k, REDACTED if k.lower() in SENSITIVE_KEYS else v] for k, v in pairs]
+
+
+def describe_body(content_type: str, body: bytes, truncated: bool) -> Dict[str, Any]:
+    """
+    A replayable, sanitized form of a request body: parsed JSON, form fields,
+    multipart fields with file metadata, or base64 for anything else.
+    """
+    if not body:
+        return {}
+    if truncated:
+        # A partial body cannot be replayed faithfully; keep only its shape
+        return {"body_omitted": "too_large"}
+    media_type = content_type.split(";")[0].strip().lower()
+    try:
+        if media_type == "application/json":
+            return {"json": _sanitize(json.loads(body))}
+        if media_type == "application/x-www-form-urlencoded":
+            return {"form": _sanitize_pairs(parse_qsl(body.decode(), keep_blank_values=True))}
+        if media_type == "multipart/form-data":
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            fields, files = [], []
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                filename = part.get_filename()
+                payload = part.get_payload(decode=True) or b""
+                if filename is not None:
+                    files.append({"name": name, "filename": filename,
+                                  "content_type": part.get_content_type(), "size": len(payload)})
+                else:
+                    fields.append([name, payload.decode(errors="replace")])
+            return {"form": _sanitize_pairs(fields), "files": files}
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.debug(f"Could not parse {media_type} body for capture: {e}")
+    return {"body_b64": base64.b64encode(body).decode()}
+
+
+class TrafficRecorder:
+    """Background JSONL writer fed through a bounded queue; bodies are parsed on the writer thread."""
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        self.path = path
+        self.queue: "queue.Queue[Tuple[Dict[str, Any], bytes, bool]]" = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def record(self, entry: Dict[str, Any], body: bytes, truncated: bool):
+        try:
+            self.queue.put_nowait((entry, body, truncated))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                entry, body, truncated = self.queue.get()
+                try:
+                    entry.update(describe_body(entry["headers"].get("content-type", ""), body, truncated))
+                except Exception as e:
+                    entry["body_omitted"] = f"unparseable: {e}"
+                f.write(json.dumps(entry, default=str) + "\n")
+                self.written += 1
+                # Flush when caught up so the file is usable while the service runs
+                if self.queue.empty():
+                    f.flush()
+
+
+class TrafficCaptureMiddleware:
+    """
+    ASGI middleware recording sampled requests. Configuration (env):
+        TRAFFIC_CAPTURE_PATH        JSONL file to append to; capture is off when unset
+        TRAFFIC_CAPTURE_SAMPLE      fraction of requests recorded (default 1.0)
+        TRAFFIC_CAPTURE_MAX_BODY    bodies larger than this many bytes are not recorded
+        TRAFFIC_CAPTURE_BODY_PATHS  comma-separated path prefixes whose request bodies are
+                                    recorded; defaults to the `capture_bodies` the service
+                                    passes, which is none
+        TRAFFIC_CAPTURE_EXCLUDE     comma-separated path prefixes never recorded; defaults to
+                                    the `exclude` the service passes (its health, metrics and
+                                    admin routes)
+    """
+
+    def __init__(self, app, exclude: str = "/health,/metrics,/admin", capture_bodies: str = ""):
+        self.app = app
+        path = os.getenv("TRAFFIC_CAPTURE_PATH")
+        self.sample_rate = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", 1.0))
+        self.max_body = int(os.getenv("TRAFFIC_CAPTURE_MAX_BODY", 256 * 1024))
+        self.exclude = self._prefixes(os.getenv("TRAFFIC_CAPTURE_EXCLUDE", exclude))
+        self.body_paths = self._prefixes(os.getenv("TRAFFIC_CAPTURE_BODY_PATHS", capture_bodies))
+        self.recorder = TrafficRecorder(path) if path else None
+        if self.recorder:
+            logger.info(f"Recording {self.sample_rate:.0%} of requests to {path}")
+
+    @staticmethod
+    def _prefixes(value: str) -> Tuple[str, ...]:
+        return tuple(prefix.strip() for prefix in value.split(",") if prefix.strip())
+
+    async def __call__(self, scope, receive, send):
+        if (
+            self.recorder is None or scope["type"] != "http"
+            or scope["path"].startswith(self.exclude) or random.random() >= self.sample_rate
+        ):
+            return await self.app(scope, receive, send)
+
+        started_wall = time.time()
+        started = time.perf_counter()
+        body = bytearray()
+        state = {"body_size": 0, "status": None, "first_byte": None, "response_bytes": 0}
+        capture_body = scope["path"].startswith(self.body_paths)
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                state["body_size"] += len(chunk)
+                if capture_body and len(body) <= self.max_body:
+                    body.extend(chunk[:self.max_body + 1 - len(body)])
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                if state["first_byte"] is None:
+                    state["first_byte"] = time.perf_counter()
+                state["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            finished = time.perf_counter()
+            entry = self._entry(scope, state, started_wall, started, finished, error)
+            if state["body_size"] and not capture_body:
+                entry["body_omitted"] = "not_captured"
+            self.recorder.record(entry, bytes(body), state["body_size"] > self.max_body)
+
+    def _entry(self, scope, state: Dict[str, Any], started_wall: float,
+               started: float, finished: float, error: Optional[str]) -> Dict[str, Any]:
+        raw_headers = scope.get("headers") or []
+        headers = {
+            name.decode().lower(): value.decode(errors="replace")
+            for name, value in raw_headers if name.decode().lower() in CAPTURED_HEADERS
+        }
+        query = parse_qsl(scope.get("query_string", b"").decode(errors="replace"), keep_blank_values=True)
+        entry = {
+            "ts": round(started_wall, 6),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": _sanitize_pairs(query),
+            "headers": headers,
+            # Replay substitutes its own credentials for requests that carried any
+            "authenticated": any(name.lower() in AUTH_HEADERS for name, _ in raw_headers),
+            "body_size": state["body_size"],
+            "status": state["status"],
+            "response_bytes": state["response_bytes"],
+            "duration_ms": round((finished - started) * 1000, 2),
+            "ttfb_ms": round((state["first_byte"] - started) * 1000, 2) if state["first_byte"] else None,
+        }
+        if error:
+            entry["error"] = error
+        return entry
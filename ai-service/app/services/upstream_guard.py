@@ -0,0 +1,256 @@
+# ai-service/app/services/upstream_guard.py
+
+"""
+Client-side protection for third-party APIs (OpenRouter, Serper).
+Each upstream gets a token-bucket rate limiter, a concurrency limit, retries
+with jittered exponential backoff that honour Retry-After, and a circuit
+breaker that fails fast while the upstream is down.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when an upstream cannot be used right now (circuit open or retries exhausted)."""
+
+    def __init__(self, upstream: str, message: str, retry_after: float = 30.0):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursting up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> float:
+        """Takes one token, waiting if necessary. Returns the time spent waiting."""
+        started = time.monotonic()
+        # The lock keeps waiters in FIFO order instead of racing for refills
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+        return time.monotonic() - started
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets a single probe through after a cool-down."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def remaining_open_time(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def abandon(self):
+        """Frees the probe slot of an attempt that was given up without an outcome."""
+        self.probing = False
+
+    def record_throttled(self):
+        """A throttled probe: the upstream is alive but wants less traffic, so cool down again."""
+        self.opened_at = time.monotonic()
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamGuard:
+    """Rate limiting, concurrency limiting, retries and circuit breaking for one upstream."""
+
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, name: str, rate: float, burst: float, concurrency: int,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics: Dict[str, float] = {
+            "requests": 0, "successes": 0, "retries": 0, "failures": 0,
+            "throttled_by_upstream": 0, "rejected_circuit_open": 0,
+            "throttled_seconds": 0.0, "queued_seconds": 0.0, "backoff_seconds": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls, name: str, rate: float, burst: float, concurrency: int) -> "UpstreamGuard":
+        """Builds a guard whose limits can be overridden with <NAME>_* environment variables."""
+        prefix = name.upper()
+        return cls(
+            name,
+            rate=float(os.getenv(f"{prefix}_RATE_LIMIT", rate)),
+            burst=float(os.getenv(f"{prefix}_BURST", burst)),
+            concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+            max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", 3)),
+            failure_threshold=int(os.getenv(f"{prefix}_BREAKER_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv(f"{prefix}_BREAKER_RESET", 30)),
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter" spreads retries out so callers do not retry in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def request(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Runs `send` under the guard's limits, retrying retryable failures.
+
+        Raises:
+            UpstreamUnavailableError: if the circuit is open or every attempt failed.
+            DeadlineExceeded: if the request deadline passes while waiting or retrying.
+        """
+        last_error = "no attempts made"
+        for attempt in range(self.max_retries + 1):
+            deadline.check(self.name)
+            if not self.breaker.allow():
+                self.metrics["rejected_circuit_open"] += 1
+                raise UpstreamUnavailableError(
+                    self.name, "circuit breaker is open", self.breaker.remaining_open_time() or 1.0
+                )
+
+            # allow() only sets `probing` for the half-open probe, so this attempt owns the slot.
+            # Any exit without an outcome (deadline, cancellation, ...) must give it back,
+            # otherwise the breaker stays half-open with no probe ever let through again.
+            probe = self.breaker.probing
+            settled = False
+            retry_after = None
+            try:
+                try:
+                    self.metrics["throttled_seconds"] += await asyncio.wait_for(self.bucket.acquire(), deadline.remaining())
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(self.name)
+                queued_at = time.monotonic()
+                async with self.semaphore:
+                    self.metrics["queued_seconds"] += time.monotonic() - queued_at
+                    self.metrics["requests"] += 1
+                    try:
+                        response = await send()
+                    except httpx.TransportError as e:
+                        # A timeout caused by our own deadline says nothing about the upstream's health
+                        if deadline.expired():
+                            raise DeadlineExceeded(self.name)
+                        self.breaker.record_failure()
+                        settled = True
+                        last_error = f"{type(e).__name__}: {e}"
+                    else:
+                        if response.status_code not in self.RETRYABLE_STATUS:
+                            self.breaker.record_success()
+                            settled = True
+                            self.metrics["successes"] += 1
+                            return response
+                        if response.status_code == 429:
+                            # Throttling means the upstream is alive; it should not trip the breaker
+                            self.metrics["throttled_by_upstream"] += 1
+                            if probe:
+                                self.breaker.record_throttled()
+                        else:
+                            self.breaker.record_failure()
+                        settled = True
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        last_error = f"HTTP {response.status_code}"
+                        # Release the connection of streamed responses we are not going to read
+                        await response.aclose()
+            finally:
+                if probe and not settled:
+                    self.breaker.abandon()
+
+            if attempt == self.max_retries:
+                break
+            delay = min(self.max_delay, retry_after) if retry_after is not None else self._backoff(attempt)
+            left = deadline.remaining()
+            if left is not None and delay >= left:
+                raise DeadlineExceeded(self.name)
+            self.metrics["retries"] += 1
+            self.metrics["backoff_seconds"] += delay
+            logger.warning(f"{self.name} request failed ({last_error}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        self.metrics["failures"] += 1
+        raise UpstreamUnavailableError(
+            self.name, f"giving up after {self.max_retries + 1} attempts ({last_error})",
+            self.breaker.remaining_open_time() or self.max_delay
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "available_tokens": round(min(self.bucket.capacity, self.bucket.tokens), 2),
+            "concurrency": self.concurrency,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.metrics.items()},
+        }
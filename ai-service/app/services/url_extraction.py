@@ -0,0 +1,360 @@
+# ai-service/app/services/url_extraction.py
+
+"""
+Article extraction for URL claims.
+Links are canonicalized (tracking parameters and fragments removed,
+shorteners resolved) so that every claim sharing a link maps to one cache
+entry. Pages are fetched as a stream with a byte cap and reduced to their
+main article text; results are cached by canonical URL with a TTL.
+Claim URLs are user-supplied, so every hop (shortener and redirect targets
+included) must resolve to public addresses before it is requested, and the
+connection goes to the addresses that were checked.
+"""
+
+import os
+import time
+import socket
+import asyncio
+import logging
+import ipaddress
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpx
+import httpcore
+from bs4 import BeautifulSoup
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.singleflight import flight, flight_key
+
+logger = logging.getLogger(__name__)
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi", "ref_src", "ref_url", "cmpid", "s_cid", "si",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_", "__twitter")
+SHORTENER_HOSTS = {
+    "bit.ly", "t.co", "tinyurl.com", "goo.gl", "ow.ly", "buff.ly", "is.gd", "lnkd.in",
+    "rb.gy", "cutt.ly", "shorturl.at", "tiny.cc", "rebrand.ly", "fb.me", "trib.al",
+    "dlvr.it", "amzn.to", "bit.do", "t.ly",
+}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,text/plain;q=0.8",
+}
+# Page furniture that never belongs to the article body
+BOILERPLATE_TAGS = ["script", "style", "noscript", "header", "footer", "nav", "aside", "form", "iframe", "svg", "button"]
+
+
+class BlockedURLError(ValueError):
+    """The URL points at an address the service must not fetch (private, loopback, link-local, ...)."""
+
+
+def url_origin(url: str) -> Tuple[str, int]:
+    """(host, port) of an http(s) URL, in the form httpcore connects to."""
+    parsed = httpx.URL(url)
+    return parsed.raw_host.decode("ascii"), parsed.port or DEFAULT_PORTS[parsed.scheme]
+
+
+async def ensure_public_url(url: str) -> List[str]:
+    """
+    Raises BlockedURLError unless the URL is http(s) and every address its
+    host resolves to is globally routable; returns those addresses. Called
+    before each request, redirect hops included, so a public link cannot
+    bounce into the internal network.
+    """
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in DEFAULT_PORTS or not parts.hostname:
+        raise BlockedURLError(f"Not an http(s) URL: {url}")
+    try:
+        host, port = url_origin(url)
+    except httpx.InvalidURL as e:
+        raise BlockedURLError(f"Invalid URL {url}: {e}")
+    try:
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM),
+            deadline.remaining()
+        )
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("url resolution")
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve {host}: {e}")
+
+    for info in infos:
+        # Scoped IPv6 addresses carry a "%zone" suffix
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        # is_global excludes private, loopback, link-local, shared, reserved and unspecified ranges
+        if not address.is_global or address.is_multicast:
+            raise BlockedURLError(f"Refusing to fetch {host}: resolves to non-public address {address}")
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+class PinnedResolver(httpcore.AsyncNetworkBackend):
+    """
+    Network backend that connects only to the addresses ensure_public_url
+    approved, instead of resolving the host a second time, so a host cannot
+    pass the check with a public address and then answer the request from a
+    private one (DNS rebinding). TLS still uses the URL's host name for SNI
+    and certificate verification, and the Host header is unchanged.
+    """
+
+    def __init__(self):
+        self.pins: Dict[Tuple[str, int], List[str]] = {}
+        self.backend = httpcore.AnyIOBackend()
+
+    async def check(self, url: str):
+        """Validates the URL's host and pins the addresses it resolved to."""
+        self.pins[url_origin(url)] = await ensure_public_url(url)
+
+    def transport(self) -> httpx.AsyncHTTPTransport:
+        transport = httpx.AsyncHTTPTransport()
+        # httpx has no option for the network backend; its pool is replaced with one using this resolver
+        transport._pool = httpcore.AsyncConnectionPool(ssl_context=httpx.create_ssl_context(), network_backend=self)
+        return transport
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options=None) -> httpcore.AsyncNetworkStream:
+        addresses = self.pins.get((host, port))
+        if not addresses:
+            raise BlockedURLError(f"Refusing to connect to {host}:{port}: it was not checked")
+        error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self.backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                                  socket_options=None) -> httpcore.AsyncNetworkStream:
+        raise BlockedURLError("Refusing to connect to a unix socket")
+
+    async def sleep(self, seconds: float):
+        await self.backend.sleep(seconds)
+
+
+def absolute_url(url: str) -> str:
+    """Strips the link and assumes https when it has no scheme, as clients often send bare domains."""
+    url = url.strip()
+    return url if "://" in url else "https://" + url
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizes a link for caching: lower-case scheme and host, no default
+    port, credentials, fragment or tracking parameters, sorted query.
+    Raises ValueError for anything that is not an http(s) URL.
+    """
+    url = absolute_url(url)
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        raise ValueError(f"Not an http(s) URL: {url}")
+
+    host = parts.hostname.lower().rstrip(".")
+    if parts.port and parts.port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def is_shortener(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    return host.lower().removeprefix("www.") in SHORTENER_HOSTS
+
+
+def extract_article(html: bytes, encoding: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Returns (title, text) for the main content of a page. Uses <article> or
+    <main> when the page marks its content up; otherwise the element whose
+    direct paragraphs hold the most text, which is where article bodies sit.
+    """
+    soup = BeautifulSoup(html, "lxml", from_encoding=encoding)
+    og_title = soup.find("meta", attrs={"property": "og:title"})
+    if og_title and og_title.get("content"):
+        title = og_title["content"].strip()
+    else:
+        title = soup.title.get_text(strip=True) if soup.title else ""
+
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+
+    candidates = soup.find_all("article") or soup.find_all("main")
+    if candidates:
+        root = max(candidates, key=lambda node: len(node.get_text(" ", strip=True)))
+    else:
+        scores: Dict[int, List[Any]] = {}
+        for paragraph in soup.find_all("p"):
+            length = len(paragraph.get_text(" ", strip=True))
+            parent = paragraph.parent
+            if parent is not None:
+                scores.setdefault(id(parent), [parent, 0])[1] += length
+        root = max(scores.values(), key=lambda entry: entry[1])[0] if scores else (soup.body or soup)
+
+    # Short fragments are bylines, share prompts and ad labels rather than content
+    blocks = [
+        node.get_text(" ", strip=True) for node in root.find_all(["h1", "h2", "h3", "p", "blockquote", "li"])
+        if node.name in ("h1", "h2", "h3") or len(node.get_text(" ", strip=True)) >= 40
+    ]
+    text = "\n".join(block for block in blocks if block)
+    if not text:
+        text = root.get_text(separator="\n", strip=True)
+    return title, text
+
+
+class URLExtractor:
+    """Canonicalizes, fetches and extracts linked articles, with a TTL cache per canonical URL."""
+
+    def __init__(self):
+        self.cache_ttl = float(os.getenv("URL_CACHE_TTL", 3600))
+        # Failures are remembered briefly so a dead link shared by many claims is not hammered
+        self.failure_ttl = float(os.getenv("URL_CACHE_FAILURE_TTL", 300))
+        self.cache_size = int(os.getenv("URL_CACHE_SIZE", 1000))
+        self.max_bytes = int(os.getenv("URL_FETCH_MAX_BYTES", 2 * 1024 * 1024))
+        self.fetch_timeout = float(os.getenv("URL_FETCH_TIMEOUT", 15))
+        self.max_redirects = int(os.getenv("URL_MAX_REDIRECTS", 5))
+        self.max_text_chars = int(os.getenv("URL_MAX_TEXT_CHARS", 8000))
+        self._cache: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self.metrics = {"hits": 0, "misses": 0, "fetched_bytes": 0, "failures": 0}
+
+    # --- Cache ---
+
+    def _cache_get(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        expires_at, article = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, article
+
+    def _cache_put(self, keys: List[str], article: Optional[Dict[str, Any]]):
+        expires_at = time.monotonic() + (self.cache_ttl if article else self.failure_ttl)
+        for key in dict.fromkeys(keys):
+            self._cache[key] = (expires_at, article)
+            self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._cache), **self.metrics}
+
+    # --- Extraction ---
+
+    async def extract(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"url", "canonical_url", "title", "text"} for the linked
+        article, or None if the link cannot be fetched or holds no text.
+        Articles are cached and shared without "url", which is this caller's link.
+        """
+        try:
+            canonical = canonicalize_url(url)
+        except ValueError as e:
+            logger.warning(f"Rejected claim URL: {e}")
+            return None
+
+        found, article = self._cache_get(canonical)
+        if found:
+            self.metrics["hits"] += 1
+        else:
+            self.metrics["misses"] += 1
+            # Links shared widely arrive in bursts; the first request fetches, the rest wait for it
+            article = await flight("url_fetch").do(flight_key(canonical), lambda: self._extract(url, canonical))
+        return {**article, "url": url} if article else None
+
+    async def _extract(self, url: str, canonical: str) -> Optional[Dict[str, Any]]:
+        # The canonical form is only a cache key; the link is requested as given, since
+        # dropped parameters or a rewritten host may be needed to reach the article
+        aliases = [canonical]
+        target = absolute_url(url)
+        try:
+            resolver = PinnedResolver()
+            async with httpx.AsyncClient(headers=FETCH_HEADERS, max_redirects=self.max_redirects,
+                                         transport=resolver.transport()) as client:
+                if is_shortener(target):
+                    # The target may already be cached under its own canonical form
+                    target = await self._resolve(client, resolver, target)
+                    aliases.append(canonicalize_url(target))
+                    found, article = self._cache_get(aliases[-1])
+                    if found:
+                        self._cache_put(aliases, article)
+                        return article
+
+                final_url, body, encoding = await self._fetch(client, resolver, target)
+            final = canonicalize_url(final_url)
+            aliases.append(final)
+            title, text = await deadline.run_blocking("article parsing", extract_article, body, encoding)
+            article = {"canonical_url": final, "title": title, "text": text[:self.max_text_chars]} if text else None
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"URL extraction failed for {url}: {e}")
+            self.metrics["failures"] += 1
+            article = None
+
+        self._cache_put(aliases, article)
+        return article
+
+    async def _resolve(self, client: httpx.AsyncClient, resolver: PinnedResolver, url: str) -> str:
+        """Follows shortener redirects hop by hop without downloading any page body."""
+        for _ in range(self.max_redirects):
+            if not is_shortener(url):
+                break
+            deadline.check("url resolution")
+            await resolver.check(url)
+            async with client.stream("GET", url, follow_redirects=False,
+                                     timeout=deadline.clamp(self.fetch_timeout)) as response:
+                location = response.headers.get("location")
+                if not response.is_redirect or not location:
+                    break
+            url = urljoin(url, location)
+        return url
+
+    async def _fetch(self, client: httpx.AsyncClient, resolver: PinnedResolver, url: str) -> Tuple[str, bytes, Optional[str]]:
+        """
+        Streams the page, refusing non-text responses and stopping at the byte
+        cap. Redirects are followed here rather than by httpx so that each
+        target is checked before it is requested.
+        """
+        for _ in range(self.max_redirects + 1):
+            deadline.check("url fetch")
+            await resolver.check(url)
+            async with client.stream("GET", url, follow_redirects=False,
+                                     timeout=deadline.clamp(self.fetch_timeout)) as response:
+                location = response.headers.get("location")
+                if response.is_redirect and location:
+                    url = urljoin(url, location)
+                    continue
+
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "").lower()
+                if content_type and "html" not in content_type and "text/plain" not in content_type:
+                    raise ValueError(f"Unsupported content type {content_type}")
+
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) >= self.max_bytes:
+                        # The article body is usually early in the page; parse what arrived
+                        logger.info(f"Truncated {url} at {self.max_bytes} bytes")
+                        del body[self.max_bytes:]
+                        break
+                self.metrics["fetched_bytes"] += len(body)
+                return url, bytes(body), response.charset_encoding
+        raise ValueError(f"Too many redirects for {url}")
+
+    @staticmethod
+    def format_article(article: Dict[str, Any]) -> str:
+        title = f"{article['title']}\n" if article.get("title") else ""
+        return f"{title}{article['text']}\n(Source: {article['canonical_url']})"
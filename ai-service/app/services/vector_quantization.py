@@ -0,0 +1,91 @@
+# ai-service/app/services/vector_quantization.py
+
+"""
+Scalar (int8) and binary quantization of embedding vectors, plus a small
+in-memory index that searches quantized codes and rescores the shortlist.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class Int8Quantizer:
+    """Per-dimension min/max calibration mapping floats to int8 codes."""
+
+    def __init__(self, minimums: np.ndarray, scales: np.ndarray):
+        self.minimums = minimums
+        self.scales = scales
+
+    @classmethod
+    def calibrate(cls, vectors: np.ndarray) -> "Int8Quantizer":
+        minimums = vectors.min(axis=0)
+        scales = (vectors.max(axis=0) - minimums) / 255.0
+        return cls(minimums, np.where(scales == 0, 1e-8, scales))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.round((vectors - self.minimums) / self.scales) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128) * self.scales + self.minimums
+
+
+def binary_quantize(vectors: np.ndarray) -> np.ndarray:
+    """One bit per dimension (sign), packed 8 dimensions per byte."""
+    return np.packbits(vectors > 0, axis=-1)
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(query_bits: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    return _POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1)
+
+
+class QuantizedVectorIndex:
+    """
+    Stores int8 or binary codes instead of float32 vectors (4x / 32x smaller).
+    Search scores every code cheaply, then rescores a shortlist of
+    `rescore_multiplier * k` candidates with the float query against the
+    int8-decoded vectors (binary mode keeps int8 codes for rescoring).
+    """
+
+    def __init__(self, mode: str = "int8", rescore_multiplier: int = 4):
+        if mode not in ("int8", "binary"):
+            raise ValueError("mode must be 'int8' or 'binary'")
+        self.mode = mode
+        self.rescore_multiplier = rescore_multiplier
+        self.ids: List[str] = []
+        self.quantizer: Optional[Int8Quantizer] = None
+        self.int8_codes: Optional[np.ndarray] = None
+        self.binary_codes: Optional[np.ndarray] = None
+
+    def build(self, ids: List[str], vectors: np.ndarray):
+        self.ids = list(ids)
+        self.quantizer = Int8Quantizer.calibrate(vectors)
+        self.int8_codes = self.quantizer.encode(vectors)
+        if self.mode == "binary":
+            self.binary_codes = binary_quantize(vectors)
+
+    def memory_bytes(self) -> int:
+        """Bytes needed by the first-stage codes (the part that must stay in RAM)."""
+        codes = self.binary_codes if self.mode == "binary" else self.int8_codes
+        return 0 if codes is None else codes.nbytes
+
+    def search(self, query: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        if self.int8_codes is None or not self.ids:
+            return []
+        shortlist_size = min(len(self.ids), k * self.rescore_multiplier)
+
+        if self.mode == "binary":
+            distances = hamming_distances(binary_quantize(query), self.binary_codes)
+            shortlist = np.argpartition(distances, shortlist_size - 1)[:shortlist_size]
+        else:
+            # decode(c) @ q == c @ (scales * q) + constant, so rank on codes directly
+            approximate = self.int8_codes @ (self.quantizer.scales * query).astype(np.float32)
+            shortlist = np.argpartition(-approximate, shortlist_size - 1)[:shortlist_size]
+
+        rescored = self.quantizer.decode(self.int8_codes[shortlist]) @ query
+        order = np.argsort(-rescored)[:k]
+        return [(self.ids[shortlist[i]], float(rescored[i])) for i in order]
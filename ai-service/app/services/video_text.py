@@ -0,0 +1,208 @@
+# ai-service/app/services/video_text.py
+
+"""
+On-screen text extraction for video claims.
+Frames are decoded as a stream at a low sampling rate; only frames that
+start a new scene or whose text-like regions change (captions, overlays)
+become keyframes, so motion elsewhere in the picture does not count.
+Near-duplicates are dropped by perceptual hash, the whole video is read,
+and the keyframe cap thins the candidates evenly instead of cutting the
+stream short. OCR cost therefore follows the number of distinct scenes and
+captions rather than the length of the video or the amount of motion.
+"""
+
+import os
+import logging
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.services import deadline
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(gray: np.ndarray, hash_size: int = 16) -> int:
+    """Difference hash: compares neighbouring pixels of a tiny grayscale thumbnail."""
+    resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (resized[:, 1:] > resized[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def text_mask(gray: np.ndarray, min_contrast: int) -> np.ndarray:
+    """
+    Stroke pixels of text-like regions: high-contrast edges that join into
+    wide, short and densely filled lines. Smooth moving subjects and large
+    shapes do not pass the geometry test, so they do not show up here.
+    """
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    otsu, _ = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    _, strokes = cv2.threshold(gradient, max(otsu, min_contrast), 255, cv2.THRESH_BINARY)
+    # Closing horizontally merges the characters of a word or line into one component
+    lines = cv2.morphologyEx(strokes, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(lines, connectivity=8)
+    widths, heights, areas = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT], stats[:, cv2.CC_STAT_AREA]
+    keep = (
+        (heights >= 4) & (heights <= gray.shape[0] // 4)
+        & (widths >= 2 * heights)
+        & (areas >= 0.4 * widths * heights)
+    )
+    keep[0] = False  # background
+    return np.where(keep[labels], strokes, 0).astype(np.uint8)
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class VideoTextExtractor:
+    """
+    Keyframe selection plus OCR. Tunables (env):
+        VIDEO_SAMPLE_FPS        frames examined per second of video
+        VIDEO_SCENE_THRESHOLD   histogram correlation below which a new scene starts
+        VIDEO_PIXEL_DELTA       minimum edge contrast (grey levels) for a text stroke
+        VIDEO_CHANGE_RATIO      fraction of the text strokes of two frames that must differ
+                                for the later one to be new
+        VIDEO_MIN_TEXT_PIXELS   text stroke pixels (in the 320px thumbnail) below which a frame
+                                counts as having no text
+        VIDEO_HASH_DISTANCE     dHash bits (of 256) within which frames are duplicate candidates
+        VIDEO_MAX_KEYFRAMES     cap on frames sent to OCR, spread evenly over the video
+        VIDEO_OCR_MAX_WIDTH     keyframes are downscaled to this width before OCR
+    """
+
+    def __init__(self, ocr):
+        self.ocr = ocr
+        self.sample_fps = float(os.getenv("VIDEO_SAMPLE_FPS", 2))
+        self.scene_threshold = float(os.getenv("VIDEO_SCENE_THRESHOLD", 0.85))
+        self.pixel_delta = int(os.getenv("VIDEO_PIXEL_DELTA", 30))
+        self.change_ratio = float(os.getenv("VIDEO_CHANGE_RATIO", 0.3))
+        self.min_text_pixels = int(os.getenv("VIDEO_MIN_TEXT_PIXELS", 40))
+        self.hash_distance = int(os.getenv("VIDEO_HASH_DISTANCE", 24))
+        self.max_keyframes = int(os.getenv("VIDEO_MAX_KEYFRAMES", 40))
+        self.ocr_max_width = int(os.getenv("VIDEO_OCR_MAX_WIDTH", 1280))
+
+    def select_keyframes(self, video_path: str) -> List[Tuple[float, np.ndarray]]:
+        """Streams through the whole video and returns (timestamp, frame) for each distinct keyframe."""
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video {video_path}")
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            step = max(1, int(round(fps / self.sample_fps)))
+            # (timestamp, JPEG-encoded frame, (hash, histogram, text mask)) per candidate;
+            # frames are kept encoded so a long video's candidates stay small in memory
+            candidates: List[Tuple[float, np.ndarray, Tuple[int, np.ndarray, np.ndarray]]] = []
+            last_hist: Optional[np.ndarray] = None
+            last_text: Optional[np.ndarray] = None
+            index = -1
+            # Distinct frames found so far, and the spacing (in distinct frames) between kept ones
+            distinct, stride = 0, 1
+
+            while True:
+                # grab() advances without decoding into an image; only sampled frames are retrieved
+                if not capture.grab():
+                    break
+                index += 1
+                if index % step:
+                    continue
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+
+                small = cv2.resize(frame, (320, max(1, 320 * frame.shape[0] // frame.shape[1])),
+                                   interpolation=cv2.INTER_AREA)
+                hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+                hist = cv2.calcHist([hsv], [0, 1], None, [32, 32], [0, 180, 0, 256])
+                cv2.normalize(hist, hist)
+                # Blurring keeps compression noise below the stroke contrast while text survives
+                thumb = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+                text = text_mask(thumb, self.pixel_delta)
+
+                # Compared against the last keyframe, not the last sample, so slow pans and
+                # fades still produce a keyframe once they add up to a visible change
+                new_scene = last_hist is None or cv2.compareHist(last_hist, hist, cv2.HISTCMP_CORREL) < self.scene_threshold
+                if not (new_scene or self._text_changed(last_text, text)):
+                    continue
+                last_hist, last_text = hist, text
+
+                # Skip frames that repeat an earlier keyframe (e.g. a cut back to a previous shot);
+                # the hash narrows the candidates, colour and text checks confirm no caption differs
+                signature = (dhash(thumb), hist, text)
+                if any(self._duplicate(signature, earlier) for _, _, earlier in candidates):
+                    continue
+
+                distinct += 1
+                if (distinct - 1) % stride:
+                    continue
+                ok, encoded = cv2.imencode(".jpg", self._downscale(frame), [cv2.IMWRITE_JPEG_QUALITY, 95])
+                if ok:
+                    candidates.append((index / fps, encoded, signature))
+                # Past twice the cap, keep every other candidate and double the spacing of new
+                # ones, so the survivors stay evenly spread over the distinct frames seen
+                if len(candidates) > 2 * self.max_keyframes:
+                    candidates = candidates[::2]
+                    stride *= 2
+
+            if len(candidates) > self.max_keyframes:
+                picks = np.unique(np.linspace(0, len(candidates) - 1, self.max_keyframes).round().astype(int))
+                candidates = [candidates[i] for i in picks]
+            return [(timestamp, cv2.imdecode(encoded, cv2.IMREAD_COLOR)) for timestamp, encoded, _ in candidates]
+        finally:
+            capture.release()
+
+    def _duplicate(self, signature, earlier) -> bool:
+        frame_hash, hist, text = signature
+        kept_hash, kept_hist, kept_text = earlier
+        return (
+            hamming(frame_hash, kept_hash) <= self.hash_distance
+            and cv2.compareHist(kept_hist, hist, cv2.HISTCMP_CORREL) >= self.scene_threshold
+            and not self._text_changed(kept_text, text)
+        )
+
+    def _text_changed(self, a: Optional[np.ndarray], b: np.ndarray) -> bool:
+        """Whether the text strokes of two frames differ; frames without text never differ."""
+        if a is None:
+            return True
+        text_pixels = np.count_nonzero(a | b)
+        if text_pixels < self.min_text_pixels:
+            return False
+        return np.count_nonzero(a != b) / text_pixels > self.change_ratio
+
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        if width <= self.ocr_max_width:
+            return frame
+        scale = self.ocr_max_width / width
+        return cv2.resize(frame, (self.ocr_max_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    async def extract(self, video_path: str) -> List[Tuple[float, str]]:
+        """Returns (timestamp, text) for keyframes whose text differs from what was already seen."""
+        keyframes = await deadline.run_blocking(
+            "keyframe selection", self.select_keyframes, video_path, pool="video"
+        )
+        timeline: List[Tuple[float, str]] = []
+        seen = set()
+        for timestamp, frame in keyframes:
+            text = await deadline.run_blocking("video ocr", self.ocr.recognize, frame, pool="ocr")
+            key = _normalize(text)
+            # Captions often persist across several keyframes; keep their first appearance
+            if key and key not in seen:
+                seen.add(key)
+                timeline.append((timestamp, text))
+        logger.info(f"Video OCR: {len(keyframes)} keyframes, {len(timeline)} distinct text blocks.")
+        return timeline
+
+    @staticmethod
+    def format_timeline(timeline: List[Tuple[float, str]]) -> str:
+        return "\n".join(f"[{format_timestamp(timestamp)}] {text}" for timestamp, text in timeline)
@@ -0,0 +1,68 @@
+# ai-service/tests/test_llm_fallback.py
+
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.claim_classifier import ClaimClassifier
+from app.services.llm_backends import LLMBackend, OpenAICompatibleBackend
+from app.services.upstream_guard import UpstreamUnavailableError
+
+
+class RespondingGuard:
+    """Stands in for UpstreamGuard, answering every request with one status."""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+    async def request(self, send):
+        return httpx.Response(self.status_code, request=httpx.Request("POST", "https://llm.test"))
+
+    def snapshot(self):
+        return {}
+
+
+class StaticBackend(LLMBackend):
+    name = "local"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def stream(self, prompt: str):
+        self.calls += 1
+        yield json.dumps({"verdict": "false", "confidence_score": 0.8, "summary": "s", "reasoning": "r"})
+
+
+def remote(status_code: int) -> OpenAICompatibleBackend:
+    return OpenAICompatibleBackend("openrouter", "https://llm.test", "model", RespondingGuard(status_code), api_key="key")
+
+
+@pytest.mark.parametrize("status_code", [401, 402, 403, 404, 429])
+def test_unusable_backend_falls_back_to_the_next(status_code):
+    classifier = ClaimClassifier()
+    local = StaticBackend()
+    classifier.llm_backends = [remote(status_code), local]
+
+    result = asyncio.run(classifier._call_llm_for_analysis("claim", "context"))
+    assert local.calls == 1
+    assert result["verdict"] == "false"
+
+
+def test_unusable_last_backend_is_reported_as_unavailable():
+    classifier = ClaimClassifier()
+    classifier.llm_backends = [remote(401)]
+
+    with pytest.raises(UpstreamUnavailableError):
+        asyncio.run(classifier._call_llm_for_analysis("claim", "context"))
+
+
+def test_bad_request_is_not_retried_on_another_backend():
+    classifier = ClaimClassifier()
+    local = StaticBackend()
+    classifier.llm_backends = [remote(400), local]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(classifier._call_llm_for_analysis("claim", "context"))
+    assert local.calls == 0
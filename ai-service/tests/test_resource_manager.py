@@ -0,0 +1,59 @@
+# ai-service/tests/test_resource_manager.py
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+from app.services.resource_manager import ModelExecutor
+
+
+def test_job_cancelled_while_running_is_still_counted():
+    async def scenario():
+        pool = ModelExecutor("test", workers=1)
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        task = asyncio.ensure_future(pool.run(slow))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        release.set()
+        pool.shutdown()
+        pool.executor.shutdown(wait=True)
+        return pool.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["abandoned"] == 1
+    assert snapshot["completed"] == 1
+    assert snapshot["running"] == 0 and snapshot["queued"] == 0
+    assert snapshot["avg_wait_seconds"] is not None
+
+
+def test_job_cancelled_before_starting_is_dropped():
+    async def scenario():
+        pool = ModelExecutor("test", workers=1)
+        release = threading.Event()
+        blocker = asyncio.ensure_future(pool.run(release.wait, 5))
+        queued = asyncio.ensure_future(pool.run(time.sleep, 0))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        release.set()
+        await blocker
+        pool.shutdown()
+        return pool.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["cancelled"] == 1
+    assert snapshot["completed"] == 1
+    assert snapshot["queued"] == 0 and snapshot["running"] == 0
@@ -0,0 +1,70 @@
+# ai-service/tests/test_shared_modules.py
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.services.traffic_capture import TrafficCaptureMiddleware, describe_body
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def without_path_comment(path: Path) -> str:
+    return path.read_text().split("\n", 1)[1]
+
+
+@pytest.mark.parametrize("module", ["traffic_capture.py", "profiling.py"])
+def test_copies_shared_by_both_services_are_identical(module):
+    backend = ROOT / "backend" / "app" / "services" / module
+    ai_service = ROOT / "ai-service" / "app" / "services" / module
+    assert without_path_comment(backend) == without_path_comment(ai_service), (
+        f"backend and ai-service copies of {module} differ; apply the change to both"
+    )
+
+
+def test_personal_fields_are_redacted():
+    captured = describe_body(
+        "application/json", b'{"full_name": "Jane Doe", "email": "jane@example.com", "reason": "r"}', False
+    )
+    assert captured == {"json": {"full_name": "[REDACTED]", "email": "[REDACTED]", "reason": "r"}}
+
+
+class ListRecorder:
+    def __init__(self):
+        self.records = []
+
+    def record(self, entry, body, truncated):
+        self.records.append((entry, body))
+
+
+def capture(monkeypatch, path: str, body_paths: str):
+    """Sends one JSON POST to `path` through the middleware and returns what it recorded."""
+    monkeypatch.setenv("TRAFFIC_CAPTURE_BODY_PATHS", body_paths)
+
+    async def app(scope, receive, send):
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def receive():
+        return {"type": "http.request", "body": b'{"content": "claim text"}', "more_body": False}
+
+    async def send(message):
+        pass
+
+    middleware = TrafficCaptureMiddleware(app)
+    middleware.recorder = ListRecorder()
+    scope = {"type": "http", "method": "POST", "path": path, "query_string": b"",
+             "headers": [(b"content-type", b"application/json")]}
+    asyncio.run(middleware(scope, receive, send))
+    return middleware.recorder.records[0]
+
+
+def test_bodies_are_recorded_only_for_opted_in_paths(monkeypatch):
+    entry, body = capture(monkeypatch, "/api/v1/claims/submit", "")
+    assert body == b"" and entry["body_omitted"] == "not_captured"
+    assert entry["body_size"] == len(b'{"content": "claim text"}')
+
+    entry, body = capture(monkeypatch, "/api/v1/claims/submit", "/api/v1/claims")
+    assert body == b'{"content": "claim text"}' and "body_omitted" not in entry
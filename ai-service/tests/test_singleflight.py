@@ -0,0 +1,77 @@
+# ai-service/tests/test_singleflight.py
+
+import asyncio
+
+import pytest
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded, deadline_scope
+from app.services.singleflight import SingleFlight
+
+
+def test_shared_call_runs_to_the_latest_waiting_deadline():
+    async def scenario():
+        group = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.2)
+            deadline.check("work")
+            return deadline.remaining()
+
+        async def caller(budget):
+            with deadline_scope(budget):
+                return await group.do("key", work)
+
+        leader = asyncio.ensure_future(caller(0.05))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(caller(5.0))
+        return await asyncio.gather(leader, joiner, return_exceptions=True)
+
+    leader_result, joiner_result = asyncio.run(scenario())
+    assert isinstance(leader_result, DeadlineExceeded)
+    # The work saw the joiner's budget, not the leader's expired one
+    assert joiner_result > 4
+
+
+def test_shared_call_is_unbounded_while_a_waiter_has_no_deadline():
+    async def scenario():
+        group = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return deadline.remaining()
+
+        async def bounded():
+            with deadline_scope(1.0):
+                return await group.do("key", work)
+
+        leader = asyncio.ensure_future(bounded())
+        await asyncio.sleep(0)
+        return await asyncio.gather(leader, group.do("key", work))
+
+    assert asyncio.run(scenario()) == [None, None]
+
+
+def test_cancelling_the_leader_keeps_the_shared_call_for_joiners():
+    async def scenario():
+        group = SingleFlight("test")
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.1)
+            return "result"
+
+        leader = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await joiner, len(runs), group.metrics["cancelled"]
+
+    result, runs, cancelled = asyncio.run(scenario())
+    assert result == "result"
+    assert runs == 1
+    assert cancelled == 0
@@ -0,0 +1,88 @@
+# ai-service/tests/test_upstream_guard.py
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.upstream_guard import UpstreamGuard, UpstreamUnavailableError
+
+
+def make_guard() -> UpstreamGuard:
+    return UpstreamGuard(
+        "test", rate=1000, burst=1000, concurrency=4,
+        max_retries=0, failure_threshold=1, reset_timeout=0.05
+    )
+
+
+def respond(status_code: int):
+    async def send():
+        return httpx.Response(status_code, request=httpx.Request("GET", "https://upstream.test"))
+    return send
+
+
+async def open_and_cool_down(guard: UpstreamGuard):
+    with pytest.raises(UpstreamUnavailableError):
+        await guard.request(respond(500))
+    assert guard.breaker.state == "open"
+    await asyncio.sleep(guard.breaker.reset_timeout)
+    assert guard.breaker.state == "half_open"
+
+
+def test_throttled_probe_reopens_then_recovers():
+    async def scenario():
+        guard = make_guard()
+        await open_and_cool_down(guard)
+
+        with pytest.raises(UpstreamUnavailableError):
+            await guard.request(respond(429))
+        assert guard.breaker.state == "open"
+        assert not guard.breaker.probing
+
+        await asyncio.sleep(guard.breaker.reset_timeout)
+        response = await guard.request(respond(200))
+        assert response.status_code == 200
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_probe_frees_the_probe_slot():
+    async def scenario():
+        guard = make_guard()
+        await open_and_cool_down(guard)
+
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(3600)
+
+        probe = asyncio.create_task(guard.request(hang))
+        await started.wait()
+        assert guard.breaker.probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert not guard.breaker.probing
+        response = await guard.request(respond(200))
+        assert response.status_code == 200
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_probe_failure_reopens_the_circuit():
+    async def scenario():
+        guard = make_guard()
+        await open_and_cool_down(guard)
+        opened_at = guard.breaker.opened_at
+
+        with pytest.raises(UpstreamUnavailableError):
+            await guard.request(respond(503))
+        assert guard.breaker.state == "open"
+        assert guard.breaker.opened_at > opened_at
+        assert not guard.breaker.probing
+
+    asyncio.run(scenario())
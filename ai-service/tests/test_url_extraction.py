@@ -0,0 +1,68 @@
+# ai-service/tests/test_url_extraction.py
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import url_extraction
+from app.services.url_extraction import BlockedURLError, PinnedResolver, URLExtractor
+
+PAGE = (
+    b"<html><head><title>Story</title></head><body><article>"
+    b"<p>The council approved the new budget after a long debate on Tuesday evening.</p>"
+    b"</article></body></html>"
+)
+
+
+async def serve(requests):
+    """A page server on loopback that records each request's head."""
+    async def handle(reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        requests.append(head.decode())
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: "
+                     + str(len(PAGE)).encode() + b"\r\nConnection: close\r\n\r\n" + PAGE)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_extract_fetches_the_link_as_given_from_the_checked_address(monkeypatch):
+    checked = []
+
+    async def approve(url):
+        checked.append(url)
+        return ["127.0.0.1"]
+
+    monkeypatch.setattr(url_extraction, "ensure_public_url", approve)
+
+    async def scenario():
+        requests = []
+        server, port = await serve(requests)
+        async with server:
+            extractor = URLExtractor()
+            first = await extractor.extract(f"http://news.test:{port}/story?id=7&utm_source=feed")
+            second = await extractor.extract(f"http://news.test:{port}/story?utm_source=mail&id=7")
+        return port, requests, first, second
+
+    port, requests, first, second = asyncio.run(scenario())
+    # One fetch, of the original link, sent to the pinned address with the original Host
+    assert len(requests) == 1 and len(checked) == 1
+    assert requests[0].startswith("GET /story?id=7&utm_source=feed ")
+    assert f"host: news.test:{port}" in requests[0].lower()
+    assert first["canonical_url"] == second["canonical_url"] == f"http://news.test:{port}/story?id=7"
+    # Each caller gets its own link back, not the one that filled the cache
+    assert first["url"].endswith("id=7&utm_source=feed")
+    assert second["url"].endswith("utm_source=mail&id=7")
+
+
+def test_pinned_resolver_refuses_hosts_it_has_not_checked():
+    async def scenario():
+        resolver = PinnedResolver()
+        async with httpx.AsyncClient(transport=resolver.transport()) as client:
+            await client.get("http://unchecked.test/")
+
+    with pytest.raises(BlockedURLError):
+        asyncio.run(scenario())
@@ -18,7 +18,12 @@ load_dotenv()
 from app.db import supabase
 
 # Import routers
-from app.routers import claims, users, comments, rti, dashboard
+from app.routers import claims, users, comments, rti, dashboard, admin, sources
+from app.services.claim_scheduler import claim_scheduler
+from app.services.kb_feedback import kb_feedback
+from app.services.analysis_archive import analysis_archiver
+from app.services.profiling import RequestProfilingMiddleware
+from app.services.traffic_capture import TrafficCaptureMiddleware
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -27,6 +32,23 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.on_event("startup")
+async def startup_event():
+    """
+    Start the claim analysis scheduler's lane workers, the knowledge base feedback
+    flusher and the partition maintenance / archiving loop.
+    """
+    await kb_feedback.start()
+    await claim_scheduler.start()
+    await analysis_archiver.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await analysis_archiver.stop()
+    await claim_scheduler.stop()
+    # Flush buffered analyses after the workers have stopped producing them
+    await kb_feedback.stop()
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -36,12 +58,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request sampling when an admin sends X-Profile
+app.add_middleware(RequestProfilingMiddleware)
+
+# Records sanitized requests for load replay when TRAFFIC_CAPTURE_PATH is set
+app.add_middleware(TrafficCaptureMiddleware, exclude="/api/v1/health,/api/v1/admin")
+
 # Include routers
 app.include_router(claims.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
 app.include_router(comments.router, prefix="/api/v1")
 app.include_router(rti.router, prefix="/api/v1")
 app.include_router(dashboard.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
+app.include_router(sources.router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -81,7 +111,10 @@ async def health_check():
         "services": {
             "ai_service": "healthy" if ai_healthy else "unhealthy",
             "database": "healthy" if db_healthy else "unhealthy"
-        }
+        },
+        "scheduler": claim_scheduler.stats(),
+        "kb_feedback": kb_feedback.snapshot(),
+        "analysis_archive": analysis_archiver.snapshot()
     }
 
 if __name__ == "__main__":
@@ -56,6 +56,12 @@ class RTIRequestCreate(BaseModel):
     claim_id: uuid.UUID
     reason: str
 
+class UploadURLRequest(BaseModel):
+    filename: str
+    content_type: ContentType
+    mime_type: str
+    size_bytes: int
+
 # Response Models
 class UserProfile(BaseModel):
     id: uuid.UUID
@@ -73,10 +79,16 @@ class ClaimResponse(BaseModel):
     content_type: ContentType
     original_url: Optional[str]
     file_path: Optional[str]
+    file_hash: Optional[str] = None
     status: ClaimStatus
     created_at: datetime
     updated_at: datetime
 
+class UploadURLResponse(BaseModel):
+    file_path: str
+    signed_url: str
+    token: str
+
 class EvidenceItem(BaseModel):
     source: str
     excerpt: str
@@ -136,6 +148,21 @@ class SearchResult(BaseModel):
     page: int
     per_page: int
 
+class SourceResponse(BaseModel):
+    id: int
+    url: Optional[str]
+    title: str
+    source_type: Optional[str]
+    verified: bool = False
+    created_at: datetime
+
+class SourceClaimsResult(BaseModel):
+    source: SourceResponse
+    claims: List[ClaimResponse]
+    total_count: int
+    page: int
+    per_page: int
+
 # --- ADD THE FOLLOWING MODELS ---
 
 # AI Service Models (for communication between backend and ai-service)
@@ -144,6 +171,9 @@ class AIAnalysisRequest(BaseModel):
     content: str
     content_type: ContentType
     file_url: Optional[str] = None # Using URL instead of path
+    source_url: Optional[str] = None # Linked page of a URL claim
+    extracted_text: Optional[str] = None # Cached OCR text / transcript for deduplicated media
+    checkpoints: Optional[Dict[str, Any]] = None # Stage outputs from an earlier attempt, e.g. "context"
 
 # Update forward references
 CommentResponse.model_rebuild()
\ No newline at end of file
@@ -0,0 +1,52 @@
+# backend/app/routers/admin.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.services.profiling import (
+    require_admin, profile_cpu, request_profiles, memory_tracker
+)
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/profile/cpu", response_class=PlainTextResponse)
+async def cpu_profile(seconds: float = Query(10.0, gt=0), interval_ms: float = Query(5.0, ge=1)):
+    """Samples every thread for `seconds` and returns folded stacks for flamegraph tools."""
+    return await profile_cpu(seconds, interval_ms / 1000)
+
+@router.get("/profile/requests")
+async def list_request_profiles():
+    """Recent profiles of requests sent with the X-Profile header."""
+    return {"profiles": request_profiles.list()}
+
+@router.get("/profile/requests/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str):
+    folded = request_profiles.get(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return folded
+
+@router.post("/memory/start")
+async def start_memory_tracing(frames: int = Query(10, ge=1, le=50)):
+    """Turns on tracemalloc and records a baseline snapshot."""
+    return memory_tracker.start(frames)
+
+@router.post("/memory/snapshot")
+async def memory_snapshot():
+    """Records a new baseline for subsequent diffs."""
+    try:
+        return memory_tracker.snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/memory/diff")
+async def memory_diff(limit: int = Query(25, ge=1, le=200), group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")):
+    """Allocation growth since the baseline, largest first."""
+    try:
+        return memory_tracker.diff(limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/memory/stop")
+async def stop_memory_tracing():
+    return memory_tracker.stop()
@@ -1,22 +1,59 @@
 # backend/app/routers/claims.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, File, UploadFile, Form, Request, Response
 from typing import List, Optional
+from datetime import datetime
 import uuid
+import logging
 
 # Use the centralized Supabase client and schemas
 from app.db import supabase
 from app.models.schemas import (
     ClaimResponse, ClaimDetail, ClaimAnalysis, SearchResult, 
-    ContentType, ClaimStatus
+    ContentType, ClaimStatus, UploadURLRequest, UploadURLResponse
 )
 from app.services.auth import get_current_user, User
-from app.services.claim_processor import process_claim_async
+from app.services.claim_scheduler import claim_scheduler, trend_key_for
+from app.services.response_cache import response_cache, claim_key, if_none_match, CachedResponse
+from app.services.analysis_archive import analysis_archiver
+from app.services.source_refs import hydrate_source_refs
+from app.services.uploads import (
+    spool_upload, validate_upload, create_signed_upload, validate_client_file_path,
+    store_upload, acquire_media_file, release_media_file
+)
 
 router = APIRouter(prefix="/claims", tags=["claims"])
-STORAGE_BUCKET_NAME = "claim_files"
+logger = logging.getLogger(__name__)
+
+
+def _schedule_claim(claim: dict, current_user: User):
+    claim_scheduler.submit(
+        claim["id"], str(current_user.id), ContentType(claim["content_type"]),
+        is_expert=current_user.is_expert,
+        trend_key=trend_key_for(claim["content"], claim.get("file_hash"))
+    )
+
+
+async def _store_and_schedule(claim: dict, upload, storage_path: str, current_user: User):
+    """Background task: relay the file to storage, then queue the claim for analysis."""
+    if await store_upload(claim["id"], upload, storage_path):
+        _schedule_claim(claim, current_user)
+
+
+@router.post("/upload-url", response_model=UploadURLResponse)
+async def create_upload_url(
+    upload_request: UploadURLRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Issue a signed URL so the client can upload a claim file directly to storage."""
+    validate_upload(upload_request.content_type, upload_request.mime_type, upload_request.size_bytes)
+    try:
+        signed = create_signed_upload(str(current_user.id), upload_request.filename, upload_request.mime_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create upload URL: {str(e)}")
+    return UploadURLResponse(**signed)
+
 
-# The /submit endpoint is already correct from the previous fix
 @router.post("/submit", response_model=ClaimResponse)
 async def submit_claim(
     background_tasks: BackgroundTasks,
@@ -24,75 +61,180 @@ async def submit_claim(
     content_type: ContentType = Form(...),
     original_url: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
+    file_path: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Create a claim. Files are either attached to this request, in which case the
+    copy spooled for the request is relayed to storage in the background, or uploaded
+    beforehand through /upload-url and referenced by `file_path`.
+    """
+    # Reject early, before the file is hashed or a row is created
+    claim_scheduler.check_admission(str(current_user.id), content_type)
+
+    upload = None
     storage_file_path = None
+    file_hash = None
     if file:
+        upload = await spool_upload(file, content_type)
+        file_hash = upload.sha256
         try:
-            content_bytes = await file.read()
-            file_extension = file.filename.split(".")[-1]
-            unique_filename = f"{current_user.id}/{uuid.uuid4()}.{file_extension}"
-            supabase.storage.from_(STORAGE_BUCKET_NAME).upload(
-                path=unique_filename, file=content_bytes, file_options={"content-type": file.content_type}
-            )
-            storage_file_path = unique_filename
+            storage_file_path, already_stored = acquire_media_file(upload)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+            upload.discard()
+            raise HTTPException(status_code=500, detail=f"Failed to register file: {str(e)}")
+        if already_stored:
+            # Identical media was uploaded before; reuse the stored copy
+            upload.discard()
+            upload = None
+    elif file_path:
+        storage_file_path = validate_client_file_path(str(current_user.id), file_path)
 
     claim_data = {
         "user_id": str(current_user.id), "content": content, "content_type": content_type.value,
-        "original_url": original_url, "file_path": storage_file_path, "status": ClaimStatus.PENDING.value
+        "original_url": original_url, "file_path": storage_file_path, "file_hash": file_hash,
+        "status": ClaimStatus.PENDING.value
     }
-    
-    result = supabase.table("claims").insert(claim_data).execute()
-    
-    if not result.data:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create claim record in database.")
-        
+
+    # Until the claim row exists it does not own the media reference, so any failure
+    # (including the insert raising) gives the reference back. Once it exists, the
+    # claim's delete trigger releases it, even if relaying the file fails later.
+    try:
+        result = supabase.table("claims").insert(claim_data).execute()
+        if not result.data:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create claim record in database.")
+    except Exception as e:
+        if upload:
+            upload.discard()
+        if file_hash:
+            try:
+                release_media_file(file_hash)
+            except Exception as release_error:
+                logger.error(f"Could not release media reference {file_hash}: {release_error}")
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to create claim: {e}")
+
     claim = result.data[0]
+    await response_cache.invalidate_listings()
     
-    background_tasks.add_task(process_claim_async, claim["id"])
+    if upload:
+        background_tasks.add_task(_store_and_schedule, claim, upload, storage_file_path, current_user)
+    else:
+        _schedule_claim(claim, current_user)
     
     return ClaimResponse(**claim)
 
 
-@router.get("/{claim_id}", response_model=ClaimDetail)
-async def get_claim(claim_id: uuid.UUID):
-    """Get claim details with analysis and comment count in a single query"""
-    result = supabase.table("claims").select(
-        "*, claim_analyses(*), claim_comments(count)"
-    ).eq("id", str(claim_id)).single().execute()
-
-    if not result.data:
+@router.post("/{claim_id}/retry", response_model=ClaimResponse)
+async def retry_claim(claim_id: uuid.UUID, current_user: User = Depends(get_current_user)):
+    """
+    Re-queue a failed claim. Stages the failed attempt completed are resumed
+    from their checkpoints rather than run again.
+    """
+    existing = supabase.table("claims").select("*").eq("id", str(claim_id)).execute()
+    if not existing.data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Claim not found")
-        
-    claim_data = result.data
-    
-    # --- THIS IS THE CORRECTED SECTION ---
-    analysis_data_list = claim_data.get("claim_analyses")
+    claim = existing.data[0]
+    if claim["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the claim's author can retry it")
+    if claim["status"] != ClaimStatus.FAILED.value:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Only failed claims can be retried")
+
+    claim_scheduler.check_admission(str(current_user.id), ContentType(claim["content_type"]))
+    # Conditional on the current status, so concurrent retries schedule the claim only once
+    updated = supabase.table("claims").update(
+        {"status": ClaimStatus.PENDING.value}
+    ).eq("id", str(claim_id)).eq("status", ClaimStatus.FAILED.value).execute()
+    if not updated.data:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Claim is already being retried")
+
+    claim = updated.data[0]
+    await response_cache.invalidate_claim(str(claim_id))
+    _schedule_claim(claim, current_user)
+    return ClaimResponse(**claim)
+
+
+def _build_claim_detail(item: dict) -> ClaimDetail:
+    """Builds a ClaimDetail from a claims row joined with its analysis and comment count."""
+    analysis_data_list = item.get("claim_analyses")
     analysis = None
     # Check if the list exists and is not empty before accessing the first element
     if analysis_data_list:
         analysis = ClaimAnalysis(**analysis_data_list[0])
-    # --- END OF CORRECTION ---
 
-    comment_count = claim_data.get("claim_comments", [{}])[0].get("count", 0)
+    comment_count = item.get("claim_comments", [{}])[0].get("count", 0)
 
     return ClaimDetail(
-        claim=ClaimResponse(**claim_data),
+        claim=ClaimResponse(**item),
         analysis=analysis,
         comment_count=comment_count
     )
 
 
+def _cached_response(request: Request, entry: CachedResponse, cache_control: str) -> Response:
+    """Serves a cached body, answering conditional requests with 304."""
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if if_none_match(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+@router.get("/{claim_id}", response_model=ClaimDetail)
+async def get_claim(claim_id: uuid.UUID, request: Request):
+    """Get claim details with analysis and comment count in a single query"""
+    key = claim_key(str(claim_id))
+    entry = await response_cache.get(key)
+    if entry:
+        return _cached_response(request, entry, "public, no-cache")
+
+    result = supabase.table("claims").select(
+        "*, claim_analyses(*), claim_comments(count)"
+    ).eq("id", str(claim_id)).single().execute()
+
+    if not result.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Claim not found")
+
+    analyses = result.data.get("claim_analyses") or []
+    await analysis_archiver.hydrate(analyses)
+    hydrate_source_refs(analyses)
+    detail = _build_claim_detail(result.data)
+    body = detail.model_dump_json().encode()
+
+    # Completed claims are immutable apart from their comment count, which
+    # invalidates the entry explicitly; the TTL bounds staleness from comments
+    # changed directly through Supabase.
+    if detail.claim.status == ClaimStatus.COMPLETED:
+        entry = await response_cache.set(key, body, ttl=response_cache.detail_ttl)
+        return _cached_response(request, entry, "public, no-cache")
+
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+
+
 @router.get("/", response_model=SearchResult)
 async def search_claims(
+    request: Request,
     q: Optional[str] = None,
     status: Optional[ClaimStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     page: int = 1,
     per_page: int = 20
 ):
-    """Search and filter claims with optimized single-query fetching"""
+    """
+    Search and filter claims with optimized single-query fetching.
+    `since` / `until` optionally restrict the search to claims created in
+    [since, until), which lets the query skip monthly partitions outside it.
+    """
+    cache_control = f"public, max-age={response_cache.listing_ttl}"
+    key = await response_cache.listing_key({
+        "q": q, "status": status.value if status else None, "page": page, "per_page": per_page,
+        "since": since.isoformat() if since else None, "until": until.isoformat() if until else None
+    })
+    entry = await response_cache.get(key)
+    if entry:
+        return _cached_response(request, entry, cache_control)
+
     offset = (page - 1) * per_page
     query = supabase.table("claims").select(
         "*, claim_analyses(*), claim_comments(count)",
@@ -104,33 +246,31 @@ async def search_claims(
     
     if status:
         query = query.eq("status", status.value)
+
+    # Bounds on the partition key let the planner skip months outside the window
+    if since:
+        query = query.gte("created_at", since.isoformat())
+    if until:
+        query = query.lt("created_at", until.isoformat())
     
     result = query.order("created_at", desc=True).range(offset, offset + per_page - 1).execute()
+    analyses = [a for item in result.data for a in item.get("claim_analyses") or []]
+    await analysis_archiver.hydrate(analyses)
+    # One round-trip for the source references of the whole page
+    hydrate_source_refs(analyses)
     
-    claim_details = []
-    for item in result.data:
-        # --- THIS IS THE CORRECTED SECTION ---
-        analysis_data_list = item.get("claim_analyses")
-        analysis = None
-        if analysis_data_list:
-            analysis = ClaimAnalysis(**analysis_data_list[0])
-        # --- END OF CORRECTION ---
-
-        comment_count = item.get("claim_comments", [{}])[0].get("count", 0)
-        
-        claim_details.append(ClaimDetail(
-            claim=ClaimResponse(**item),
-            analysis=analysis,
-            comment_count=comment_count
-        ))
-    
-    return SearchResult(
-        claims=claim_details,
+    search_result = SearchResult(
+        claims=[_build_claim_detail(item) for item in result.data],
         total_count=result.count or 0,
         page=page,
         per_page=per_page
     )
 
+    entry = await response_cache.set(
+        key, search_result.model_dump_json().encode(), ttl=response_cache.listing_ttl
+    )
+    return _cached_response(request, entry, cache_control)
+
 @router.get("/{claim_id}/status")
 async def get_claim_status(claim_id: uuid.UUID):
     """Get current processing status of a claim"""
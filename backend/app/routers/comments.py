@@ -8,6 +8,7 @@ import uuid
 from app.db import supabase
 from app.models.schemas import CommentCreate, CommentResponse, CommentVote
 from app.services.auth import get_current_user, get_current_user_optional, User
+from app.services.response_cache import response_cache
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
@@ -38,7 +39,13 @@ async def create_comment(
     current_user: User = Depends(get_current_user)
 ):
     """Create a new comment and return the full object in one query."""
+    # Comments are stored in their claim's partition, keyed by the claim's created_at
+    claim = supabase.table("claims").select("created_at").eq("id", str(comment.claim_id)).maybe_single().execute()
+    if not claim or not claim.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Claim not found")
+
     comment_data = comment.model_dump()
+    comment_data["claim_created_at"] = claim.data["created_at"]
     comment_data["user_id"] = str(current_user.id)
     comment_data["is_expert_response"] = current_user.is_expert
     
@@ -48,9 +55,32 @@ async def create_comment(
     
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create comment.")
+
+    # The cached claim detail and listings embed the comment count
+    await response_cache.invalidate_claim(str(comment.claim_id))
     
     return CommentResponse(**result.data)
 
+@router.delete("/{comment_id}")
+async def delete_comment(
+    comment_id: uuid.UUID,
+    current_user: User = Depends(get_current_user)
+):
+    """Delete one of your own comments (and its replies)."""
+    existing = supabase.table("claim_comments").select("claim_id, user_id").eq("id", str(comment_id)).execute()
+    if not existing.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
+    comment = existing.data[0]
+    if comment["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only the comment's author can delete it")
+
+    supabase.table("claim_comments").delete().eq("id", str(comment_id)).execute()
+
+    # The cached claim detail and listings embed the comment count
+    await response_cache.invalidate_claim(str(comment["claim_id"]))
+
+    return {"status": "success", "message": "Comment deleted."}
+
 @router.post("/{comment_id}/vote")
 async def vote_on_comment(
     comment_id: uuid.UUID,
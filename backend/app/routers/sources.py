@@ -0,0 +1,51 @@
+# backend/app/routers/sources.py
+
+from fastapi import APIRouter, HTTPException, status
+
+# Use the centralized Supabase client and schemas
+from app.db import supabase
+from app.models.schemas import SourceResponse, SourceClaimsResult, ClaimResponse
+
+router = APIRouter(prefix="/sources", tags=["sources"])
+
+SOURCE_COLUMNS = "id, url, title, source_type, verified, created_at"
+
+
+def _get_source(source_id: int) -> SourceResponse:
+    result = supabase.table("sources").select(SOURCE_COLUMNS).eq("id", source_id).maybe_single().execute()
+    if not result or not result.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source not found")
+    return SourceResponse(**result.data)
+
+
+@router.get("/{source_id}", response_model=SourceResponse)
+async def get_source(source_id: int):
+    """Get a cited source (without its stored text)."""
+    return _get_source(source_id)
+
+
+@router.get("/{source_id}/claims", response_model=SourceClaimsResult)
+async def get_source_claims(source_id: int, page: int = 1, per_page: int = 20):
+    """Claims whose analysis cites this source, newest first."""
+    source = _get_source(source_id)
+    cited = supabase.rpc("get_source_claims", {
+        "p_source_id": source_id, "p_limit": per_page, "p_offset": (page - 1) * per_page
+    }).execute().data or []
+
+    claims = []
+    if cited:
+        # Bounds on the partition key keep the lookup to the months the page spans
+        created = [row["claim_created_at"] for row in cited]
+        result = supabase.table("claims").select("*").in_(
+            "id", [row["claim_id"] for row in cited]
+        ).gte("created_at", min(created)).lte("created_at", max(created)).execute()
+        by_id = {row["id"]: row for row in result.data or []}
+        claims = [ClaimResponse(**by_id[row["claim_id"]]) for row in cited if row["claim_id"] in by_id]
+
+    return SourceClaimsResult(
+        source=source,
+        claims=claims,
+        total_count=cited[0]["total_count"] if cited else 0,
+        page=page,
+        per_page=per_page
+    )
@@ -0,0 +1,169 @@
+# backend/app/services/analysis_archive.py
+
+"""
+Partition maintenance and cold archiving for claim analyses.
+claims, claim_analyses and claim_comments are partitioned by month (see
+section 15 of schema.sql). A background task keeps future partitions
+created and moves the evidence/sources payloads of analyses older than
+ANALYSIS_ARCHIVE_AFTER_DAYS to gzipped JSON objects in the private
+analysis_archive bucket, clearing the JSONB columns so old partitions stay
+narrow. Analyses whose sources are normalized (see source_refs.py) have no
+inline payload and are skipped. Reads hydrate archived payloads back from
+storage.
+"""
+
+import os
+import gzip
+import json
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.db import supabase
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BUCKET_NAME = "analysis_archive"
+ARCHIVED_FIELDS = ("evidence", "sources")
+
+
+def archive_path(row: Dict[str, Any]) -> str:
+    """Storage object for an analysis payload, grouped by the claim's month: `2025/03/<claim_id>.json.gz`."""
+    month = row["claim_created_at"][:7].replace("-", "/")
+    return f"{month}/{row['claim_id']}.json.gz"
+
+
+class AnalysisArchiver:
+    """
+    Periodic partition maintenance plus batched archiving. Configuration (env):
+        ANALYSIS_ARCHIVE_AFTER_DAYS        claim age at which payloads move to storage (0 disables)
+        ANALYSIS_ARCHIVE_BATCH_SIZE        analyses archived per database round-trip
+        ANALYSIS_ARCHIVE_INTERVAL_SECONDS  pause between runs
+        CLAIM_PARTITION_MONTHS_AHEAD       monthly partitions kept created in advance
+    """
+
+    def __init__(self):
+        self.archive_after_days = int(os.getenv("ANALYSIS_ARCHIVE_AFTER_DAYS", 180))
+        self.batch_size = int(os.getenv("ANALYSIS_ARCHIVE_BATCH_SIZE", 200))
+        self.interval = float(os.getenv("ANALYSIS_ARCHIVE_INTERVAL_SECONDS", 3600))
+        self.months_ahead = int(os.getenv("CLAIM_PARTITION_MONTHS_AHEAD", 3))
+        self._task: Optional[asyncio.Task] = None
+        self._maintained_on: Optional[date] = None
+        self.stats = {"runs": 0, "partitions_created": 0, "archived": 0, "failed": 0, "hydrated": 0, "hydrate_failed": 0}
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Analysis archiver run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        self.stats["runs"] += 1
+        # Partitions are created months ahead, so once a day is plenty
+        today = datetime.now(timezone.utc).date()
+        if self._maintained_on != today:
+            created = await run_in_threadpool(self._ensure_partitions_sync)
+            self.stats["partitions_created"] += created
+            if created:
+                logger.info(f"Created {created} claim partitions.")
+            self._maintained_on = today
+
+        if self.archive_after_days <= 0:
+            return
+        while True:
+            selected, archived = await run_in_threadpool(self._archive_batch_sync)
+            # Stop on a short batch, or when nothing in a full batch could be archived
+            if selected < self.batch_size or archived == 0:
+                break
+
+    # --- Maintenance and archiving ---
+
+    def _ensure_partitions_sync(self) -> int:
+        result = supabase.rpc("ensure_claim_partitions", {"p_months_ahead": self.months_ahead}).execute()
+        return result.data or 0
+
+    def _archive_batch_sync(self) -> Tuple[int, int]:
+        """Archives the oldest unarchived analyses; returns (selected, archived)."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.archive_after_days)
+        rows = supabase.table("claim_analyses").select(
+            "id, claim_id, claim_created_at, evidence, sources"
+        ).is_("archived_at", "null").not_.is_("evidence", "null").lt(
+            "claim_created_at", cutoff.isoformat()
+        ).order("claim_created_at").limit(self.batch_size).execute().data or []
+
+        archived = 0
+        for row in rows:
+            path = archive_path(row)
+            payload = gzip.compress(json.dumps({field: row[field] for field in ARCHIVED_FIELDS}).encode())
+            try:
+                # Upload first: a crash in between leaves the payload in both places, never in neither
+                supabase.storage.from_(ARCHIVE_BUCKET_NAME).upload(
+                    path=path, file=payload,
+                    file_options={"content-type": "application/gzip", "upsert": "true"}
+                )
+                # Filtering on the partition key keeps the update to a single partition
+                supabase.table("claim_analyses").update({
+                    "evidence": None, "sources": None, "archive_path": path,
+                    "archived_at": datetime.now(timezone.utc).isoformat(),
+                }).eq("id", row["id"]).eq("claim_created_at", row["claim_created_at"]).execute()
+                archived += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"Could not archive analysis for claim {row['claim_id']}: {e}")
+        self.stats["archived"] += archived
+        if archived:
+            logger.info(f"Archived {archived} analysis payloads to cold storage.")
+        return len(rows), archived
+
+    # --- Reads ---
+
+    def _load_sync(self, path: str) -> Dict[str, Any]:
+        data = supabase.storage.from_(ARCHIVE_BUCKET_NAME).download(path)
+        return json.loads(gzip.decompress(data))
+
+    async def hydrate(self, analyses: List[Dict[str, Any]]):
+        """Restores archived evidence and sources in place, downloading payloads concurrently."""
+        archived = [a for a in analyses if a.get("archive_path") and a.get("evidence") is None]
+        if not archived:
+            return
+        payloads = await asyncio.gather(
+            *(run_in_threadpool(self._load_sync, a["archive_path"]) for a in archived),
+            return_exceptions=True
+        )
+        for analysis, payload in zip(archived, payloads):
+            if isinstance(payload, Exception):
+                # The verdict and summary are still inline; show them without the evidence
+                self.stats["hydrate_failed"] += 1
+                logger.warning(f"Could not load archived analysis {analysis['archive_path']}: {payload}")
+                payload = {}
+            else:
+                self.stats["hydrated"] += 1
+            for field in ARCHIVED_FIELDS:
+                analysis[field] = payload.get(field) or []
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "archive_after_days": self.archive_after_days,
+            "partitions_checked_on": self._maintained_on.isoformat() if self._maintained_on else None,
+            **self.stats,
+        }
+
+
+# Create the archiver once; its maintenance loop is started with the application
+analysis_archiver = AnalysisArchiver()
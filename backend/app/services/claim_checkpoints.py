@@ -0,0 +1,51 @@
+# backend/app/services/claim_checkpoints.py
+
+"""
+Per-stage checkpoints for claim processing.
+Each stage's output is stored under (claim_id, stage) as soon as it is known,
+so reprocessing a claim after a failure or deferral resumes from the last
+completed stage. Writes are upserts, which makes replaying a stage harmless.
+"""
+
+import logging
+from typing import Any, Dict
+
+from app.db import supabase
+
+logger = logging.getLogger(__name__)
+
+# Stages in processing order
+EXTRACT = "extract"          # {"extracted_text": ...}
+CONTEXT = "context"          # {"retrieved": [{id, similarity, ...}], "web": [...]}
+ANALYSIS = "analysis"        # the AI service's final result
+
+
+def load_checkpoints(claim_id: str) -> Dict[str, Any]:
+    """Returns {stage: output} for every stage the claim has completed."""
+    try:
+        result = supabase.table("claim_processing_checkpoints").select(
+            "stage, output"
+        ).eq("claim_id", claim_id).execute()
+        return {row["stage"]: row["output"] for row in result.data or []}
+    except Exception as e:
+        # Checkpoints only save work; without them the claim is processed from scratch
+        logger.warning(f"Could not load checkpoints for claim {claim_id}: {e}")
+        return {}
+
+
+def save_checkpoint(claim_id: str, stage: str, output: Any):
+    try:
+        supabase.table("claim_processing_checkpoints").upsert(
+            {"claim_id": claim_id, "stage": stage, "output": output},
+            on_conflict="claim_id,stage"
+        ).execute()
+    except Exception as e:
+        logger.warning(f"Could not save '{stage}' checkpoint for claim {claim_id}: {e}")
+
+
+def clear_checkpoints(claim_id: str):
+    """Drops a claim's checkpoints once processing has fully completed."""
+    try:
+        supabase.table("claim_processing_checkpoints").delete().eq("claim_id", claim_id).execute()
+    except Exception as e:
+        logger.warning(f"Could not clear checkpoints for claim {claim_id}: {e}")
@@ -1,37 +1,132 @@
 # backend/app/services/claim_processor.py
 
 import os
+import json
+import asyncio
 import httpx
 from uuid import UUID
+from typing import Optional
+from datetime import datetime, timezone
 
 # Use the centralized Supabase client
 from app.db import supabase
 from app.models.schemas import ClaimStatus, ContentType, AIAnalysisRequest
+from app.services.response_cache import response_cache
+from app.services.kb_feedback import kb_feedback
+from app.services.source_refs import source_refs, store_source_refs
+from app.services.claim_checkpoints import (
+    load_checkpoints, save_checkpoint, clear_checkpoints, EXTRACT, ANALYSIS
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def add_analysis_to_knowledge_base(claim: dict, analysis: dict):
-    """Formats an analysis and sends it to the AI service to be learned."""
+# Total time a claim may spend in the AI service; the remaining budget travels with the request
+AI_ANALYZE_TIMEOUT = float(os.getenv("AI_ANALYZE_TIMEOUT", 300))
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+
+class AIServiceBusyError(Exception):
+    """The AI service refused work because it is saturated; the claim should be retried later."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"AI service is busy; retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def get_cached_extraction(file_hash: Optional[str]) -> Optional[str]:
+    """Returns the stored OCR text / transcript for a media file, if any."""
+    if not file_hash:
+        return None
     try:
-        ai_service_url = os.getenv("AI_SERVICE_URL", "http://localhost:8001")
-        
-        # Format the analysis into a new "article" for the knowledge base
-        new_article = {
-            "title": f"Fact-Check for claim: '{claim['content'][:50]}...'",
-            "content": analysis["summary"] + "\n\nReasoning: " + analysis["ai_reasoning"],
-            "source_url": f"http://localhost:3000/claims/{claim['id']}", # Link back to the claim
-            "source_type": "fact-check",
-            "verified": True
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{ai_service_url}/add-article", json=new_article)
-            response.raise_for_status()
-            logger.info(f"Successfully added analysis for claim {claim['id']} to knowledge base.")
+        result = supabase.table("media_files").select("extracted_text").eq(
+            "sha256", file_hash
+        ).maybe_single().execute()
+        if result and result.data:
+            return result.data.get("extracted_text")
+    except Exception as e:
+        logger.warning(f"Could not read cached extraction for {file_hash}: {e}")
+    return None
+
 
+def cache_extraction(file_hash: str, extracted_text: str):
+    """Stores extraction output so later claims with the same media can reuse it."""
+    try:
+        supabase.table("media_files").update({
+            "extracted_text": extracted_text,
+            "extracted_at": datetime.now(timezone.utc).isoformat()
+        }).eq("sha256", file_hash).execute()
+    except Exception as e:
+        logger.warning(f"Could not cache extraction for {file_hash}: {e}")
+
+
+async def save_preliminary_analysis(claim_id: str, claim_created_at: str, fields: dict):
+    """Persists the early verdict streamed from the AI service before the analysis completes."""
+    try:
+        supabase.table("claim_analyses").upsert({
+            "claim_id": claim_id,
+            "claim_created_at": claim_created_at,
+            "verdict": fields["verdict"],
+            "confidence_score": fields["confidence_score"],
+            "summary": fields.get("summary") or "Analysis in progress...",
+            "evidence": [],
+            "sources": [],
+            "preliminary": True,
+        }, on_conflict="claim_id,claim_created_at").execute()
+        await response_cache.invalidate_listings()
     except Exception as e:
-        logger.error(f"Could not add analysis for claim {claim['id']} to knowledge base: {e}")
+        logger.warning(f"Could not save preliminary analysis for claim {claim_id}: {e}")
+
+
+def discard_preliminary_analysis(claim_id: str):
+    """
+    Removes a preliminary analysis left behind by a run that did not complete.
+    A final analysis is never removed, even if a later step of the run failed.
+    """
+    supabase.table("claim_analyses").delete().eq("claim_id", claim_id).eq("preliminary", True).execute()
+
+
+async def request_analysis(ai_request: AIAnalysisRequest, claim_created_at: str,
+                           timeout: float = AI_ANALYZE_TIMEOUT) -> dict:
+    """
+    Streams an analysis from the AI service, persisting the preliminary verdict
+    as soon as it arrives, and returns the final result.
+    The AI service is told the deadline so it can stop work or return a
+    degraded result in time; when it passes, the stream is closed, which
+    cancels the analysis on the other side.
+    """
+    return await asyncio.wait_for(_stream_analysis(ai_request, claim_created_at, timeout), timeout)
+
+
+async def _stream_analysis(ai_request: AIAnalysisRequest, claim_created_at: str, timeout: float) -> dict:
+    ai_service_url = os.getenv("AI_SERVICE_URL", "http://localhost:8001")
+    
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        async with client.stream(
+            "POST",
+            f"{ai_service_url}/analyze/stream",
+            json=ai_request.model_dump(mode='json'),
+            headers={DEADLINE_HEADER: str(int(timeout * 1000))}
+        ) as response:
+            if response.status_code in (429, 503):
+                raise AIServiceBusyError(float(response.headers.get("Retry-After", 30)))
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["event"] == "partial":
+                    await save_preliminary_analysis(ai_request.claim_id, claim_created_at, event["data"])
+                elif event["event"] == "checkpoint":
+                    save_checkpoint(ai_request.claim_id, event["stage"], event["data"])
+                elif event["event"] == "result":
+                    return event["data"]
+                elif event["event"] == "error":
+                    if event.get("status") == 503:
+                        raise AIServiceBusyError(float(event.get("retry_after", 30)))
+                    raise RuntimeError(event.get("detail", "AI service analysis failed"))
+
+    raise RuntimeError("AI service stream ended without a result")
 
 
 async def process_claim_async(claim_id: UUID):
@@ -39,10 +134,12 @@ async def process_claim_async(claim_id: UUID):
     Asynchronously process a claim and add the result to the knowledge base.
     """
     claim_id_str = str(claim_id)
+    completed = False
     try:
         supabase.table("claims").update(
             {"status": ClaimStatus.PROCESSING.value}
         ).eq("id", claim_id_str).execute()
+        await response_cache.invalidate_listings()
         
         claim_result = supabase.table("claims").select("*").eq("id", claim_id_str).single().execute()
         
@@ -51,55 +148,108 @@ async def process_claim_async(claim_id: UUID):
             return
         
         claim = claim_result.data
+        # Stages finished by an earlier attempt (before a failure or deferral) are not repeated
+        checkpoints = load_checkpoints(claim_id_str)
         
-        file_url = None
-        if claim.get("file_path"):
-            file_url = supabase.storage.from_("claim_files").get_public_url(claim["file_path"])
-
-        ai_request = AIAnalysisRequest(
-            claim_id=claim_id_str,
-            content=claim["content"],
-            content_type=ContentType(claim["content_type"]),
-            file_url=file_url
-        )
-        
-        ai_service_url = os.getenv("AI_SERVICE_URL", "http://localhost:8001")
-        
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{ai_service_url}/analyze",
-                json=ai_request.model_dump(mode='json')
+        # Media already processed for another claim reuses its extraction output,
+        # so the AI service can skip the download and OCR/transcription entirely.
+        cached_extraction = get_cached_extraction(claim.get("file_hash"))
+        extracted_text = cached_extraction
+        if extracted_text is None and EXTRACT in checkpoints:
+            extracted_text = checkpoints[EXTRACT].get("extracted_text")
+
+        if ANALYSIS in checkpoints:
+            logger.info(f"Claim {claim_id_str} resumes after its completed analysis.")
+            ai_result = checkpoints[ANALYSIS]
+        else:
+            file_url = None
+            if claim.get("file_path") and extracted_text is None:
+                file_url = supabase.storage.from_("claim_files").get_public_url(claim["file_path"])
+            source_url = None
+            if claim["content_type"] == ContentType.URL.value and extracted_text is None:
+                # Clients may send the link only as the claim content
+                source_url = claim.get("original_url") or claim["content"].strip()
+
+            ai_request = AIAnalysisRequest(
+                claim_id=claim_id_str,
+                content=claim["content"],
+                content_type=ContentType(claim["content_type"]),
+                file_url=file_url,
+                source_url=source_url,
+                extracted_text=extracted_text,
+                checkpoints={stage: output for stage, output in checkpoints.items() if stage != EXTRACT} or None
             )
-            response.raise_for_status()
-            ai_result = response.json()
+            
+            ai_result = await request_analysis(ai_request, claim["created_at"])
+            save_checkpoint(claim_id_str, ANALYSIS, ai_result)
         
         analysis_data = {
             "claim_id": claim_id_str,
+            "claim_created_at": claim["created_at"],
             "verdict": ai_result["verdict"],
             "confidence_score": ai_result["confidence_score"],
             "summary": ai_result["summary"],
             "evidence": ai_result["evidence"],
             "sources": ai_result["sources"],
-            "ai_reasoning": ai_result["reasoning"]
+            "ai_reasoning": ai_result["reasoning"],
+            "preliminary": False
         }
         
-        supabase.table("claim_analyses").insert(analysis_data).execute()
+        # Sources are stored once and referenced from the analysis, in the same transaction
+        # as the analysis row. The JSONB columns are used when the result cannot be
+        # normalized, or as a fallback so the analysis never loses its evidence.
+        refs = source_refs(ai_result)
+        if not refs or not store_source_refs(claim_id_str, claim["created_at"], analysis_data, refs):
+            # Upsert on the claim's key replaces the preliminary row written while the
+            # verdict streamed in, and makes a replay after a crash idempotent
+            supabase.table("claim_analyses").upsert(analysis_data, on_conflict="claim_id,claim_created_at").execute()
+
+        if claim.get("file_hash") and cached_extraction is None and ai_result.get("extracted_text"):
+            cache_extraction(claim["file_hash"], ai_result["extracted_text"])
         
         supabase.table("claims").update(
             {"status": ClaimStatus.COMPLETED.value}
         ).eq("id", claim_id_str).execute()
+        completed = True
+        await response_cache.invalidate_claim(claim_id_str)
         
         logger.info(f"Successfully processed claim {claim_id_str}")
         
         # --- NEW STEP: ADD RESULT TO KNOWLEDGE BASE ---
-        # After successfully processing, add the result back for future reference.
-        await add_analysis_to_knowledge_base(claim, analysis_data)
+        # After successfully processing, queue the result to be added back for future
+        # reference; it is written in batches off the critical path.
+        # Results cut short by the deadline are not trustworthy enough to learn from.
+        if ai_result.get("degraded"):
+            logger.warning(f"Claim {claim_id_str} analysis degraded ({ai_result.get('degraded_stages')}); not adding to knowledge base.")
+        else:
+            await kb_feedback.submit(claim, analysis_data)
+        clear_checkpoints(claim_id_str)
         
+    except AIServiceBusyError:
+        # Leave the claim pending so the scheduler can defer and retry it
+        try:
+            discard_preliminary_analysis(claim_id_str)
+        except Exception as db_e:
+            logger.error(f"Could not discard the preliminary analysis of claim {claim_id_str}: {db_e}")
+        try:
+            supabase.table("claims").update(
+                {"status": ClaimStatus.PENDING.value}
+            ).eq("id", claim_id_str).execute()
+            await response_cache.invalidate_listings()
+        except Exception as db_e:
+            logger.error(f"Could not reset claim {claim_id_str} to PENDING status: {db_e}")
+        raise
     except Exception as e:
+        if completed:
+            # The analysis is stored and the claim completed; only a follow-up step failed
+            logger.error(f"Claim {claim_id_str} completed, but a follow-up step failed: {e}", exc_info=True)
+            return
         logger.error(f"Error processing claim {claim_id_str}: {e}", exc_info=True)
         try:
+            discard_preliminary_analysis(claim_id_str)
             supabase.table("claims").update(
                 {"status": ClaimStatus.FAILED.value}
             ).eq("id", claim_id_str).execute()
+            await response_cache.invalidate_claim(claim_id_str)
         except Exception as db_e:
             logger.error(f"Could not even update claim {claim_id_str} to FAILED status: {db_e}")
\ No newline at end of file
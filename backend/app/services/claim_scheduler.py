@@ -0,0 +1,327 @@
+# backend/app/services/claim_scheduler.py
+
+"""
+Scheduler in front of process_claim_async.
+Claims are split into lanes by content type so cheap text claims are never
+stuck behind expensive media, and within a lane users are served by weighted
+fair queuing so no single user can monopolise the workers.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import hashlib
+import logging
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Callable, Awaitable
+
+from fastapi import HTTPException, status
+
+from app.db import supabase
+from app.models.schemas import ClaimStatus, ContentType
+from app.services.claim_processor import process_claim_async, AIServiceBusyError
+from app.services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Relative cost of analysing each content type; larger costs advance a user's
+# virtual finish time further, so bulk media submissions yield to others sooner.
+CONTENT_COSTS = {
+    ContentType.TEXT: 1.0,
+    ContentType.URL: 2.0,
+    ContentType.IMAGE: 4.0,
+    ContentType.VIDEO: 10.0,
+}
+
+LANE_FOR_CONTENT = {
+    ContentType.TEXT: "text",
+    ContentType.URL: "text",
+    ContentType.IMAGE: "media",
+    ContentType.VIDEO: "media",
+}
+
+
+class ScheduledClaim:
+    """A claim waiting in a lane, ordered by its virtual finish tag."""
+
+    __slots__ = ("claim_id", "user_id", "finish_tag", "start_tag", "seq", "enqueued_at", "deferrals")
+
+    def __init__(self, claim_id: str, user_id: str, start_tag: float, finish_tag: float, seq: int):
+        self.claim_id = claim_id
+        self.user_id = user_id
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.deferrals = 0
+
+    def __lt__(self, other: "ScheduledClaim") -> bool:
+        return (self.finish_tag, self.seq) < (other.finish_tag, other.seq)
+
+
+class Lane:
+    """A bounded queue with its own worker pool and fair-queuing state."""
+
+    def __init__(self, name: str, concurrency: int, queue_limit: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.heap: List[ScheduledClaim] = []
+        self.virtual_time = 0.0
+        self.user_finish: Dict[str, float] = {}
+        self.user_pending: Dict[str, int] = defaultdict(int)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.ready = asyncio.Event()
+        self.workers: List[asyncio.Task] = []
+        self.stats = {"processed": 0, "failed": 0, "deferred": 0, "rejected": 0, "total_wait": 0.0}
+
+    def snapshot(self) -> Dict[str, object]:
+        processed = self.stats["processed"] + self.stats["failed"]
+        return {
+            "queued": len(self.heap),
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "paused_for": max(0.0, round(self.paused_until - time.monotonic(), 1)),
+            "avg_wait_seconds": round(self.stats["total_wait"] / processed, 3) if processed else 0.0,
+            **{k: v for k, v in self.stats.items() if k != "total_wait"},
+        }
+
+
+class ClaimScheduler:
+    """Per-content-type lanes with weighted fair queuing and admission control."""
+
+    def __init__(self, runner: Callable[[str], Awaitable[None]] = process_claim_async):
+        self.runner = runner
+        self.lanes = {
+            "text": Lane(
+                "text",
+                int(os.getenv("CLAIM_TEXT_CONCURRENCY", 8)),
+                int(os.getenv("CLAIM_TEXT_QUEUE_LIMIT", 500)),
+            ),
+            "media": Lane(
+                "media",
+                int(os.getenv("CLAIM_MEDIA_CONCURRENCY", 2)),
+                int(os.getenv("CLAIM_MEDIA_QUEUE_LIMIT", 100)),
+            ),
+        }
+        self.user_queue_limit = int(os.getenv("CLAIM_USER_QUEUE_LIMIT", 20))
+        self.expert_weight = float(os.getenv("CLAIM_EXPERT_WEIGHT", 2.0))
+        self.trending_weight = float(os.getenv("CLAIM_TRENDING_WEIGHT", 2.0))
+        self.trending_window = float(os.getenv("CLAIM_TRENDING_WINDOW", 600))
+        self.trending_threshold = int(os.getenv("CLAIM_TRENDING_THRESHOLD", 3))
+        self.max_deferrals = int(os.getenv("CLAIM_MAX_DEFERRALS", 5))
+        # Off by default: every API process would re-enqueue the same claims and analyse each
+        # of them once per process. Enable it on exactly one process (or on the only one).
+        self.recover_on_start = os.getenv("CLAIM_RECOVER_ON_START", "false").lower() == "true"
+        self._recent: Dict[str, deque] = defaultdict(deque)
+        self._seq = 0
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        for lane in self.lanes.values():
+            lane.workers = [
+                asyncio.create_task(self._worker(lane)) for _ in range(lane.concurrency)
+            ]
+        if self.recover_on_start:
+            try:
+                self.recover_unfinished()
+            except Exception as e:
+                logger.error(f"Could not re-enqueue unfinished claims: {e}")
+
+    def recover_unfinished(self, page_size: int = 500) -> int:
+        """
+        Re-enqueues claims left pending or processing by a previous run, whose
+        queue lived only in memory. Finished stages resume from their checkpoints.
+        Media claims whose file never reached storage (the spooled upload died
+        with the process) cannot be analysed, so they are marked failed instead.
+        """
+        claims = []
+        while True:
+            rows = supabase.table("claims").select(
+                "id, user_id, content, content_type, file_path, file_hash, user:user_profiles(is_expert)"
+            ).in_(
+                "status", [ClaimStatus.PENDING.value, ClaimStatus.PROCESSING.value]
+            ).order("created_at").order("id").range(len(claims), len(claims) + page_size - 1).execute().data or []
+            claims.extend(rows)
+            if len(rows) < page_size:
+                break
+
+        hashes = list({claim["file_hash"] for claim in claims if claim.get("file_hash")})
+        uploaded = set()
+        for i in range(0, len(hashes), page_size):
+            result = supabase.table("media_files").select("sha256").in_(
+                "sha256", hashes[i:i + page_size]
+            ).eq("uploaded", True).execute()
+            uploaded.update(row["sha256"] for row in result.data or [])
+
+        stranded = []
+        for claim in claims:
+            content_type = ContentType(claim["content_type"])
+            if LANE_FOR_CONTENT[content_type] == "media" and (
+                not claim.get("file_path") or (claim.get("file_hash") and claim["file_hash"] not in uploaded)
+            ):
+                stranded.append(claim["id"])
+                continue
+            self.submit(
+                claim["id"], claim["user_id"], content_type,
+                is_expert=bool((claim.get("user") or {}).get("is_expert")),
+                trend_key=trend_key_for(claim["content"], claim.get("file_hash"))
+            )
+
+        for i in range(0, len(stranded), page_size):
+            supabase.table("claims").update(
+                {"status": ClaimStatus.FAILED.value}
+            ).in_("id", stranded[i:i + page_size]).execute()
+        if stranded:
+            asyncio.create_task(response_cache.invalidate_listings())
+        if claims:
+            logger.info(f"Re-enqueued {len(claims) - len(stranded)} unfinished claims; "
+                        f"{len(stranded)} media claims without a stored file were marked failed.")
+        return len(claims) - len(stranded)
+
+    async def stop(self):
+        for lane in self.lanes.values():
+            for worker in lane.workers:
+                worker.cancel()
+            await asyncio.gather(*lane.workers, return_exceptions=True)
+            lane.workers = []
+
+    # --- Admission and enqueueing ---
+
+    def check_admission(self, user_id: str, content_type: ContentType):
+        """Rejects a submission before any work is done if its lane cannot take it."""
+        lane = self.lanes[LANE_FOR_CONTENT[content_type]]
+        if lane.user_pending.get(user_id, 0) >= self.user_queue_limit:
+            lane.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="You have too many claims waiting to be analyzed. Please try again later.",
+                headers={"Retry-After": "60"}
+            )
+        if len(lane.heap) >= lane.queue_limit:
+            lane.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The analysis queue is full. Please try again later.",
+                headers={"Retry-After": "30"}
+            )
+
+    def submit(self, claim_id: str, user_id: str, content_type: ContentType,
+               is_expert: bool = False, trend_key: Optional[str] = None):
+        """Queues a claim for analysis in its content-type lane."""
+        lane = self.lanes[LANE_FOR_CONTENT[content_type]]
+        weight = self.expert_weight if is_expert else 1.0
+        if trend_key and self._is_trending(trend_key):
+            weight *= self.trending_weight
+
+        start_tag = max(lane.virtual_time, lane.user_finish.get(user_id, 0.0))
+        finish_tag = start_tag + CONTENT_COSTS[content_type] / weight
+        lane.user_finish[user_id] = finish_tag
+        lane.user_pending[user_id] += 1
+
+        self._seq += 1
+        heapq.heappush(lane.heap, ScheduledClaim(str(claim_id), user_id, start_tag, finish_tag, self._seq))
+        lane.ready.set()
+
+    def _is_trending(self, trend_key: str) -> bool:
+        """Counts submissions of the same content within the trending window."""
+        now = time.monotonic()
+        recent = self._recent[trend_key]
+        recent.append(now)
+        while recent and now - recent[0] > self.trending_window:
+            recent.popleft()
+        if len(self._recent) > 10000:
+            # Drop keys that have gone quiet so the tracker stays bounded
+            for key in [k for k, v in self._recent.items() if not v or now - v[-1] > self.trending_window]:
+                del self._recent[key]
+        return len(recent) >= self.trending_threshold
+
+    # --- Dispatch ---
+
+    async def _next(self, lane: Lane) -> ScheduledClaim:
+        while True:
+            delay = lane.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if lane.heap:
+                job = heapq.heappop(lane.heap)
+                lane.virtual_time = max(lane.virtual_time, job.start_tag)
+                if len(lane.user_finish) > 10000:
+                    # Drop users that went idle before their finish tag passed so the map stays bounded
+                    for user_id in [u for u in lane.user_finish if u not in lane.user_pending]:
+                        self._evict_idle(lane, user_id)
+                return job
+            lane.ready.clear()
+            await lane.ready.wait()
+
+    async def _worker(self, lane: Lane):
+        while True:
+            job = await self._next(lane)
+            lane.in_flight += 1
+            lane.stats["total_wait"] += time.monotonic() - job.enqueued_at
+            try:
+                await self.runner(job.claim_id)
+                lane.stats["processed"] += 1
+                lane.user_pending[job.user_id] -= 1
+            except AIServiceBusyError as e:
+                self._defer(lane, job, e.retry_after)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduled processing of claim {job.claim_id} failed: {e}", exc_info=True)
+                lane.stats["failed"] += 1
+                lane.user_pending[job.user_id] -= 1
+            finally:
+                lane.in_flight -= 1
+                if lane.user_pending.get(job.user_id) == 0:
+                    del lane.user_pending[job.user_id]
+                    self._evict_idle(lane, job.user_id)
+                if not lane.heap:
+                    # Nobody is waiting, so idle users have no one left to be fair to
+                    for user_id in [u for u in lane.user_finish if u not in lane.user_pending]:
+                        del lane.user_finish[user_id]
+
+    @staticmethod
+    def _evict_idle(lane: Lane, user_id: str):
+        """
+        Forgets the finish tag of a user with nothing queued once virtual time has
+        caught up with it; their next claim starts at virtual time either way.
+        """
+        if user_id not in lane.user_pending and lane.user_finish.get(user_id, 0.0) <= lane.virtual_time:
+            lane.user_finish.pop(user_id, None)
+
+    def _defer(self, lane: Lane, job: ScheduledClaim, retry_after: float):
+        """The AI service is saturated: pause the lane and keep the claim's place."""
+        lane.paused_until = max(lane.paused_until, time.monotonic() + retry_after)
+        job.deferrals += 1
+        if job.deferrals > self.max_deferrals:
+            logger.error(f"Claim {job.claim_id} deferred {job.deferrals} times; marking as failed.")
+            lane.stats["failed"] += 1
+            lane.user_pending[job.user_id] -= 1
+            supabase.table("claims").update(
+                {"status": ClaimStatus.FAILED.value}
+            ).eq("id", job.claim_id).execute()
+            asyncio.create_task(response_cache.invalidate_claim(job.claim_id))
+            return
+        lane.stats["deferred"] += 1
+        heapq.heappush(lane.heap, job)
+        lane.ready.set()
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return {name: lane.snapshot() for name, lane in self.lanes.items()}
+
+
+def trend_key_for(content: str, file_hash: Optional[str] = None) -> str:
+    """Identifies repeat submissions of the same media or the same text."""
+    if file_hash:
+        return f"file:{file_hash}"
+    normalized = " ".join(content.lower().split())
+    return "text:" + hashlib.sha1(normalized.encode()).hexdigest()
+
+
+# Create the scheduler once; its workers are started with the application
+claim_scheduler = ClaimScheduler()
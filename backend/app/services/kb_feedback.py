@@ -0,0 +1,146 @@
+# backend/app/services/kb_feedback.py
+
+"""
+Write-behind buffer that feeds completed analyses back into the AI service's
+knowledge base.
+Analyses are queued as claims complete and flushed in batches to the AI
+service's batch ingestion endpoint, so claim processing no longer waits on
+an extra HTTP round-trip and a single-article encode per claim.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() behind every pending article; the flusher exits once it reaches it
+_STOP = object()
+
+
+def feedback_article(claim: dict, analysis: dict) -> Dict[str, Any]:
+    """Formats an analysis as a knowledge base "article" linking back to its claim."""
+    return {
+        "title": f"Fact-Check for claim: '{claim['content'][:50]}...'",
+        "content": analysis["summary"] + "\n\nReasoning: " + analysis["ai_reasoning"],
+        "source_url": f"http://localhost:3000/claims/{claim['id']}", # Link back to the claim
+        "source_type": "fact-check",
+        "verified": True
+    }
+
+
+class KnowledgeBaseFeedback:
+    """
+    Bounded queue drained by a single flusher task.
+    A batch is sent once `batch_size` articles are waiting or the oldest has
+    waited `flush_interval` seconds. When the queue is full, submitters wait
+    up to `enqueue_timeout` (backpressure) before the article is dropped.
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("KB_FEEDBACK_BATCH_SIZE", 32))
+        self.flush_interval = float(os.getenv("KB_FEEDBACK_FLUSH_SECONDS", 10))
+        self.enqueue_timeout = float(os.getenv("KB_FEEDBACK_ENQUEUE_TIMEOUT", 5))
+        self.max_retries = int(os.getenv("KB_FEEDBACK_MAX_RETRIES", 3))
+        self.shutdown_timeout = float(os.getenv("KB_FEEDBACK_SHUTDOWN_TIMEOUT", 60))
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=int(os.getenv("KB_FEEDBACK_QUEUE_LIMIT", 1000)))
+        self._flusher: Optional[asyncio.Task] = None
+        self.stats = {"queued": 0, "dropped": 0, "flushes": 0, "added": 0, "duplicates": 0, "failed": 0}
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Sends everything still buffered, including the batch the flusher is
+        collecting, then stops it. Gives up after `shutdown_timeout` seconds.
+        """
+        if not self._flusher:
+            return
+        if not self._flusher.done():
+            await self.queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._flusher, self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Knowledge base feedback did not flush within {self.shutdown_timeout}s; "
+                         f"{self.queue.qsize()} analyses were not sent.")
+        except Exception as e:
+            logger.error(f"Knowledge base feedback flusher failed: {e}")
+        self._flusher = None
+
+    # --- Producers ---
+
+    async def submit(self, claim: dict, analysis: dict) -> bool:
+        """Queues an analysis for the knowledge base. Returns False if it had to be dropped."""
+        try:
+            await asyncio.wait_for(self.queue.put(feedback_article(claim, analysis)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["dropped"] += 1
+            logger.warning(f"Knowledge base feedback queue is full; dropping analysis for claim {claim['id']}.")
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    # --- Flushing ---
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            flush_at = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = flush_at - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    # Send what has been collected so far before exiting
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        # Several analyses can point at the same claim (e.g. a retried claim); send each once
+        unique = list({article["source_url"]: article for article in batch}.values())
+        ai_service_url = os.getenv("AI_SERVICE_URL", "http://localhost:8001")
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with httpx.AsyncClient(timeout=120.0) as client:
+                    response = await client.post(f"{ai_service_url}/add-articles", json={"articles": unique})
+                    response.raise_for_status()
+                result = response.json()
+                self.stats["flushes"] += 1
+                self.stats["added"] += result.get("added", 0)
+                self.stats["duplicates"] += result.get("duplicates", 0) + len(batch) - len(unique)
+                logger.info(f"Added {result.get('added', 0)} analyses to the knowledge base "
+                            f"({result.get('duplicates', 0)} already present).")
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.stats["failed"] += len(unique)
+                    logger.error(f"Could not add {len(unique)} analyses to the knowledge base: {e}")
+                    return
+                await asyncio.sleep(2 ** attempt)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": self.queue.qsize()}
+
+
+# Create the buffer once; its flusher is started with the application
+kb_feedback = KnowledgeBaseFeedback()
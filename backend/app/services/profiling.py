@@ -0,0 +1,237 @@
+# backend/app/services/profiling.py
+
+"""
+On-demand CPU and memory profiling for production debugging.
+A sampling profiler walks every thread's stack (event loop, executor
+threads, torch calls made from Python) and emits folded stacks that
+flamegraph.pl / speedscope read directly; tracemalloc snapshots are diffed
+to find memory growth. Nothing runs until an admin asks for it, so the
+cost while idle is a header lookup per request.
+
+backend/ and ai-service/ carry identical copies of this module (only the
+path comment differs); ai-service/tests/test_shared_modules.py fails when
+they drift.
+"""
+
+import os
+import sys
+import time
+import hmac
+import uuid
+import asyncio
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+from fastapi import Header, HTTPException
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILE_HEADER = "X-Profile"
+MAX_PROFILE_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 120))
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    expected = os.getenv("ADMIN_API_TOKEN")
+    # Without a configured token the admin endpoints stay disabled
+    return bool(expected and token and hmac.compare_digest(token, expected))
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """FastAPI dependency guarding the profiling endpoints."""
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+class SamplingProfiler:
+    """Samples all Python thread stacks from a background thread every `interval` seconds."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.stacks[self._fold(names.get(thread_id, str(thread_id)), frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _fold(thread_name: str, frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            parts.append(f"{module}:{code.co_name}:{code.co_firstlineno}")
+            frame = frame.f_back
+        # Folded format: root first, frames separated by ';'
+        return ";".join([thread_name.replace(";", "_")] + parts[::-1])
+
+
+def folded_output(stacks: Counter) -> str:
+    """Renders stack counts as `frame;frame;frame count` lines for flamegraph tools."""
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+async def profile_cpu(seconds: float, interval: float) -> str:
+    """Samples the whole process for `seconds` and returns folded stacks."""
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        await asyncio.sleep(min(seconds, MAX_PROFILE_SECONDS))
+    finally:
+        # The join is short but blocking; keep it off the event loop
+        await asyncio.get_event_loop().run_in_executor(None, profiler.stop)
+    return folded_output(profiler.stacks)
+
+
+class RequestProfiles:
+    """Keeps the most recent per-request profiles so they can be fetched after the response."""
+
+    def __init__(self, limit: int = 50):
+        self.limit = limit
+        self.profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def add(self, profile_id: str, path: str, duration: float, stacks: Counter):
+        self.profiles[profile_id] = {
+            "path": path, "duration_ms": round(duration * 1000, 1), "stacks": stacks
+        }
+        while len(self.profiles) > self.limit:
+            self.profiles.popitem(last=False)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": profile_id, "path": p["path"], "duration_ms": p["duration_ms"], "samples": sum(p["stacks"].values())}
+            for profile_id, p in reversed(self.profiles.items())
+        ]
+
+    def get(self, profile_id: str) -> Optional[str]:
+        profile = self.profiles.get(profile_id)
+        return folded_output(profile["stacks"]) if profile else None
+
+
+request_profiles = RequestProfiles(int(os.getenv("PROFILE_REQUEST_HISTORY", 50)))
+
+
+class RequestProfilingMiddleware:
+    """
+    ASGI middleware: requests carrying `X-Profile: 1` and a valid admin token
+    are sampled for their whole lifetime, including streamed bodies. The
+    response gets an `X-Profile-Id` header naming the stored profile.
+    """
+
+    def __init__(self, app, interval: float = float(os.getenv("PROFILE_REQUEST_INTERVAL_MS", 2)) / 1000):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if PROFILE_HEADER.lower().encode() not in headers:
+            return await self.app(scope, receive, send)
+        token = headers.get(ADMIN_TOKEN_HEADER.lower().encode(), b"").decode()
+        if not admin_token_valid(token):
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler(self.interval)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            stacks = await asyncio.get_event_loop().run_in_executor(None, profiler.stop)
+            request_profiles.add(profile_id, scope.get("path", ""), time.perf_counter() - started, stacks)
+
+
+def rss_megabytes() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+class MemoryTracker:
+    """
+    tracemalloc snapshots diffed against a baseline. Tracing is only switched
+    on between start() and stop(), since it slows every allocation while active.
+    Memory held outside the Python allocator (e.g. torch tensors) only shows up in RSS.
+    """
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_rss: Optional[float] = None
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.snapshot()
+
+    def stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        self.baseline = None
+        return {"tracing": False}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Records a new baseline for later diffs."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Memory tracing is not active; start it first")
+        self.baseline = self._take()
+        self.baseline_rss = rss_megabytes()
+        current, peak = tracemalloc.get_traced_memory()
+        return {"tracing": True, "traced_mb": round(current / 1024 / 1024, 2), "peak_mb": round(peak / 1024 / 1024, 2)}
+
+    def diff(self, limit: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+        if self.baseline is None:
+            raise RuntimeError("No baseline snapshot; start tracing first")
+        current = self._take()
+        rss = rss_megabytes()
+        top = current.compare_to(self.baseline, group_by)[:limit]
+        return {
+            "rss_mb": rss,
+            "rss_delta_mb": round(rss - self.baseline_rss, 2) if rss is not None and self.baseline_rss is not None else None,
+            "top": [
+                {
+                    "location": str(stat.traceback[0]) if group_by != "traceback" else stat.traceback.format(),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in top
+            ],
+        }
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,216 @@
+# backend/app/services/response_cache.py
+
+"""
+Read-through response cache for the public claim endpoints.
+Keeps serialized responses in an in-process LRU and, when configured,
+mirrors them into a shared store so several API workers can reuse them.
+Invalidations only reach the local LRU of the worker that made them (and
+the shared store), so local entries live at most `local_ttl` seconds, and
+claim details expire after `detail_ttl` to pick up writes made directly
+through Supabase (e.g. a user deleting their comment).
+"""
+
+import os
+import time
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CLAIM_KEY_PREFIX = "claim:"
+LISTING_KEY_PREFIX = "claims:list:"
+LISTING_GENERATION_KEY = "claims:list:generation"
+
+
+class CachedResponse:
+    """A serialized response body together with its validator."""
+
+    __slots__ = ("body", "etag", "expires_at")
+
+    def __init__(self, body: bytes, expires_at: Optional[float] = None):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.expires_at = expires_at
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class SharedCacheStorage:
+    """Interface for a cache store shared between API processes."""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class RedisCacheStorage(SharedCacheStorage):
+    """Shared storage backed by Redis (requires the optional `redis` package)."""
+
+    def __init__(self, url: str):
+        self.client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        await self.client.set(key, value, ex=ttl)
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return int(await self.client.incr(key))
+
+
+class ResponseCache:
+    """LRU cache of serialized API responses with optional shared storage."""
+
+    def __init__(self, max_entries: int = 2048, listing_ttl: int = 15, detail_ttl: int = 300,
+                 local_ttl: int = 5, shared: Optional[SharedCacheStorage] = None):
+        self.max_entries = max_entries
+        self.listing_ttl = listing_ttl
+        self.detail_ttl = detail_ttl
+        self.local_ttl = local_ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._listing_generation = 0
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build the cache from RESPONSE_CACHE_* environment variables."""
+        shared = None
+        redis_url = os.getenv("RESPONSE_CACHE_REDIS_URL")
+        if redis_url:
+            if REDIS_AVAILABLE:
+                shared = RedisCacheStorage(redis_url)
+            else:
+                logger.warning("RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed.")
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2048)),
+            listing_ttl=int(os.getenv("RESPONSE_CACHE_LISTING_TTL", 15)),
+            detail_ttl=int(os.getenv("RESPONSE_CACHE_DETAIL_TTL", 300)),
+            local_ttl=int(os.getenv("RESPONSE_CACHE_LOCAL_TTL", 5)),
+            shared=shared
+        )
+
+    # --- Local LRU helpers ---
+
+    def _get_local(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.is_expired():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _set_local(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # --- Public API ---
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Return a cached response, consulting shared storage on a local miss."""
+        entry = self._get_local(key)
+        if entry is None and self.shared is not None:
+            try:
+                body = await self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared cache read failed for {key}: {e}")
+                body = None
+            if body is not None:
+                # Shared entries carry their own TTL; keep the local copy short-lived.
+                entry = CachedResponse(body, time.monotonic() + self.local_ttl)
+                self._set_local(key, entry)
+
+        self.stats["hits" if entry else "misses"] += 1
+        return entry
+
+    async def set(self, key: str, body: bytes, ttl: Optional[int] = None) -> CachedResponse:
+        """
+        Store a serialized body. A ttl of None keeps it in shared storage until
+        evicted or invalidated; the local copy never outlives `local_ttl`.
+        """
+        local_ttl = min(ttl, self.local_ttl) if ttl is not None else self.local_ttl
+        entry = CachedResponse(body, time.monotonic() + local_ttl)
+        self._set_local(key, entry)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, body, ttl)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed for {key}: {e}")
+        return entry
+
+    async def listing_key(self, params: Dict[str, Any]) -> str:
+        """Build a listing key tied to the current listing generation."""
+        generation = self._listing_generation
+        if self.shared is not None:
+            try:
+                raw = await self.shared.get(LISTING_GENERATION_KEY)
+                generation = int(raw) if raw is not None else 0
+            except Exception as e:
+                logger.warning(f"Could not read listing generation: {e}")
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return f"{LISTING_KEY_PREFIX}{generation}:{hashlib.sha1(encoded.encode()).hexdigest()}"
+
+    async def invalidate_claim(self, claim_id: str) -> None:
+        """Drop a claim's detail entry and every cached listing page."""
+        key = f"{CLAIM_KEY_PREFIX}{claim_id}"
+        self._entries.pop(key, None)
+        self.stats["invalidations"] += 1
+        await self.invalidate_listings()
+        if self.shared is not None:
+            try:
+                await self.shared.delete(key)
+            except Exception as e:
+                logger.warning(f"Shared cache delete failed for {key}: {e}")
+
+    async def invalidate_listings(self) -> None:
+        """Bump the listing generation so stale pages are never served again."""
+        self._listing_generation += 1
+        for key in [k for k in self._entries if k.startswith(LISTING_KEY_PREFIX)]:
+            del self._entries[key]
+        if self.shared is not None:
+            try:
+                await self.shared.incr(LISTING_GENERATION_KEY)
+            except Exception as e:
+                logger.warning(f"Could not bump listing generation: {e}")
+
+
+def claim_key(claim_id: str) -> str:
+    return f"{CLAIM_KEY_PREFIX}{claim_id}"
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header matches the given ETag."""
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+# Create the cache once to be shared by the routers and the claim processor
+response_cache = ResponseCache.from_env()
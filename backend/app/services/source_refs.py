@@ -0,0 +1,107 @@
+# backend/app/services/source_refs.py
+
+"""
+Normalized storage of analysis evidence and sources.
+Instead of copying excerpts and source metadata into every claim_analyses
+row, each cited article is stored once in `sources` and the analysis keeps
+ordered references with excerpt offsets (`analysis_sources`, section 17 of
+schema.sql). Reads hydrate the references of a whole page of analyses in
+one round-trip.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from app.db import supabase
+
+logger = logging.getLogger(__name__)
+
+
+def source_refs(ai_result: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    The AI result's sources as rows for store_analysis_sources, or None when
+    it cannot be normalized (no sources, or a result without documents,
+    e.g. one resumed from an older checkpoint).
+    """
+    sources = ai_result.get("sources") or []
+    documents = ai_result.get("documents") or []
+    if not sources or len(documents) != len(sources):
+        return None
+    evidence = ai_result.get("evidence") or []
+
+    refs = []
+    for index, (source, document) in enumerate(zip(sources, documents)):
+        ref = {
+            "source_key": document["key"],
+            "url": source.get("url"),
+            "title": source.get("title"),
+            "source_type": source.get("type"),
+            "verified": source.get("verified", False),
+            "content": document["content"],
+            "content_hash": document["content_hash"],
+        }
+        # Evidence is drawn from the leading sources, in the same order
+        if index < len(evidence):
+            item = evidence[index]
+            ref.update({
+                "is_evidence": True,
+                "credibility_score": item.get("credibility_score"),
+                "excerpt": item.get("excerpt"),
+                "excerpt_start": item.get("excerpt_start"),
+                "excerpt_end": item.get("excerpt_end"),
+            })
+        refs.append(ref)
+    return refs
+
+
+def store_source_refs(claim_id: str, claim_created_at: str, analysis: Dict[str, Any],
+                      refs: List[Dict[str, Any]]) -> bool:
+    """
+    Upserts the analysis row (verdict, confidence_score, summary, ai_reasoning)
+    and replaces its source references in one transaction; False if nothing
+    could be stored.
+    """
+    try:
+        supabase.rpc("store_analysis_sources", {
+            "p_claim_id": claim_id, "p_claim_created_at": claim_created_at,
+            "p_analysis": {key: analysis[key] for key in ("verdict", "confidence_score", "summary", "ai_reasoning")},
+            "p_sources": refs
+        }).execute()
+        return True
+    except Exception as e:
+        logger.warning(f"Could not store source references for claim {claim_id}: {e}")
+        return False
+
+
+def hydrate_source_refs(analyses: List[Dict[str, Any]]):
+    """Fills evidence and sources in place for analyses stored as references."""
+    pending = [a for a in analyses if a.get("evidence") is None and not a.get("archive_path")]
+    if not pending:
+        return
+    result = supabase.rpc("get_analysis_sources", {"p_claim_ids": [a["claim_id"] for a in pending]}).execute()
+    by_claim = defaultdict(list)
+    for row in result.data or []:
+        by_claim[row["claim_id"]].append(row)
+
+    for analysis in pending:
+        rows = by_claim.get(analysis["claim_id"], [])
+        analysis["evidence"] = [
+            {
+                "source": row["title"],
+                "excerpt": (row["excerpt"] or "") + ("..." if row["excerpt_continues"] else ""),
+                "url": row["url"],
+                "credibility_score": row["credibility_score"],
+            }
+            for row in rows if row["is_evidence"]
+        ]
+        analysis["sources"] = [
+            {
+                "id": row["source_id"],
+                "title": row["title"],
+                "url": row["url"],
+                "type": row["source_type"],
+                "verified": row["verified"],
+            }
+            for row in rows
+        ]
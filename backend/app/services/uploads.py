@@ -0,0 +1,197 @@
+# backend/app/services/uploads.py
+
+"""
+Upload handling for claim files.
+Validates files up front, hashes them in chunks from the copy the framework
+already spooled for the request, and relays that copy to Supabase Storage
+off the request path. Files are content-addressed by SHA-256 so identical
+media is stored only once.
+Clients can also upload straight to storage through a signed upload URL.
+"""
+
+import os
+import re
+import uuid
+import hashlib
+import logging
+import mimetypes
+from typing import BinaryIO, Optional, Dict, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from app.db import supabase
+from app.models.schemas import ClaimStatus, ContentType
+from app.services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BUCKET_NAME = "claim_files"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+ALLOWED_MIME_TYPES: Dict[ContentType, set] = {
+    ContentType.IMAGE: {"image/jpeg", "image/png", "image/webp", "image/gif", "image/bmp"},
+    ContentType.VIDEO: {"video/mp4", "video/webm", "video/quicktime", "video/x-matroska", "video/mpeg"},
+}
+
+
+class SpooledUpload:
+    """A claim file spooled to local disk, with its size and SHA-256 digest."""
+
+    def __init__(self, file: BinaryIO, sha256: str, size: int, mime_type: str, extension: str):
+        self.file = file
+        self.sha256 = sha256
+        self.size = size
+        self.mime_type = mime_type
+        self.extension = extension
+
+    def discard(self) -> None:
+        self.file.close()
+
+
+def validate_upload(content_type: ContentType, mime_type: Optional[str], size: Optional[int]) -> None:
+    """Rejects files whose type does not match the claim or that are too large."""
+    allowed = ALLOWED_MIME_TYPES.get(content_type)
+    if allowed is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Files cannot be attached to '{content_type.value}' claims."
+        )
+    if mime_type not in allowed:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file type '{mime_type}' for a {content_type.value} claim."
+        )
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_BYTES} bytes."
+        )
+
+
+def file_extension(filename: Optional[str], mime_type: Optional[str]) -> str:
+    """Derives a safe storage extension from the filename or MIME type."""
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    if not re.fullmatch(r"[a-z0-9]{1,8}", extension):
+        guessed = mimetypes.guess_extension(mime_type or "") or ".bin"
+        extension = guessed.lstrip(".")
+    return extension
+
+
+def _open_spooled_sync(spooled) -> Tuple[BinaryIO, str, int]:
+    """
+    Opens a second handle on the request's spooled file and hashes it in chunks.
+    The handle shares the file rather than copying it, and stays usable after the
+    framework closes the request's own handle, which happens before background
+    tasks run. fileno() moves a file still held in memory (at most 1 MB) to disk.
+    """
+    source = os.fdopen(os.dup(spooled.fileno()), "rb")
+    try:
+        source.seek(0)
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = source.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_BYTES} bytes."
+                )
+            digest.update(chunk)
+        source.seek(0)
+    except Exception:
+        source.close()
+        raise
+    return source, digest.hexdigest(), size
+
+
+async def spool_upload(file: UploadFile, content_type: ContentType) -> SpooledUpload:
+    """Validates an UploadFile and hashes it without holding it in memory or copying it."""
+    validate_upload(content_type, file.content_type, file.size)
+    extension = file_extension(file.filename, file.content_type)
+    source, sha256, size = await run_in_threadpool(_open_spooled_sync, file.file)
+    return SpooledUpload(source, sha256, size, file.content_type, extension)
+
+
+def media_storage_path(upload: SpooledUpload) -> str:
+    """Content-addressed storage location for a spooled file."""
+    return f"media/{upload.sha256[:2]}/{upload.sha256}.{upload.extension}"
+
+
+def acquire_media_file(upload: SpooledUpload) -> Tuple[str, bool]:
+    """
+    Registers a reference to the file's content hash.
+
+    Returns:
+        The storage path to use and whether the bytes are already stored.
+    """
+    result = supabase.rpc("acquire_media_file", {
+        "p_sha256": upload.sha256,
+        "p_storage_path": media_storage_path(upload),
+        "p_mime_type": upload.mime_type,
+        "p_size_bytes": upload.size,
+    }).execute()
+    row = result.data[0]
+    return row["storage_path"], row["uploaded"]
+
+
+def release_media_file(sha256: str) -> None:
+    supabase.rpc("release_media_file", {"p_sha256": sha256}).execute()
+
+
+def _upload_to_storage_sync(upload: SpooledUpload, storage_path: str) -> None:
+    # A file handle lets the storage client stream the file from disk. Upsert makes
+    # concurrent first uploads of the same content harmless; file_options are sent as
+    # request headers, and x-upsert is the header the Storage API reads in every
+    # storage3 version (newer ones also translate an "upsert" key into it).
+    supabase.storage.from_(STORAGE_BUCKET_NAME).upload(
+        path=storage_path, file=upload.file,
+        file_options={"content-type": upload.mime_type, "x-upsert": "true"}
+    )
+    supabase.table("media_files").update({"uploaded": True}).eq("sha256", upload.sha256).execute()
+
+
+async def store_upload(claim_id: str, upload: SpooledUpload, storage_path: str) -> bool:
+    """
+    Relays a spooled file to storage, marking the claim as failed if that fails.
+    """
+    try:
+        await run_in_threadpool(_upload_to_storage_sync, upload, storage_path)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to upload file for claim {claim_id}: {e}")
+        supabase.table("claims").update(
+            {"status": ClaimStatus.FAILED.value}
+        ).eq("id", claim_id).execute()
+        await response_cache.invalidate_claim(claim_id)
+        return False
+    finally:
+        upload.discard()
+
+
+def create_signed_upload(user_id: str, filename: str, mime_type: str) -> Dict[str, str]:
+    """
+    Issues a signed URL so a client can upload a claim file straight to storage.
+    The server never sees these bytes, so they are not content-addressed.
+    """
+    storage_path = f"{user_id}/{uuid.uuid4()}.{file_extension(filename, mime_type)}"
+    signed = supabase.storage.from_(STORAGE_BUCKET_NAME).create_signed_upload_url(storage_path)
+    return {
+        "file_path": storage_path,
+        "signed_url": signed["signed_url"],
+        "token": signed["token"],
+    }
+
+
+def validate_client_file_path(user_id: str, file_path: str) -> str:
+    """Ensures a directly uploaded file lives under the submitting user's folder."""
+    if not file_path.startswith(f"{user_id}/") or ".." in file_path:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="file_path must reference a file uploaded by the current user."
+        )
+    return file_path
@@ -0,0 +1,261 @@
+# backend/app/traffic_replay.py
+
+"""
+Replays a traffic capture (see app.services.traffic_capture) against a
+running service and reports latency distributions and error rates.
+
+Usage (from the backend directory):
+    # Open loop: requests are sent on the captured schedule, 4x faster
+    python -m app.traffic_replay capture.jsonl --target http://localhost:8000 --speed 4 \\
+        --token "$TEST_USER_JWT"
+
+    # Closed loop: 32 clients send back to back, as fast as the service allows
+    python -m app.traffic_replay capture.jsonl --target http://localhost:8001 --closed-loop --concurrency 32
+
+Open loop keeps the captured arrival pattern, so queueing shows up as
+latency; closed loop finds the throughput ceiling. Requests that carried
+credentials are sent with --token. Uploaded files are replayed as
+placeholder bytes of the recorded size; requests whose body was not
+recorded (see TRAFFIC_CAPTURE_BODY_PATHS) are skipped.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+_ID_SEGMENT = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+|[0-9a-f]{24,})$", re.I)
+
+
+def route_of(method: str, path: str) -> str:
+    """Groups requests by endpoint: `GET /api/v1/claims/{id}`."""
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+
+def load_capture(path: str, include: List[str], exclude: List[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if include and not entry["path"].startswith(tuple(include)):
+                continue
+            if exclude and entry["path"].startswith(tuple(exclude)):
+                continue
+            entries.append(entry)
+    entries.sort(key=lambda e: e["ts"])
+    return entries[:limit] if limit else entries
+
+
+def build_request(entry: Dict[str, Any], token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """httpx request arguments for a captured entry, or None if its body was not recorded."""
+    if "body_omitted" in entry:
+        return None
+    headers = dict(entry.get("headers") or {})
+    if entry.get("authenticated") and token:
+        headers["Authorization"] = f"Bearer {token}"
+    request: Dict[str, Any] = {"method": entry["method"], "url": entry["path"], "params": entry.get("query") or []}
+
+    if "json" in entry:
+        request["json"] = entry["json"]
+    elif "form" in entry or "files" in entry:
+        request["data"] = {name: value for name, value in entry.get("form", [])}
+        if entry.get("files"):
+            request["files"] = [
+                (f["name"], (f["filename"], b"\0" * f["size"], f["content_type"])) for f in entry["files"]
+            ]
+    elif "body_b64" in entry:
+        request["content"] = base64.b64decode(entry["body_b64"])
+        headers["content-type"] = entry["headers"].get("content-type", "application/octet-stream")
+    if "json" in entry or "data" in request:
+        # httpx re-encodes the body; a captured multipart boundary would no longer match
+        headers.pop("content-type", None)
+    request["headers"] = headers
+    return request
+
+
+async def send(client: httpx.AsyncClient, entry: Dict[str, Any], request: Dict[str, Any],
+               scheduled: Optional[float], results: List[Dict[str, Any]]):
+    started = time.perf_counter()
+    result = {
+        "route": route_of(entry["method"], entry["path"]),
+        "captured_ms": entry.get("duration_ms"),
+        "lag_ms": (started - scheduled) * 1000 if scheduled is not None else None,
+    }
+    try:
+        # Streaming read so TTFB is meaningful for NDJSON / SSE endpoints
+        async with client.stream(**request) as response:
+            ttfb = None
+            async for _ in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter()
+            result["status"] = response.status_code
+        result["ttfb_ms"] = ((ttfb or time.perf_counter()) - started) * 1000
+    except httpx.HTTPError as e:
+        result["status"] = None
+        result["error"] = type(e).__name__
+    result["latency_ms"] = (time.perf_counter() - started) * 1000
+    results.append(result)
+
+
+async def replay_open_loop(client, plan, speed: float, max_inflight: int, results):
+    """Sends each request at its captured offset divided by `speed`, whatever the responses do."""
+    limiter = asyncio.Semaphore(max_inflight)
+    first_ts = plan[0][0]["ts"]
+    start = time.perf_counter()
+
+    async def fire(entry, request, scheduled):
+        async with limiter:
+            await send(client, entry, request, scheduled, results)
+
+    tasks = []
+    for entry, request in plan:
+        scheduled = start + (entry["ts"] - first_ts) / speed
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(entry, request, scheduled)))
+    await asyncio.gather(*tasks)
+
+
+async def replay_closed_loop(client, plan, concurrency: int, think_time: float, results):
+    """`concurrency` virtual clients each send their next request as soon as the last one finishes."""
+    pending = asyncio.Queue()
+    for item in plan:
+        pending.put_nowait(item)
+
+    async def worker():
+        while not pending.empty():
+            entry, request = pending.get_nowait()
+            await send(client, entry, request, None, results)
+            if think_time:
+                await asyncio.sleep(think_time)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index], 1)
+
+
+def distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 50), "p90": percentile(values, 90), "p95": percentile(values, 95),
+        "p99": percentile(values, 99), "max": round(max(values), 1) if values else None,
+    }
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float, skipped: int) -> Dict[str, Any]:
+    def stats(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        errors = sum(1 for r in group if r["status"] is None or r["status"] >= 500)
+        client_errors = sum(1 for r in group if r["status"] is not None and 400 <= r["status"] < 500)
+        return {
+            "requests": len(group),
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "client_error_rate": round(client_errors / len(group), 4) if group else 0.0,
+            "latency_ms": distribution([r["latency_ms"] for r in group]),
+            "captured_latency_ms": distribution([r["captured_ms"] for r in group if r["captured_ms"] is not None]),
+        }
+
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result)
+    lags = [r["lag_ms"] for r in results if r["lag_ms"] is not None]
+    return {
+        **stats(results),
+        "skipped": skipped,
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "ttfb_ms": distribution([r["ttfb_ms"] for r in results if "ttfb_ms" in r]),
+        # Large send lag means the replay client itself could not keep the schedule
+        "schedule_lag_ms": distribution(lags) if lags else None,
+        "status_counts": dict(Counter(str(r["status"] or r.get("error")) for r in results)),
+        "routes": {route: stats(group) for route, group in sorted(by_route.items())},
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    def line(name: str, s: Dict[str, Any]) -> str:
+        lat, cap = s["latency_ms"], s["captured_latency_ms"]
+        return (f"{name:<48} {s['requests']:>7} {s['error_rate']:>7.2%} {s['client_error_rate']:>7.2%} "
+                f"{lat['p50'] or 0:>9.1f} {lat['p95'] or 0:>9.1f} {lat['p99'] or 0:>9.1f} {cap['p95'] or 0:>10.1f}")
+
+    print(f"{len(report['routes'])} routes, {report['requests']} requests ({report['skipped']} skipped) "
+          f"in {report['elapsed_seconds']}s, {report['throughput_rps']} req/s")
+    print(f"status: {report['status_counts']}")
+    print(f"ttfb ms: {report['ttfb_ms']}")
+    if report["schedule_lag_ms"]:
+        print(f"schedule lag ms: {report['schedule_lag_ms']}")
+    print()
+    print(f"{'route':<48} {'count':>7} {'5xx':>7} {'4xx':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'capt. p95':>10}")
+    for route, stats in report["routes"].items():
+        print(line(route, stats))
+    print(line("TOTAL", report))
+
+
+async def run(args) -> Dict[str, Any]:
+    entries = load_capture(args.capture, args.include, args.exclude, args.limit)
+    plan = []
+    skipped = 0
+    for entry in entries:
+        request = build_request(entry, args.token)
+        if request is None:
+            skipped += 1
+        else:
+            plan.append((entry, request))
+    if not plan:
+        raise SystemExit("Nothing to replay")
+
+    results: List[Dict[str, Any]] = []
+    limits = httpx.Limits(max_connections=args.concurrency if args.closed_loop else args.max_inflight)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        if args.closed_loop:
+            await replay_closed_loop(client, plan, args.concurrency, args.think_time, results)
+        else:
+            await replay_open_loop(client, plan, args.speed, args.max_inflight, results)
+        elapsed = time.perf_counter() - started
+    return summarize(results, elapsed, skipped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic and report latency and error rates.")
+    parser.add_argument("capture", help="JSONL file written by TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--target", default="http://localhost:8000", help="Base URL of the service under test")
+    parser.add_argument("--speed", type=float, default=1.0, help="Open loop: multiple of the captured rate")
+    parser.add_argument("--closed-loop", action="store_true", help="Ignore captured timing; keep --concurrency requests in flight")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed loop: number of virtual clients")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: pause between a client's requests (s)")
+    parser.add_argument("--max-inflight", type=int, default=500, help="Open loop: cap on concurrent requests")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout (s)")
+    parser.add_argument("--token", help="Bearer token for requests that were authenticated when captured")
+    parser.add_argument("--include", nargs="*", default=[], help="Only replay paths with these prefixes")
+    parser.add_argument("--exclude", nargs="*", default=[], help="Skip paths with these prefixes")
+    parser.add_argument("--limit", type=int, help="Replay at most this many requests")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
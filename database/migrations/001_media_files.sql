@@ -0,0 +1,64 @@
+-- TruthGuard AI - Migration 001: content-addressed media files
+--
+-- Brings a database created from schema.sql before media deduplication to the layout of
+-- schema.sql section 12: claims.file_hash, the media_files table and the functions the backend
+-- calls when a claim is submitted (acquire_media_file) or deleted (release_media_file).
+-- Every statement is guarded, so running it twice is harmless. Run it before 002 and 003:
+--
+--     psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f database/migrations/001_media_files.sql
+
+BEGIN;
+
+-- 1. Claims record the SHA-256 of their uploaded file
+ALTER TABLE public.claims ADD COLUMN IF NOT EXISTS file_hash TEXT;
+CREATE INDEX IF NOT EXISTS claims_file_hash_idx ON public.claims (file_hash);
+
+-- 2. Media files (as in schema.sql section 12)
+CREATE TABLE IF NOT EXISTS public.media_files (
+    sha256 TEXT NOT NULL PRIMARY KEY,
+    storage_path TEXT NOT NULL,
+    mime_type TEXT,
+    size_bytes BIGINT,
+    ref_count INT DEFAULT 0 NOT NULL,
+    uploaded BOOLEAN DEFAULT FALSE NOT NULL,
+    extracted_text TEXT,
+    extracted_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+COMMENT ON TABLE public.media_files IS 'Deduplicated claim media keyed by content hash, with reference counts.';
+CREATE INDEX IF NOT EXISTS media_files_ref_count_idx ON public.media_files (ref_count) WHERE ref_count = 0;
+ALTER TABLE public.media_files ENABLE ROW LEVEL SECURITY;
+
+-- 3. Reference counting
+CREATE OR REPLACE FUNCTION public.acquire_media_file(
+    p_sha256 TEXT, p_storage_path TEXT, p_mime_type TEXT, p_size_bytes BIGINT
+)
+RETURNS TABLE (storage_path TEXT, uploaded BOOLEAN) AS $$
+BEGIN
+  RETURN QUERY
+  INSERT INTO public.media_files AS m (sha256, storage_path, mime_type, size_bytes, ref_count)
+  VALUES (p_sha256, p_storage_path, p_mime_type, p_size_bytes, 1)
+  ON CONFLICT (sha256) DO UPDATE SET ref_count = m.ref_count + 1
+  RETURNING m.storage_path, m.uploaded;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.release_media_file(p_sha256 TEXT)
+RETURNS VOID AS $$
+  UPDATE public.media_files SET ref_count = GREATEST(ref_count - 1, 0) WHERE sha256 = p_sha256;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION public.handle_claim_media_release()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF OLD.file_hash IS NOT NULL THEN
+    PERFORM public.release_media_file(OLD.file_hash);
+  END IF;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS on_claims_delete_release_media ON public.claims;
+CREATE TRIGGER on_claims_delete_release_media AFTER DELETE ON public.claims FOR EACH ROW EXECUTE PROCEDURE public.handle_claim_media_release();
+
+COMMIT;
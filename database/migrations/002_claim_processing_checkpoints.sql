@@ -0,0 +1,23 @@
+-- TruthGuard AI - Migration 002: claim processing checkpoints
+--
+-- Adds the table of schema.sql section 14 to a database created from an older schema.sql, in the
+-- form it takes before claims are partitioned: it references claims(id), and migration 003 adds
+-- claim_created_at and the composite foreign key when it partitions claims. Guarded, so running
+-- it twice is harmless. Run it after 001 and before 003:
+--
+--     psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f database/migrations/002_claim_processing_checkpoints.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.claim_processing_checkpoints (
+    claim_id uuid NOT NULL REFERENCES public.claims(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL, -- 'extract', 'context', 'analysis'
+    output JSONB NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (claim_id, stage)
+);
+COMMENT ON TABLE public.claim_processing_checkpoints IS 'Per-stage results of claim processing, used to resume retries.';
+ALTER TABLE public.claim_processing_checkpoints ENABLE ROW LEVEL SECURITY;
+-- Only the backend's service role reads and writes checkpoints.
+
+COMMIT;
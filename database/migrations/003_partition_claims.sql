@@ -0,0 +1,268 @@
+-- TruthGuard AI - Migration 003: monthly partitions for claims, analyses and comments
+--
+-- Brings a database created from schema.sql before partitioning (claims, claim_analyses and
+-- claim_comments as plain tables) to the layout of schema.sql sections 3-9, 11, 14, 15 and 16.
+-- schema.sql only describes fresh installs: its CREATE TABLE IF NOT EXISTS statements are
+-- no-ops on an existing database, so they cannot turn a plain table into a partitioned one.
+--
+-- The migration creates the partitioned tables next to the old ones, creates monthly
+-- partitions from the oldest claim onwards, copies every row (analyses and comments take
+-- claim_created_at from their claim), swaps the tables, and backfills claim_created_at on the
+-- tables that reference them. It runs in a single transaction and holds exclusive locks on
+-- the old tables throughout, so stop the backend and AI service (or expect their writes to
+-- wait) while it runs. Run it once, after 001 and 002, with the service role or the postgres user:
+--
+--     psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f database/migrations/003_partition_claims.sql
+
+BEGIN;
+
+-- 0. Prerequisites: the columns, tables and functions of migrations 001 and 002
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                 WHERE table_schema = 'public' AND table_name = 'claims' AND column_name = 'file_hash')
+     OR to_regclass('public.media_files') IS NULL
+     OR to_regprocedure('public.handle_claim_media_release()') IS NULL THEN
+    RAISE EXCEPTION 'Run database/migrations/001_media_files.sql before this migration';
+  END IF;
+  IF to_regclass('public.claim_processing_checkpoints') IS NULL THEN
+    RAISE EXCEPTION 'Run database/migrations/002_claim_processing_checkpoints.sql before this migration';
+  END IF;
+  IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.claims'::regclass) THEN
+    RAISE EXCEPTION 'public.claims is already partitioned; this migration has been applied';
+  END IF;
+END;
+$$;
+
+-- 1. Move the plain tables aside
+-- Renaming keeps their data and indexes for the copy. Constraint and index names are renamed
+-- too, so the new tables get the names schema.sql produces.
+ALTER TABLE public.claims RENAME TO claims_unpartitioned;
+ALTER TABLE public.claim_analyses RENAME TO claim_analyses_unpartitioned;
+ALTER TABLE public.claim_comments RENAME TO claim_comments_unpartitioned;
+
+DO $$
+DECLARE
+  old_table TEXT;
+  rec RECORD;
+BEGIN
+  FOREACH old_table IN ARRAY ARRAY['claims', 'claim_analyses', 'claim_comments'] LOOP
+    FOR rec IN
+      SELECT conname FROM pg_constraint
+      WHERE conrelid = format('public.%I', old_table || '_unpartitioned')::regclass
+    LOOP
+      EXECUTE format('ALTER TABLE public.%I RENAME CONSTRAINT %I TO %I',
+                     old_table || '_unpartitioned', rec.conname, rec.conname || '_unpartitioned');
+    END LOOP;
+    FOR rec IN
+      SELECT i.relname FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+      WHERE x.indrelid = format('public.%I', old_table || '_unpartitioned')::regclass
+        AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    LOOP
+      EXECUTE format('ALTER INDEX public.%I RENAME TO %I', rec.relname, rec.relname || '_unpartitioned');
+    END LOOP;
+  END LOOP;
+END;
+$$;
+
+-- Foreign keys into the old tables are replaced by composite keys on claim_created_at (step 5)
+ALTER TABLE public.comment_votes DROP CONSTRAINT IF EXISTS comment_votes_comment_id_fkey;
+ALTER TABLE public.rti_requests DROP CONSTRAINT IF EXISTS rti_requests_claim_id_fkey;
+ALTER TABLE public.claim_processing_checkpoints DROP CONSTRAINT IF EXISTS claim_processing_checkpoints_claim_id_fkey;
+
+-- 2. Partitioned tables (as in schema.sql sections 3-5)
+CREATE TABLE public.claims (
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    user_id uuid NOT NULL REFERENCES public.user_profiles(id) ON DELETE SET NULL,
+    content TEXT NOT NULL,
+    content_type content_type NOT NULL,
+    original_url TEXT,
+    file_path TEXT,
+    file_hash TEXT,
+    status claim_status DEFAULT 'pending' NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+COMMENT ON TABLE public.claims IS 'Fact-checking claims submitted by users.';
+
+CREATE TABLE public.claim_analyses (
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    claim_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL,
+    verdict verdict_type NOT NULL,
+    confidence_score REAL NOT NULL,
+    summary TEXT NOT NULL,
+    evidence JSONB,
+    sources JSONB,
+    ai_reasoning TEXT,
+    archive_path TEXT,
+    archived_at TIMESTAMPTZ,
+    preliminary BOOLEAN DEFAULT FALSE NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (id, claim_created_at),
+    UNIQUE (claim_id, claim_created_at),
+    FOREIGN KEY (claim_id, claim_created_at) REFERENCES public.claims(id, created_at) ON DELETE CASCADE
+) PARTITION BY RANGE (claim_created_at);
+COMMENT ON TABLE public.claim_analyses IS 'AI-generated analysis of a claim.';
+
+CREATE TABLE public.claim_comments (
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    claim_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL,
+    user_id uuid NOT NULL REFERENCES public.user_profiles(id) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    upvotes INT DEFAULT 0 NOT NULL,
+    downvotes INT DEFAULT 0 NOT NULL,
+    is_expert_response BOOLEAN DEFAULT FALSE NOT NULL,
+    parent_comment_id uuid,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (id, claim_created_at),
+    FOREIGN KEY (claim_id, claim_created_at) REFERENCES public.claims(id, created_at) ON DELETE CASCADE,
+    FOREIGN KEY (parent_comment_id, claim_created_at) REFERENCES public.claim_comments(id, claim_created_at) ON DELETE CASCADE
+) PARTITION BY RANGE (claim_created_at);
+COMMENT ON TABLE public.claim_comments IS 'User comments on a specific claim.';
+
+-- 3. Partitions (as in schema.sql section 15), from the month of the oldest claim onwards
+CREATE TABLE public.claims_default PARTITION OF public.claims DEFAULT;
+CREATE TABLE public.claim_analyses_default PARTITION OF public.claim_analyses DEFAULT;
+CREATE TABLE public.claim_comments_default PARTITION OF public.claim_comments DEFAULT;
+ALTER TABLE public.claims_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.claim_analyses_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.claim_comments_default ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.ensure_claim_partitions(p_months_ahead INT DEFAULT 3, p_from TIMESTAMPTZ DEFAULT NULL)
+RETURNS INT AS $$
+DECLARE
+  month_start DATE := date_trunc('month', COALESCE(p_from, NOW()))::date;
+  last_month DATE := (date_trunc('month', NOW()) + make_interval(months => p_months_ahead))::date;
+  parent TEXT;
+  partition_name TEXT;
+  created INT := 0;
+BEGIN
+  WHILE month_start <= last_month LOOP
+    FOREACH parent IN ARRAY ARRAY['claims', 'claim_analyses', 'claim_comments'] LOOP
+      partition_name := format('%s_%s', parent, to_char(month_start, 'YYYY_MM'));
+      IF to_regclass('public.' || partition_name) IS NULL THEN
+        EXECUTE format(
+          'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+          partition_name, parent, month_start, (month_start + INTERVAL '1 month')::date
+        );
+        EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', partition_name);
+        created := created + 1;
+      END IF;
+    END LOOP;
+    month_start := (month_start + INTERVAL '1 month')::date;
+  END LOOP;
+  RETURN created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+REVOKE EXECUTE ON FUNCTION public.ensure_claim_partitions(INT, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+
+-- Every existing row lands in a monthly partition, so the default partitions stay empty
+SELECT public.ensure_claim_partitions(3, (SELECT MIN(created_at) FROM public.claims_unpartitioned));
+
+-- 4. Copy the rows
+-- Foreign keys are checked at the end of each statement, so replies may precede their parents.
+INSERT INTO public.claims (id, user_id, content, content_type, original_url, file_path, file_hash, status, created_at, updated_at)
+SELECT id, user_id, content, content_type, original_url, file_path, file_hash, status, created_at, updated_at
+FROM public.claims_unpartitioned;
+
+INSERT INTO public.claim_analyses (id, claim_id, claim_created_at, verdict, confidence_score, summary, evidence, sources, ai_reasoning, created_at)
+SELECT a.id, a.claim_id, c.created_at, a.verdict, a.confidence_score, a.summary, a.evidence, a.sources, a.ai_reasoning, a.created_at
+FROM public.claim_analyses_unpartitioned a
+JOIN public.claims_unpartitioned c ON c.id = a.claim_id;
+
+INSERT INTO public.claim_comments (id, claim_id, claim_created_at, user_id, content, upvotes, downvotes, is_expert_response, parent_comment_id, created_at, updated_at)
+SELECT cc.id, cc.claim_id, c.created_at, cc.user_id, cc.content, cc.upvotes, cc.downvotes, cc.is_expert_response, cc.parent_comment_id, cc.created_at, cc.updated_at
+FROM public.claim_comments_unpartitioned cc
+JOIN public.claims_unpartitioned c ON c.id = cc.claim_id;
+
+-- 5. Backfill claim_created_at where the partitioned tables are referenced (schema.sql sections 6, 7 and 14)
+ALTER TABLE public.comment_votes ADD COLUMN IF NOT EXISTS claim_created_at TIMESTAMPTZ;
+UPDATE public.comment_votes v SET claim_created_at = cc.claim_created_at
+FROM public.claim_comments cc WHERE cc.id = v.comment_id;
+ALTER TABLE public.comment_votes ALTER COLUMN claim_created_at SET NOT NULL;
+ALTER TABLE public.comment_votes ADD FOREIGN KEY (comment_id, claim_created_at)
+    REFERENCES public.claim_comments(id, claim_created_at) ON DELETE CASCADE;
+
+ALTER TABLE public.rti_requests ADD COLUMN IF NOT EXISTS claim_created_at TIMESTAMPTZ;
+UPDATE public.rti_requests r SET claim_created_at = c.created_at
+FROM public.claims c WHERE c.id = r.claim_id;
+ALTER TABLE public.rti_requests ALTER COLUMN claim_created_at SET NOT NULL;
+ALTER TABLE public.rti_requests ADD FOREIGN KEY (claim_id, claim_created_at)
+    REFERENCES public.claims(id, created_at) ON DELETE CASCADE;
+
+ALTER TABLE public.claim_processing_checkpoints ADD COLUMN IF NOT EXISTS claim_created_at TIMESTAMPTZ;
+UPDATE public.claim_processing_checkpoints p SET claim_created_at = c.created_at
+FROM public.claims c WHERE c.id = p.claim_id;
+ALTER TABLE public.claim_processing_checkpoints ALTER COLUMN claim_created_at SET NOT NULL;
+ALTER TABLE public.claim_processing_checkpoints ADD FOREIGN KEY (claim_id, claim_created_at)
+    REFERENCES public.claims(id, created_at) ON DELETE CASCADE;
+
+-- 6. Drop the old tables (their triggers and policies go with them)
+DROP TABLE public.claim_comments_unpartitioned;
+DROP TABLE public.claim_analyses_unpartitioned;
+DROP TABLE public.claims_unpartitioned;
+
+-- 7. Indexes (schema.sql sections 3-5, 12 and 16)
+CREATE INDEX ON public.claims (user_id);
+CREATE INDEX ON public.claims (status);
+CREATE INDEX ON public.claims (created_at DESC);
+CREATE INDEX ON public.claims (file_hash);
+CREATE INDEX ON public.claim_analyses (claim_id);
+CREATE INDEX ON public.claim_comments (claim_id);
+CREATE INDEX ON public.claim_comments (user_id);
+CREATE INDEX ON public.claim_analyses (claim_created_at) WHERE archived_at IS NULL AND evidence IS NOT NULL;
+
+-- 8. Triggers (schema.sql sections 8, 9, 12 and 14)
+CREATE OR REPLACE FUNCTION public.fill_claim_created_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.claim_created_at IS NULL THEN
+    SELECT c.created_at INTO NEW.claim_created_at FROM public.claims c WHERE c.id = NEW.claim_id;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.fill_comment_claim_created_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.claim_created_at IS NULL THEN
+    SELECT cc.claim_created_at INTO NEW.claim_created_at FROM public.claim_comments cc WHERE cc.id = NEW.comment_id;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER on_claims_update BEFORE UPDATE ON public.claims FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
+CREATE TRIGGER on_comments_update BEFORE UPDATE ON public.claim_comments FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
+CREATE TRIGGER on_claims_delete_release_media AFTER DELETE ON public.claims FOR EACH ROW EXECUTE PROCEDURE public.handle_claim_media_release();
+CREATE TRIGGER on_rti_insert_fill_claim BEFORE INSERT ON public.rti_requests FOR EACH ROW EXECUTE PROCEDURE public.fill_claim_created_at();
+CREATE TRIGGER on_votes_insert_fill_claim BEFORE INSERT ON public.comment_votes FOR EACH ROW EXECUTE PROCEDURE public.fill_comment_claim_created_at();
+CREATE TRIGGER on_checkpoints_insert_fill_claim BEFORE INSERT ON public.claim_processing_checkpoints FOR EACH ROW EXECUTE PROCEDURE public.fill_claim_created_at();
+
+-- 9. Row Level Security (schema.sql section 11)
+ALTER TABLE public.claims ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.claim_analyses ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.claim_comments ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Anyone can view claims." ON public.claims FOR SELECT USING (true);
+CREATE POLICY "Authenticated users can create claims." ON public.claims FOR INSERT WITH CHECK (auth.role() = 'authenticated');
+CREATE POLICY "Users can update their own claims." ON public.claims FOR UPDATE USING (auth.uid() = user_id);
+
+CREATE POLICY "Anyone can view claim analyses." ON public.claim_analyses FOR SELECT USING (true);
+
+CREATE POLICY "Anyone can read comments." ON public.claim_comments FOR SELECT USING (true);
+CREATE POLICY "Authenticated users can create comments." ON public.claim_comments FOR INSERT WITH CHECK (auth.role() = 'authenticated');
+CREATE POLICY "Users can update their own comments." ON public.claim_comments FOR UPDATE USING (auth.uid() = user_id);
+CREATE POLICY "Users can delete their own comments." ON public.claim_comments FOR DELETE USING (auth.uid() = user_id);
+
+-- 10. Cold archive bucket (schema.sql section 16)
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('analysis_archive', 'analysis_archive', false)
+ON CONFLICT (id) DO NOTHING;
+
+COMMIT;
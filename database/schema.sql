@@ -24,52 +24,74 @@ COMMENT ON TABLE public.user_profiles IS 'Public profile information for each us
 
 -- 3. Claims Table
 -- Core table for all fact-checking claims.
+-- Range-partitioned by month on created_at (partitions are managed in section 15), so
+-- time-windowed listings only scan recent partitions and each partition's indexes stay small.
+-- The partition key has to be part of every unique key; ids are still random UUIDs.
 CREATE TABLE IF NOT EXISTS public.claims (
-    id uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
     user_id uuid NOT NULL REFERENCES public.user_profiles(id) ON DELETE SET NULL,
     content TEXT NOT NULL,
     content_type content_type NOT NULL,
     original_url TEXT,
     file_path TEXT, -- Path in Supabase Storage
+    file_hash TEXT, -- SHA-256 of the uploaded file, computed while streaming
     status claim_status DEFAULT 'pending' NOT NULL,
     created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
-    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
-);
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 COMMENT ON TABLE public.claims IS 'Fact-checking claims submitted by users.';
 -- Add indexes for faster queries
 CREATE INDEX ON public.claims (user_id);
 CREATE INDEX ON public.claims (status);
+-- Listings read newest first within the partitions their window selects
+CREATE INDEX ON public.claims (created_at DESC);
 
 -- 4. Claim Analyses Table
 -- Stores the results from the AI fact-checking service.
+-- Partitioned like claims, on the claim's created_at, so a claim and its analysis share a month:
+-- joins prune together and old months can be archived as a unit. The partition key is routed
+-- before any trigger runs, so writers must set claim_created_at themselves.
 CREATE TABLE IF NOT EXISTS public.claim_analyses (
-    id uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
-    claim_id uuid NOT NULL UNIQUE REFERENCES public.claims(id) ON DELETE CASCADE,
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    claim_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL, -- The claim's created_at (partition key)
     verdict verdict_type NOT NULL,
     confidence_score REAL NOT NULL,
     summary TEXT NOT NULL,
-    evidence JSONB,
-    sources JSONB,
+    evidence JSONB, -- NULL once archived (section 16)
+    sources JSONB,  -- NULL once archived (section 16)
     ai_reasoning TEXT,
-    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
-);
+    archive_path TEXT, -- Object in the analysis_archive bucket holding the archived payload
+    archived_at TIMESTAMPTZ,
+    preliminary BOOLEAN DEFAULT FALSE NOT NULL, -- Early verdict written while the analysis streams in
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (id, claim_created_at),
+    UNIQUE (claim_id, claim_created_at),
+    FOREIGN KEY (claim_id, claim_created_at) REFERENCES public.claims(id, created_at) ON DELETE CASCADE
+) PARTITION BY RANGE (claim_created_at);
 COMMENT ON TABLE public.claim_analyses IS 'AI-generated analysis of a claim.';
 CREATE INDEX ON public.claim_analyses (claim_id);
 
 -- 5. Claim Comments Table
 -- For community discussion on claims.
+-- Partitioned on the claim's created_at, like claim_analyses; replies share their parent's claim.
 CREATE TABLE IF NOT EXISTS public.claim_comments (
-    id uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
-    claim_id uuid NOT NULL REFERENCES public.claims(id) ON DELETE CASCADE,
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    claim_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL, -- The claim's created_at (partition key)
     user_id uuid NOT NULL REFERENCES public.user_profiles(id) ON DELETE CASCADE,
     content TEXT NOT NULL,
     upvotes INT DEFAULT 0 NOT NULL,
     downvotes INT DEFAULT 0 NOT NULL,
     is_expert_response BOOLEAN DEFAULT FALSE NOT NULL,
-    parent_comment_id uuid REFERENCES public.claim_comments(id) ON DELETE CASCADE,
+    parent_comment_id uuid,
     created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
-    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
-);
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (id, claim_created_at),
+    FOREIGN KEY (claim_id, claim_created_at) REFERENCES public.claims(id, created_at) ON DELETE CASCADE,
+    FOREIGN KEY (parent_comment_id, claim_created_at) REFERENCES public.claim_comments(id, claim_created_at) ON DELETE CASCADE
+) PARTITION BY RANGE (claim_created_at);
 COMMENT ON TABLE public.claim_comments IS 'User comments on a specific claim.';
 CREATE INDEX ON public.claim_comments (claim_id);
 CREATE INDEX ON public.claim_comments (user_id);
@@ -78,23 +100,27 @@ CREATE INDEX ON public.claim_comments (user_id);
 -- Tracks user votes on comments to prevent duplicate voting.
 CREATE TABLE IF NOT EXISTS public.comment_votes (
     id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
-    comment_id uuid NOT NULL REFERENCES public.claim_comments(id) ON DELETE CASCADE,
+    comment_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL, -- Filled from the comment by trigger (section 9)
     user_id uuid NOT NULL REFERENCES public.user_profiles(id) ON DELETE CASCADE,
     vote_type vote_type NOT NULL,
     created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
-    UNIQUE(comment_id, user_id) -- Ensures a user can only vote once per comment
+    UNIQUE(comment_id, user_id), -- Ensures a user can only vote once per comment
+    FOREIGN KEY (comment_id, claim_created_at) REFERENCES public.claim_comments(id, claim_created_at) ON DELETE CASCADE
 );
 COMMENT ON TABLE public.comment_votes IS 'Tracks upvotes and downvotes on comments.';
 
 -- 7. RTI Requests Table
 CREATE TABLE IF NOT EXISTS public.rti_requests (
     id uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
-    claim_id uuid NOT NULL REFERENCES public.claims(id) ON DELETE CASCADE,
+    claim_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL, -- Filled from the claim by trigger (section 9)
     user_id uuid NOT NULL REFERENCES public.user_profiles(id) ON DELETE CASCADE,
     reason TEXT NOT NULL,
     status rti_status DEFAULT 'draft' NOT NULL,
     created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
-    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    FOREIGN KEY (claim_id, claim_created_at) REFERENCES public.claims(id, created_at) ON DELETE CASCADE
 );
 COMMENT ON TABLE public.rti_requests IS 'Right to Information requests related to claims.';
 CREATE INDEX ON public.rti_requests (claim_id);
@@ -109,11 +135,36 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Copies the parent's partition key into claim_created_at, which child tables need for their
+-- composite foreign keys. Only usable on unpartitioned tables: partitioned tables route a row
+-- before its triggers run, so claim_analyses and claim_comments writers set the column themselves.
+CREATE OR REPLACE FUNCTION public.fill_claim_created_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.claim_created_at IS NULL THEN
+    SELECT c.created_at INTO NEW.claim_created_at FROM public.claims c WHERE c.id = NEW.claim_id;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.fill_comment_claim_created_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.claim_created_at IS NULL THEN
+    SELECT cc.claim_created_at INTO NEW.claim_created_at FROM public.claim_comments cc WHERE cc.id = NEW.comment_id;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
 -- 9. Triggers to call the function on table updates
 CREATE TRIGGER on_claims_update BEFORE UPDATE ON public.claims FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
 CREATE TRIGGER on_profiles_update BEFORE UPDATE ON public.user_profiles FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
 CREATE TRIGGER on_comments_update BEFORE UPDATE ON public.claim_comments FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
 CREATE TRIGGER on_rti_update BEFORE UPDATE ON public.rti_requests FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
+CREATE TRIGGER on_rti_insert_fill_claim BEFORE INSERT ON public.rti_requests FOR EACH ROW EXECUTE PROCEDURE public.fill_claim_created_at();
+CREATE TRIGGER on_votes_insert_fill_claim BEFORE INSERT ON public.comment_votes FOR EACH ROW EXECUTE PROCEDURE public.fill_comment_claim_created_at();
 
 -- 10. Supabase Storage Bucket for file uploads
 INSERT INTO storage.buckets (id, name, public)
@@ -158,4 +209,464 @@ CREATE POLICY "Users can change/delete their own votes." ON public.comment_votes
 -- Policies for rti_requests
 CREATE POLICY "Users can view their own RTI requests." ON public.rti_requests FOR SELECT USING (auth.uid() = user_id);
 CREATE POLICY "Users can create RTI requests." ON public.rti_requests FOR INSERT WITH CHECK (auth.uid() = user_id);
-CREATE POLICY "Users can update their own RTI requests." ON public.rti_requests FOR UPDATE USING (auth.uid() = user_id);
\ No newline at end of file
+CREATE POLICY "Users can update their own RTI requests." ON public.rti_requests FOR UPDATE USING (auth.uid() = user_id);
+
+-- 12. Content-Addressed Media Files
+-- Uploaded files are stored once per SHA-256 and shared by every claim that submits them.
+-- The cached extraction output (OCR text / transcript) lets repeat submissions skip the AI extraction step.
+CREATE TABLE IF NOT EXISTS public.media_files (
+    sha256 TEXT NOT NULL PRIMARY KEY,
+    storage_path TEXT NOT NULL,
+    mime_type TEXT,
+    size_bytes BIGINT,
+    ref_count INT DEFAULT 0 NOT NULL,
+    uploaded BOOLEAN DEFAULT FALSE NOT NULL,
+    extracted_text TEXT,
+    extracted_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+COMMENT ON TABLE public.media_files IS 'Deduplicated claim media keyed by content hash, with reference counts.';
+CREATE INDEX ON public.claims (file_hash);
+-- Files whose count drops to zero can be garbage-collected from storage.
+CREATE INDEX ON public.media_files (ref_count) WHERE ref_count = 0;
+ALTER TABLE public.media_files ENABLE ROW LEVEL SECURITY;
+-- Media rows are only managed by the service role key, so no user policies are needed.
+
+-- Registers one more reference to a file, creating the row on first sight.
+CREATE OR REPLACE FUNCTION public.acquire_media_file(
+    p_sha256 TEXT, p_storage_path TEXT, p_mime_type TEXT, p_size_bytes BIGINT
+)
+RETURNS TABLE (storage_path TEXT, uploaded BOOLEAN) AS $$
+BEGIN
+  RETURN QUERY
+  INSERT INTO public.media_files AS m (sha256, storage_path, mime_type, size_bytes, ref_count)
+  VALUES (p_sha256, p_storage_path, p_mime_type, p_size_bytes, 1)
+  ON CONFLICT (sha256) DO UPDATE SET ref_count = m.ref_count + 1
+  RETURNING m.storage_path, m.uploaded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drops one reference to a file.
+CREATE OR REPLACE FUNCTION public.release_media_file(p_sha256 TEXT)
+RETURNS VOID AS $$
+  UPDATE public.media_files SET ref_count = GREATEST(ref_count - 1, 0) WHERE sha256 = p_sha256;
+$$ LANGUAGE sql;
+
+-- Releases a claim's reference when the claim is deleted.
+CREATE OR REPLACE FUNCTION public.handle_claim_media_release()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF OLD.file_hash IS NOT NULL THEN
+    PERFORM public.release_media_file(OLD.file_hash);
+  END IF;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER on_claims_delete_release_media AFTER DELETE ON public.claims FOR EACH ROW EXECUTE PROCEDURE public.handle_claim_media_release();
+
+
+-- 13. Knowledge Base (pgvector)
+-- Articles used for retrieval. Embedding dimensions must match EMBEDDING_MODEL (768 for all-mpnet-base-v2).
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS public.knowledge_base (
+    id uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    source_url TEXT,
+    source_type TEXT,
+    verified BOOLEAN DEFAULT FALSE NOT NULL,
+    embedding vector(768), -- Mean of the article's passage embeddings
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+COMMENT ON TABLE public.knowledge_base IS 'Fact-check articles indexed for retrieval.';
+-- Batch feedback skips analyses whose claim link is already indexed.
+CREATE INDEX ON public.knowledge_base (source_url);
+-- The lexical index refresh pages through recent articles on (created_at, id).
+CREATE INDEX IF NOT EXISTS knowledge_base_created_at_id_idx ON public.knowledge_base (created_at, id);
+-- Articles without a source_url are deduplicated on their title and content instead.
+CREATE INDEX IF NOT EXISTS knowledge_base_content_md5_idx ON public.knowledge_base (md5(title || E'\n' || content))
+    WHERE source_url IS NULL;
+
+-- Passages are stored once per normalized content hash and linked to every article containing them.
+CREATE TABLE IF NOT EXISTS public.knowledge_base_passages (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    content TEXT NOT NULL,
+    embedding vector(768) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+COMMENT ON TABLE public.knowledge_base_passages IS 'Deduplicated passage embeddings for knowledge base articles.';
+CREATE INDEX ON public.knowledge_base_passages USING hnsw (embedding vector_cosine_ops);
+-- Binary-quantized expression index (1 bit per dimension, ~32x smaller) for match_passages_binary.
+-- The bit width must equal the embedding dimension (EMBEDDING_DIM in the AI service).
+CREATE INDEX ON public.knowledge_base_passages USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops);
+
+CREATE TABLE IF NOT EXISTS public.knowledge_base_passage_links (
+    article_id uuid NOT NULL REFERENCES public.knowledge_base(id) ON DELETE CASCADE,
+    passage_id BIGINT NOT NULL REFERENCES public.knowledge_base_passages(id) ON DELETE CASCADE,
+    passage_index INT NOT NULL,
+    PRIMARY KEY (article_id, passage_index)
+);
+CREATE INDEX ON public.knowledge_base_passage_links (passage_id);
+
+ALTER TABLE public.knowledge_base ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.knowledge_base_passages ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.knowledge_base_passage_links ENABLE ROW LEVEL SECURITY;
+-- The knowledge base is only read and written by the AI service's service role key.
+
+-- Article-level search (kept for callers that do not use passages).
+CREATE OR REPLACE FUNCTION public.match_articles(query_embedding vector(768), match_threshold FLOAT, match_count INT)
+RETURNS TABLE (id uuid, title TEXT, content TEXT, source_url TEXT, source_type TEXT, verified BOOLEAN, similarity FLOAT) AS $$
+  SELECT kb.id, kb.title, kb.content, kb.source_url, kb.source_type, kb.verified,
+         1 - (kb.embedding <=> query_embedding) AS similarity
+  FROM public.knowledge_base kb
+  WHERE 1 - (kb.embedding <=> query_embedding) > match_threshold
+  ORDER BY kb.embedding <=> query_embedding
+  LIMIT match_count;
+$$ LANGUAGE sql STABLE;
+
+-- Passage-level search aggregated back to articles: each article scores as its best passage.
+CREATE OR REPLACE FUNCTION public.match_passages(query_embedding vector(768), match_threshold FLOAT, match_count INT)
+RETURNS TABLE (id uuid, title TEXT, content TEXT, source_url TEXT, source_type TEXT, verified BOOLEAN, similarity FLOAT, passage TEXT) AS $$
+  WITH hits AS (
+    SELECT p.id, p.content, 1 - (p.embedding <=> query_embedding) AS similarity
+    FROM public.knowledge_base_passages p
+    ORDER BY p.embedding <=> query_embedding
+    LIMIT match_count * 4
+  ), best AS (
+    SELECT DISTINCT ON (l.article_id) l.article_id, hits.content, hits.similarity
+    FROM hits JOIN public.knowledge_base_passage_links l ON l.passage_id = hits.id
+    WHERE hits.similarity > match_threshold
+    ORDER BY l.article_id, hits.similarity DESC
+  )
+  SELECT kb.id, kb.title, kb.content, kb.source_url, kb.source_type, kb.verified, best.similarity, best.content
+  FROM best JOIN public.knowledge_base kb ON kb.id = best.article_id
+  ORDER BY best.similarity DESC
+  LIMIT match_count;
+$$ LANGUAGE sql STABLE;
+
+-- Same as match_passages, but shortlists candidates by Hamming distance on the binary index
+-- and rescores only the shortlist with full-precision cosine similarity.
+CREATE OR REPLACE FUNCTION public.match_passages_binary(query_embedding vector(768), match_threshold FLOAT, match_count INT)
+RETURNS TABLE (id uuid, title TEXT, content TEXT, source_url TEXT, source_type TEXT, verified BOOLEAN, similarity FLOAT, passage TEXT) AS $$
+  WITH shortlist AS (
+    SELECT p.id, p.content, p.embedding
+    FROM public.knowledge_base_passages p
+    ORDER BY binary_quantize(p.embedding)::bit(768) <~> binary_quantize(query_embedding)
+    LIMIT match_count * 16
+  ), hits AS (
+    SELECT s.id, s.content, 1 - (s.embedding <=> query_embedding) AS similarity
+    FROM shortlist s
+    ORDER BY s.embedding <=> query_embedding
+    LIMIT match_count * 4
+  ), best AS (
+    SELECT DISTINCT ON (l.article_id) l.article_id, hits.content, hits.similarity
+    FROM hits JOIN public.knowledge_base_passage_links l ON l.passage_id = hits.id
+    WHERE hits.similarity > match_threshold
+    ORDER BY l.article_id, hits.similarity DESC
+  )
+  SELECT kb.id, kb.title, kb.content, kb.source_url, kb.source_type, kb.verified, best.similarity, best.content
+  FROM best JOIN public.knowledge_base kb ON kb.id = best.article_id
+  ORDER BY best.similarity DESC
+  LIMIT match_count;
+$$ LANGUAGE sql STABLE;
+
+-- Stores a batch of articles with their passages and passage links in one transaction, so a
+-- failed batch leaves nothing behind. `p_passages` holds only the passages the caller had to
+-- encode: [{content_hash, content, embedding}]. `p_articles` holds [{title, content, source_url,
+-- source_type, verified, embedding, passage_hashes}]. Articles already stored (matched on
+-- source_url, or on title and content when they have none) or repeated earlier in the batch are
+-- skipped, so replaying a batch that committed (e.g. an import resumed from an older checkpoint)
+-- adds nothing. Returns the inserted articles with
+-- their 0-based position in `p_articles`.
+CREATE OR REPLACE FUNCTION public.add_knowledge_base_articles(p_passages JSONB, p_articles JSONB)
+RETURNS TABLE (article_index INT, id uuid, title TEXT, content TEXT) AS $$
+  -- Neither source_url nor content is unique (older rows may repeat them), so concurrent batches take turns instead
+  SELECT pg_advisory_xact_lock(hashtext('public.knowledge_base.source_url'));
+
+  INSERT INTO public.knowledge_base_passages (content_hash, content, embedding)
+  SELECT p->>'content_hash', p->>'content', (p->>'embedding')::vector
+  FROM jsonb_array_elements(p_passages) p
+  ON CONFLICT (content_hash) DO NOTHING;
+
+  WITH items AS (
+    SELECT a.item, a.ord, a.item->>'source_url' AS source_url,
+           md5((a.item->>'title') || E'\n' || (a.item->>'content')) AS content_md5
+    FROM jsonb_array_elements(p_articles) WITH ORDINALITY a(item, ord)
+  ), numbered AS (
+    SELECT i.*, row_number() OVER (
+             PARTITION BY i.source_url, CASE WHEN i.source_url IS NULL THEN i.content_md5 END ORDER BY i.ord
+           ) AS nth
+    FROM items i
+  ), input AS MATERIALIZED (
+    SELECT gen_random_uuid() AS id, n.item, (n.ord - 1)::INT AS article_index
+    FROM numbered n
+    WHERE n.nth = 1
+      AND NOT EXISTS (SELECT 1 FROM public.knowledge_base kb WHERE kb.source_url = n.source_url)
+      AND (n.source_url IS NOT NULL OR NOT EXISTS (
+             SELECT 1 FROM public.knowledge_base kb
+             WHERE kb.source_url IS NULL AND md5(kb.title || E'\n' || kb.content) = n.content_md5
+           ))
+  ), inserted AS (
+    INSERT INTO public.knowledge_base (id, title, content, source_url, source_type, verified, embedding)
+    SELECT i.id, i.item->>'title', i.item->>'content', i.item->>'source_url', i.item->>'source_type',
+           COALESCE((i.item->>'verified')::boolean, FALSE), (i.item->>'embedding')::vector
+    FROM input i
+  ), linked AS (
+    INSERT INTO public.knowledge_base_passage_links (article_id, passage_id, passage_index)
+    SELECT i.id, p.id, (h.ord - 1)::INT
+    FROM input i
+    CROSS JOIN LATERAL jsonb_array_elements_text(i.item->'passage_hashes') WITH ORDINALITY h(hash, ord)
+    JOIN public.knowledge_base_passages p ON p.content_hash = h.hash
+  )
+  SELECT i.article_index, i.id, i.item->>'title', i.item->>'content' FROM input i;
+$$ LANGUAGE sql;
+
+-- Articles stored before passage-level indexing have no passages, so match_passages cannot find
+-- them. The AI service's backfill (python -m app.backfill_passages) pages through them with
+-- knowledge_base_articles_without_passages and indexes each page with index_knowledge_base_articles,
+-- which replaces the articles' links and mean embedding in one transaction.
+CREATE OR REPLACE FUNCTION public.knowledge_base_articles_without_passages(p_limit INT)
+RETURNS TABLE (id uuid, title TEXT, content TEXT) AS $$
+  SELECT kb.id, kb.title, kb.content
+  FROM public.knowledge_base kb
+  WHERE NOT EXISTS (SELECT 1 FROM public.knowledge_base_passage_links l WHERE l.article_id = kb.id)
+  ORDER BY kb.created_at, kb.id
+  LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION public.index_knowledge_base_articles(p_passages JSONB, p_articles JSONB)
+RETURNS INT AS $$
+  INSERT INTO public.knowledge_base_passages (content_hash, content, embedding)
+  SELECT p->>'content_hash', p->>'content', (p->>'embedding')::vector
+  FROM jsonb_array_elements(p_passages) p
+  ON CONFLICT (content_hash) DO NOTHING;
+
+  DELETE FROM public.knowledge_base_passage_links
+  WHERE article_id IN (SELECT (a->>'id')::uuid FROM jsonb_array_elements(p_articles) a);
+
+  UPDATE public.knowledge_base kb SET embedding = (a->>'embedding')::vector
+  FROM jsonb_array_elements(p_articles) a
+  WHERE kb.id = (a->>'id')::uuid;
+
+  INSERT INTO public.knowledge_base_passage_links (article_id, passage_id, passage_index)
+  SELECT (a->>'id')::uuid, p.id, (h.ord - 1)::INT
+  FROM jsonb_array_elements(p_articles) a
+  CROSS JOIN LATERAL jsonb_array_elements_text(a->'passage_hashes') WITH ORDINALITY h(hash, ord)
+  JOIN public.knowledge_base_passages p ON p.content_hash = h.hash
+  -- Only articles that still exist; one deleted since it was read is skipped
+  WHERE EXISTS (SELECT 1 FROM public.knowledge_base kb WHERE kb.id = (a->>'id')::uuid);
+
+  SELECT COUNT(DISTINCT l.article_id)::INT
+  FROM public.knowledge_base_passage_links l
+  WHERE l.article_id IN (SELECT (a->>'id')::uuid FROM jsonb_array_elements(p_articles) a);
+$$ LANGUAGE sql;
+
+-- 14. Claim Processing Checkpoints
+-- Output of each completed analysis stage, so a retried claim resumes where it stopped
+-- instead of repeating OCR/transcription, retrieval, web search or the LLM call.
+CREATE TABLE IF NOT EXISTS public.claim_processing_checkpoints (
+    claim_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL, -- Filled from the claim by trigger
+    stage TEXT NOT NULL, -- 'extract', 'context', 'analysis'
+    output JSONB NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (claim_id, stage),
+    FOREIGN KEY (claim_id, claim_created_at) REFERENCES public.claims(id, created_at) ON DELETE CASCADE
+);
+COMMENT ON TABLE public.claim_processing_checkpoints IS 'Per-stage results of claim processing, used to resume retries.';
+CREATE TRIGGER on_checkpoints_insert_fill_claim BEFORE INSERT ON public.claim_processing_checkpoints FOR EACH ROW EXECUTE PROCEDURE public.fill_claim_created_at();
+ALTER TABLE public.claim_processing_checkpoints ENABLE ROW LEVEL SECURITY;
+-- Only the backend's service role reads and writes checkpoints.
+
+
+-- 15. Claim Partition Maintenance
+-- claims, claim_analyses and claim_comments are split into monthly partitions named
+-- <table>_YYYY_MM. ensure_claim_partitions creates them from the month of `p_from` (default:
+-- the current month) through `p_months_ahead` months ahead and is safe to run repeatedly;
+-- the backend calls it at startup and daily. The default partitions only catch rows outside
+-- every monthly range (e.g. if maintenance stopped); a month cannot be created while its rows
+-- sit in the default partition, so keep them empty.
+CREATE TABLE IF NOT EXISTS public.claims_default PARTITION OF public.claims DEFAULT;
+CREATE TABLE IF NOT EXISTS public.claim_analyses_default PARTITION OF public.claim_analyses DEFAULT;
+CREATE TABLE IF NOT EXISTS public.claim_comments_default PARTITION OF public.claim_comments DEFAULT;
+-- Partitions are tables of their own to PostgREST and do not inherit the parent's RLS. Enabling
+-- it without policies leaves them to the service role; clients go through the parent's policies.
+ALTER TABLE public.claims_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.claim_analyses_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.claim_comments_default ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.ensure_claim_partitions(p_months_ahead INT DEFAULT 3, p_from TIMESTAMPTZ DEFAULT NULL)
+RETURNS INT AS $$
+DECLARE
+  month_start DATE := date_trunc('month', COALESCE(p_from, NOW()))::date;
+  last_month DATE := (date_trunc('month', NOW()) + make_interval(months => p_months_ahead))::date;
+  parent TEXT;
+  partition_name TEXT;
+  created INT := 0;
+BEGIN
+  WHILE month_start <= last_month LOOP
+    FOREACH parent IN ARRAY ARRAY['claims', 'claim_analyses', 'claim_comments'] LOOP
+      partition_name := format('%s_%s', parent, to_char(month_start, 'YYYY_MM'));
+      IF to_regclass('public.' || partition_name) IS NULL THEN
+        EXECUTE format(
+          'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+          partition_name, parent, month_start, (month_start + INTERVAL '1 month')::date
+        );
+        EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', partition_name);
+        created := created + 1;
+      END IF;
+    END LOOP;
+    month_start := (month_start + INTERVAL '1 month')::date;
+  END LOOP;
+  RETURN created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+-- Creates tables, so only the service role may call it.
+REVOKE EXECUTE ON FUNCTION public.ensure_claim_partitions(INT, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+
+SELECT public.ensure_claim_partitions();
+
+
+-- 16. Cold Archive for Analysis Payloads
+-- Once a claim is older than ANALYSIS_ARCHIVE_AFTER_DAYS, the backend's archiver writes its
+-- analysis evidence and sources as gzipped JSON to this private bucket, records the object in
+-- archive_path and clears the JSONB columns. Reads hydrate archived payloads from storage.
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('analysis_archive', 'analysis_archive', false)
+ON CONFLICT (id) DO NOTHING;
+-- Lets the archiver find its next batch without scanning archived rows or rows whose
+-- evidence is stored as source references (section 17).
+CREATE INDEX ON public.claim_analyses (claim_created_at) WHERE archived_at IS NULL AND evidence IS NOT NULL;
+
+
+-- 17. Normalized Evidence Sources
+-- Each cited article is stored once, keyed by its canonical URL (or a hash of its title and text
+-- when it has no link). Analyses reference sources by id, in display order, and point their
+-- evidence excerpts into the stored text by offset. Analyses stored this way have NULL
+-- evidence/sources columns; the backend hydrates them with get_analysis_sources.
+CREATE TABLE IF NOT EXISTS public.sources (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    source_key TEXT NOT NULL UNIQUE, -- Canonical URL, or 'sha256:<hash of title and text>'
+    url TEXT,
+    title TEXT NOT NULL,
+    source_type TEXT,
+    verified BOOLEAN DEFAULT FALSE NOT NULL,
+    content TEXT NOT NULL, -- Text excerpt offsets point into (as first seen)
+    content_hash TEXT NOT NULL, -- SHA-256 of content
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+COMMENT ON TABLE public.sources IS 'Deduplicated articles cited as evidence, shared by every analysis citing them.';
+
+CREATE TABLE IF NOT EXISTS public.analysis_sources (
+    claim_id uuid NOT NULL,
+    claim_created_at TIMESTAMPTZ NOT NULL,
+    ordinal INT NOT NULL, -- Position in the analysis's source list
+    source_id BIGINT NOT NULL REFERENCES public.sources(id) ON DELETE CASCADE,
+    is_evidence BOOLEAN DEFAULT FALSE NOT NULL,
+    credibility_score REAL,
+    excerpt_start INT, -- Excerpt offsets in sources.content
+    excerpt_end INT,
+    excerpt TEXT, -- Only when offsets cannot be used (text not found, or stored text differs)
+    excerpt_truncated BOOLEAN DEFAULT FALSE NOT NULL, -- The offset excerpt was cut short, so it is shown with "..."
+    PRIMARY KEY (claim_id, ordinal),
+    FOREIGN KEY (claim_id, claim_created_at) REFERENCES public.claim_analyses(claim_id, claim_created_at) ON DELETE CASCADE
+);
+COMMENT ON TABLE public.analysis_sources IS 'Sources cited by each claim analysis, with per-claim excerpt offsets.';
+-- "Claims citing this source", newest first.
+CREATE INDEX ON public.analysis_sources (source_id, claim_created_at DESC);
+
+ALTER TABLE public.sources ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.analysis_sources ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Anyone can view sources." ON public.sources FOR SELECT USING (true);
+CREATE POLICY "Anyone can view analysis sources." ON public.analysis_sources FOR SELECT USING (true);
+-- Both are only written by the service role key.
+
+-- Stores an analysis and its sources in one transaction: the claim_analyses row is upserted with
+-- empty evidence/sources columns, new sources are inserted, existing ones reused, and the
+-- analysis's references replaced. p_analysis is {verdict, confidence_score, summary, ai_reasoning}.
+-- p_sources is an ordered array of {source_key, url, title, source_type, verified, content,
+-- content_hash, is_evidence, credibility_score, excerpt, excerpt_start, excerpt_end}, where
+-- excerpt is the displayed text (ending in "..." when cut short).
+CREATE OR REPLACE FUNCTION public.store_analysis_sources(
+  p_claim_id uuid, p_claim_created_at TIMESTAMPTZ, p_analysis JSONB, p_sources JSONB
+)
+RETURNS INT AS $$
+DECLARE
+  stored INT;
+BEGIN
+  -- Replaces the preliminary row written while the verdict streamed in
+  INSERT INTO public.claim_analyses (claim_id, claim_created_at, verdict, confidence_score, summary, ai_reasoning, evidence, sources, preliminary)
+  VALUES (
+    p_claim_id, p_claim_created_at, (p_analysis->>'verdict')::verdict_type, (p_analysis->>'confidence_score')::REAL,
+    p_analysis->>'summary', p_analysis->>'ai_reasoning', NULL, NULL, FALSE
+  )
+  ON CONFLICT (claim_id, claim_created_at) DO UPDATE SET
+    verdict = EXCLUDED.verdict, confidence_score = EXCLUDED.confidence_score, summary = EXCLUDED.summary,
+    ai_reasoning = EXCLUDED.ai_reasoning, evidence = NULL, sources = NULL, preliminary = FALSE;
+
+  INSERT INTO public.sources (source_key, url, title, source_type, verified, content, content_hash)
+  SELECT DISTINCT ON (e->>'source_key')
+         e->>'source_key', e->>'url', COALESCE(e->>'title', 'Unknown Source'), e->>'source_type',
+         COALESCE((e->>'verified')::boolean, FALSE), COALESCE(e->>'content', ''), e->>'content_hash'
+  FROM jsonb_array_elements(p_sources) AS e
+  ON CONFLICT (source_key) DO NOTHING;
+
+  DELETE FROM public.analysis_sources WHERE claim_id = p_claim_id;
+
+  INSERT INTO public.analysis_sources (
+    claim_id, claim_created_at, ordinal, source_id, is_evidence, credibility_score, excerpt_start, excerpt_end, excerpt,
+    excerpt_truncated
+  )
+  SELECT p_claim_id, p_claim_created_at, (e.ordinal - 1)::INT, s.id, r.is_evidence, r.credibility_score,
+         CASE WHEN r.offsets_valid THEN r.excerpt_start END,
+         CASE WHEN r.offsets_valid THEN r.excerpt_end END,
+         CASE WHEN r.is_evidence AND NOT r.offsets_valid THEN e.item->>'excerpt' END,
+         -- The displayed excerpt is longer than the span it points at only when "..." was appended
+         COALESCE(r.offsets_valid AND char_length(e.item->>'excerpt') > r.excerpt_end - r.excerpt_start, FALSE)
+  FROM jsonb_array_elements(p_sources) WITH ORDINALITY AS e(item, ordinal)
+  JOIN public.sources s ON s.source_key = e.item->>'source_key'
+  CROSS JOIN LATERAL (
+    SELECT COALESCE((e.item->>'is_evidence')::boolean, FALSE) AS is_evidence,
+           (e.item->>'credibility_score')::REAL AS credibility_score,
+           (e.item->>'excerpt_start')::INT AS excerpt_start,
+           (e.item->>'excerpt_end')::INT AS excerpt_end,
+           -- Offsets only hold against the text they were computed on; the first writer's text is kept
+           (e.item->>'excerpt_start') IS NOT NULL AND s.content_hash = e.item->>'content_hash' AS offsets_valid
+  ) r;
+  GET DIAGNOSTICS stored = ROW_COUNT;
+  RETURN stored;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Source references of many analyses in one round-trip, with excerpts cut from the stored text.
+CREATE OR REPLACE FUNCTION public.get_analysis_sources(p_claim_ids uuid[])
+RETURNS TABLE (
+  claim_id uuid, ordinal INT, source_id BIGINT, url TEXT, title TEXT, source_type TEXT, verified BOOLEAN,
+  is_evidence BOOLEAN, credibility_score REAL, excerpt TEXT, excerpt_continues BOOLEAN
+) AS $$
+  SELECT a.claim_id, a.ordinal, s.id, s.url, s.title, s.source_type, s.verified, a.is_evidence, a.credibility_score,
+         COALESCE(a.excerpt, substr(s.content, a.excerpt_start + 1, a.excerpt_end - a.excerpt_start)),
+         a.excerpt IS NULL AND a.excerpt_truncated
+  FROM public.analysis_sources a
+  JOIN public.sources s ON s.id = a.source_id
+  WHERE a.claim_id = ANY(p_claim_ids)
+  ORDER BY a.claim_id, a.ordinal;
+$$ LANGUAGE sql STABLE;
+
+-- Claims whose analysis cites a source, newest first, with the total for paging.
+CREATE OR REPLACE FUNCTION public.get_source_claims(p_source_id BIGINT, p_limit INT, p_offset INT)
+RETURNS TABLE (claim_id uuid, claim_created_at TIMESTAMPTZ, is_evidence BOOLEAN, total_count BIGINT) AS $$
+  WITH cited AS (
+    SELECT a.claim_id, a.claim_created_at, bool_or(a.is_evidence) AS is_evidence
+    FROM public.analysis_sources a
+    WHERE a.source_id = p_source_id
+    GROUP BY a.claim_id, a.claim_created_at
+  )
+  SELECT cited.claim_id, cited.claim_created_at, cited.is_evidence, COUNT(*) OVER ()
+  FROM cited
+  ORDER BY cited.claim_created_at DESC
+  LIMIT p_limit OFFSET p_offset;
+$$ LANGUAGE sql STABLE;
@@ -26,21 +26,28 @@ VALUES
     ('c1a1a1a1-a1a1-a1a1-a1a1-a1a1a1a1a1a1', 'YOUR_FIRST_USER_UUID_HERE', 'The government announced a new 4-day work week for all IT companies.', 'text', 'completed'),
     ('c1b1b1b1-b1b1-b1b1-b1b1-b1b1b1b1b1b1', 'YOUR_SECOND_USER_UUID_HERE', 'A recent study shows that drinking coffee can increase lifespan by 10%.', 'text', 'completed'),
     ('c1c1c1c1-c1c1-c1c1-c1c1-c1c1c1c1c1c1', 'YOUR_FIRST_USER_UUID_HERE', 'Is this image of a shark swimming on a highway real?', 'image', 'processing')
-ON CONFLICT (id) DO NOTHING;
+ON CONFLICT DO NOTHING;
 
 -- 3. Seed Claim Analyses for completed claims
-INSERT INTO public.claim_analyses (claim_id, verdict, confidence_score, summary, ai_reasoning, evidence, sources)
-VALUES
+-- Analyses and comments carry their claim's created_at (the partition key), so they are read from the claims.
+INSERT INTO public.claim_analyses (claim_id, claim_created_at, verdict, confidence_score, summary, ai_reasoning, evidence, sources)
+SELECT c.id, c.created_at, v.verdict::verdict_type, v.confidence_score, v.summary, v.ai_reasoning, v.evidence::jsonb, v.sources::jsonb
+FROM (VALUES
     ('c1a1a1a1-a1a1-a1a1-a1a1-a1a1a1a1a1a1', 'false', 0.95, 'No official announcement has been made by the government regarding a mandatory 4-day work week for IT companies. Several news outlets have debunked this viral rumor.', 'The AI cross-referenced the claim against official government press releases and major news publications, finding no supporting evidence. The claim appears to originate from a satirical social media post.', '[]', '[]'),
     ('c1b1b1b1-b1b1-b1b1-b1b1-b1b1b1b1b1b1', 'misleading', 0.88, 'While some studies suggest a correlation between coffee consumption and a lower risk of certain diseases, claiming a specific 10% increase in lifespan is an oversimplification and not supported by conclusive scientific consensus.', 'The AI analyzed multiple peer-reviewed meta-analyses. It found evidence for health benefits but noted that the specific quantitative claim of a "10% increase" is not a widely accepted scientific fact and is often used as clickbait.', '[]', '[]')
-ON CONFLICT (claim_id) DO NOTHING;
+) AS v(claim_id, verdict, confidence_score, summary, ai_reasoning, evidence, sources)
+JOIN public.claims c ON c.id = v.claim_id::uuid
+ON CONFLICT DO NOTHING;
 
 -- 4. Seed Comments
-INSERT INTO public.claim_comments (id, claim_id, user_id, content, is_expert_response)
-VALUES
+INSERT INTO public.claim_comments (id, claim_id, claim_created_at, user_id, content, is_expert_response)
+SELECT v.id::uuid, c.id, c.created_at, v.user_id::uuid, v.content, v.is_expert_response
+FROM (VALUES
     ('c0a0a0a0-a0a0-a0a0-a0a0-a0a0a0a0a0a0', 'c1a1a1a1-a1a1-a1a1-a1a1-a1a1a1a1a1a1', 'YOUR_FIRST_USER_UUID_HERE', 'I saw this on my social media feed! Glad to know it''s false.', FALSE),
     ('c0b0b0b0-b0b0-b0b0-b0b0-b0b0b0b0b0b0', 'c1a1a1a1-a1a1-a1a1-a1a1-a1a1a1a1a1a1', 'YOUR_SECOND_USER_UUID_HERE', 'As an expert in public policy, I can confirm no such legislation has been tabled. This is a classic case of misinformation.', TRUE)
-ON CONFLICT (id) DO NOTHING;
+) AS v(id, claim_id, user_id, content, is_expert_response)
+JOIN public.claims c ON c.id = v.claim_id::uuid
+ON CONFLICT DO NOTHING;
 
 -- Reset the role and re-enable RLS
 RESET ROLE;